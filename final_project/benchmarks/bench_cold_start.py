@@ -0,0 +1,119 @@
+"""
+Cold-start benchmark: MLflow/pickle model loading vs the slim serving artifact.
+
+Each mode runs in a fresh interpreter and measures the time from process start
+until the first (warm-up) prediction returned, plus the resulting RSS and USS.
+Memory-mapped artifact pages are file-backed page cache that other processes
+mapping the same artifact share.
+
+  pickle: import mlflow (when installed), pandas and sklearn, unpickle the forest
+          the way mlflow.sklearn does, predict on a DataFrame
+  slim:   import numpy and src.forest_inference, memory-map the serving artifact,
+          predict on an ndarray
+
+    python benchmarks/bench_cold_start.py [--train-rows 50000] [--runs 5]
+"""
+import os
+import sys
+import json
+import pickle
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.bench_forest_inference import FEATURE_COLUMNS, train_forest
+from src.forest_inference import FlatForest
+
+_PRELUDE = """
+import time, os, sys, json
+start = time.perf_counter()
+sys.path.insert(0, {project_dir!r})
+"""
+
+_EPILOGUE = """
+elapsed = time.perf_counter() - start
+import psutil
+memory = psutil.Process().memory_full_info()
+print(json.dumps({{"seconds": elapsed, "rss_mb": memory.rss / 2 ** 20, "uss_mb": memory.uss / 2 ** 20,
+                  "prediction": float(prediction[0])}}))
+"""
+
+_PICKLE_MODE = """
+try:
+    import mlflow, mlflow.sklearn
+except ImportError:
+    pass
+import pickle
+import pandas as pd
+with open({model_path!r}, 'rb') as f:
+    model = pickle.load(f)
+prediction = model.predict(pd.DataFrame([{row!r}], columns={columns!r}))
+"""
+
+_SLIM_MODE = """
+import numpy as np
+from src.forest_inference import FlatForest
+forest = FlatForest.load({artifact_dir!r}, mmap_mode='r')
+prediction = forest.predict(np.array([{row!r}], dtype=np.float64))
+"""
+
+
+def run_mode(body, runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', body], capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark model cold start and RSS.')
+    parser.add_argument('--train-rows', type=int, default=50000, help='Rows of synthetic training data.')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per mode.')
+    args = parser.parse_args()
+
+    try:
+        import mlflow  # noqa: F401
+        mlflow_note = "including 'import mlflow'"
+    except ImportError:
+        mlflow_note = "mlflow not installed here, so its import cost is NOT included"
+
+    print(f"Training RandomForestRegressor on {args.train_rows} synthetic rows...")
+    forest = train_forest(args.train_rows)
+    row = [1.0, 2.0, 1.0, 1.0, 267095.0, 548371.0, 103266.0, 41.0, 364.0]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, 'model.pkl')
+        with open(model_path, 'wb') as f:
+            pickle.dump(forest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        artifact_dir = os.path.join(tmp_dir, 'serving_model')
+        FlatForest.from_sklearn(forest).save(artifact_dir, run_id='benchmark')
+
+        prelude = _PRELUDE.format(project_dir=PROJECT_DIR)
+        epilogue = _EPILOGUE.format()
+        modes = [
+            (f"pickle ({mlflow_note})", _PICKLE_MODE.format(model_path=model_path, row=row, columns=FEATURE_COLUMNS)),
+            ("slim mmap artifact", _SLIM_MODE.format(artifact_dir=artifact_dir, row=row)),
+        ]
+        print(f"pickle size: {os.path.getsize(model_path) / 2 ** 20:.1f} MB, "
+              f"artifact size: {sum(os.path.getsize(os.path.join(artifact_dir, n)) for n in os.listdir(artifact_dir)) / 2 ** 20:.1f} MB")
+
+        predictions = []
+        for name, body in modes:
+            results = run_mode(prelude + body + epilogue, args.runs)
+            seconds = np.median([r["seconds"] for r in results])
+            rss_mb = np.median([r["rss_mb"] for r in results])
+            uss_mb = np.median([r["uss_mb"] for r in results])
+            predictions.append(results[0]["prediction"])
+            print(f"{name:<70} start-to-first-prediction {seconds:6.2f}s   RSS {rss_mb:7.1f} MB   USS {uss_mb:7.1f} MB")
+        if predictions[0] != predictions[1]:
+            raise AssertionError(f"Warm-up predictions differ: {predictions}")
+
+
+if __name__ == '__main__':
+    main()
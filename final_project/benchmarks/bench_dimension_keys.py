@@ -0,0 +1,155 @@
+"""
+Dimension key resolution benchmark: per-row boolean scans vs dict/map lookups.
+
+Writes a synthetic manga.csv (100k rows by default, with genres/authors/demographics/
+serializations JSON lists like the MyAnimeList dump), then builds the fact_manga and
+manga_secondary_genres rows two ways:
+
+  legacy:     the former data_ingestion loop, one `dim[dim['name'] == name]['id'].iloc[0]`
+              scan per row and dimension
+  vectorized: data_ingestion.explode_nested (each column parsed once) plus
+              build_fact_rows / build_secondary_genre_rows, one name -> id dict
+              per dimension and Series.map joins
+
+Both paths start from the raw JSON strings of the CSV and no database is involved.
+Both produce the same rows, which is checked. The single parsing pass is also timed
+with the json and orjson decoders.
+
+    python benchmarks/bench_dimension_keys.py [--rows 100000] [--legacy-rows 100000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+import src.data_ingestion as data_ingestion
+from src.data_ingestion import DIMENSIONS, safe_json_loads, explode_nested, build_fact_rows, build_secondary_genre_rows
+
+# Distinct names per dimension, roughly the sizes found in the MyAnimeList dump
+DIMENSION_SIZES = {'genres': 80, 'authors': 20000, 'demographics': 8, 'serializations': 1500}
+MAX_ENTRIES = {'genres': 6, 'authors': 3, 'demographics': 1, 'serializations': 2}
+
+
+def synthetic_csv(path, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'mal_id': np.arange(1, n_rows + 1),
+        'score': np.round(rng.uniform(1, 10, n_rows), 2),
+        'scored_by': rng.integers(0, 500000, n_rows),
+        'rank': rng.integers(1, n_rows, n_rows),
+        'popularity': rng.integers(1, n_rows, n_rows),
+        'members': rng.integers(0, 1000000, n_rows),
+        'favorites': rng.integers(0, 50000, n_rows),
+        'volumes': rng.integers(0, 100, n_rows),
+        'chapters': rng.integers(0, 1000, n_rows),
+    })
+    for column, size in DIMENSION_SIZES.items():
+        counts = rng.integers(0, MAX_ENTRIES[column] + 1, n_rows)
+        ids = rng.integers(0, size, counts.sum())
+        entries = [{"mal_id": int(i), "type": "manga", "name": f"{column}_{i}"} for i in ids]
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        df[column] = [json.dumps(entries[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+    df.to_csv(path, index=False)
+
+
+def legacy_rows(df, key_frames):
+    """The per-row loop data_ingestion used before, with its boolean-scan lookups."""
+    genre_map = key_frames['genres']
+    fact_rows, bridge_rows = [], []
+    for index, row in df.iterrows():
+        primary_ids = {}
+        for column, _, id_column, name_column in DIMENSIONS:
+            key_map = key_frames[column]
+            primary_ids[column] = None
+            entries = safe_json_loads(row[column])
+            if entries and isinstance(entries[0], dict) and 'name' in entries[0]:
+                primary_ids[column] = key_map[key_map[name_column] == entries[0]['name']][id_column].iloc[0]
+        fact_rows.append({'manga_info_id': row['manga_info_id'], 'score': row['score'],
+                          'primary_genre_id': primary_ids['genres'], 'primary_author_id': primary_ids['authors'],
+                          'primary_demographic_id': primary_ids['demographics'],
+                          'primary_serialization_id': primary_ids['serializations']})
+        genres_list = safe_json_loads(row['genres'])
+        if genres_list and len(genres_list) > 1:
+            for genre_dict in genres_list[1:]:
+                if isinstance(genre_dict, dict) and 'name' in genre_dict:
+                    genre_id = genre_map[genre_map['genre_name'] == genre_dict['name']]['genre_id'].iloc[0]
+                    bridge_rows.append({'manga_info_id': row['manga_info_id'], 'genre_id': genre_id})
+    return pd.DataFrame(fact_rows), pd.DataFrame(bridge_rows).drop_duplicates()
+
+
+def vectorized_rows(df, key_maps):
+    exploded = {column: explode_nested(df[column]) for column, _, _, _ in DIMENSIONS}
+    return build_fact_rows(df, exploded, key_maps), build_secondary_genre_rows(df, exploded['genres'], key_maps['genres'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dimension key resolution for fact and bridge rows.')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows in the synthetic manga.csv.')
+    parser.add_argument('--legacy-rows', type=int, default=None,
+                        help='Run the legacy loop on only the first N rows and scale its time up (default: all rows).')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'manga.csv')
+        synthetic_csv(csv_path, args.rows)
+        print(f"Synthetic manga.csv: {args.rows} rows, {os.path.getsize(csv_path) / 2 ** 20:.1f} MB")
+        df = pd.read_csv(csv_path)
+    df['manga_info_id'] = np.arange(1, len(df) + 1)
+
+    # Dimension tables as ingest_data reads them back: (id, name) frames and name -> id dicts
+    key_frames, key_maps = {}, {}
+    for column, _, id_column, name_column in DIMENSIONS:
+        names = [f"{column}_{i}" for i in range(DIMENSION_SIZES[column])]
+        key_frames[column] = pd.DataFrame({id_column: np.arange(1, len(names) + 1), name_column: names})
+        key_maps[column] = dict(zip(names, range(1, len(names) + 1)))
+
+    decoders = [('json', json.loads)]
+    try:
+        import orjson
+        decoders.append(('orjson', orjson.loads))
+    except ImportError:
+        print("orjson not installed, timing json only")
+    default_decoder = data_ingestion._json_loads
+    for name, loads in decoders:
+        data_ingestion._json_loads = loads
+        start = time.perf_counter()
+        for column, _, _, _ in DIMENSIONS:
+            explode_nested(df[column])
+        print(f"parse ({name}): {time.perf_counter() - start:6.2f}s for the four nested columns")
+    data_ingestion._json_loads = default_decoder
+
+    start = time.perf_counter()
+    fact_rows, bridge_rows = vectorized_rows(df, key_maps)
+    vectorized_seconds = time.perf_counter() - start
+    print(f"vectorized: {vectorized_seconds:8.2f}s  ({len(fact_rows)} fact rows, {len(bridge_rows)} bridge rows)")
+
+    legacy_n = min(args.legacy_rows or len(df), len(df))
+    start = time.perf_counter()
+    legacy_fact, legacy_bridge = legacy_rows(df.iloc[:legacy_n], key_frames)
+    legacy_seconds = (time.perf_counter() - start) * len(df) / legacy_n
+    note = '' if legacy_n == len(df) else f" (measured on {legacy_n} rows, scaled)"
+    print(f"legacy:     {legacy_seconds:8.2f}s{note}")
+    print(f"speedup:    {legacy_seconds / vectorized_seconds:8.1f}x")
+
+    # Same primary keys and bridge pairs on the rows both paths processed
+    for column in ['primary_genre_id', 'primary_author_id', 'primary_demographic_id', 'primary_serialization_id']:
+        expected = pd.array(legacy_fact[column].tolist(), dtype='Int64')
+        actual = fact_rows[column].iloc[:legacy_n].array
+        if not expected.equals(actual):
+            raise AssertionError(f"{column} differs between the legacy and vectorized paths")
+    legacy_pairs = set(map(tuple, legacy_bridge.astype('int64').to_numpy().tolist()))
+    vectorized_pairs = set(map(tuple, bridge_rows[bridge_rows['manga_info_id'] <= legacy_n].to_numpy().tolist()))
+    if legacy_pairs != vectorized_pairs:
+        raise AssertionError("manga_secondary_genres rows differ between the legacy and vectorized paths")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Microbenchmark: FlatForest vs RandomForestRegressor.predict latency.
+
+Trains a forest shaped like the one in src/model_training.py on synthetic data
+with the serving schema (or loads a logged model with --run-id) and reports
+p50/p99 latency per call for batch sizes 1, 64, 1024, 4096 and 8192 (8192 is the
+/predict/stream chunk size).
+
+    python benchmarks/bench_forest_inference.py [--run-id <mlflow run id>]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.forest_inference import FlatForest
+
+FEATURE_COLUMNS = ['manga_info_id', 'mal_id', 'publishing', 'approved', 'scored_by',
+                   'members', 'favorites', 'volumes', 'chapters']
+
+
+def synthetic_features(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    members = rng.lognormal(8, 2, n_rows).astype(int)
+    return np.column_stack([
+        np.arange(n_rows),
+        rng.integers(1, 150000, n_rows),
+        rng.integers(0, 2, n_rows),
+        rng.integers(0, 2, n_rows),
+        (members * rng.uniform(0.1, 0.6, n_rows)).astype(int),
+        members,
+        (members * rng.uniform(0, 0.05, n_rows)).astype(int),
+        rng.integers(0, 120, n_rows),
+        rng.integers(0, 1500, n_rows),
+    ]).astype(np.float64)
+
+
+def train_forest(n_rows, max_depth=None):
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+
+    X = pd.DataFrame(synthetic_features(n_rows), columns=FEATURE_COLUMNS)
+    rng = np.random.default_rng(0)
+    y = np.clip(5 + np.log1p(X['members']) / 4 + rng.normal(0, 0.6, n_rows), 0, 10)
+    return RandomForestRegressor(n_estimators=100, max_depth=max_depth, random_state=42).fit(X, y)
+
+
+def time_calls(fn, repeats):
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, 50) * 1e3, np.percentile(timings, 99) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark flat-array forest inference.')
+    parser.add_argument('--run-id', help='MLflow run id of a logged random_forest_model; trains a synthetic forest when omitted.')
+    parser.add_argument('--train-rows', type=int, default=50000, help='Rows of synthetic training data.')
+    parser.add_argument('--repeats', type=int, default=200, help='Timed calls per batch size (fewer are used from 1024 rows).')
+    args = parser.parse_args()
+
+    import pandas as pd
+    if args.run_id:
+        import mlflow.sklearn
+        forest = mlflow.sklearn.load_model(f"runs:/{args.run_id}/random_forest_model")
+    else:
+        print(f"Training RandomForestRegressor on {args.train_rows} synthetic rows...")
+        forest = train_forest(args.train_rows)
+
+    start = time.perf_counter()
+    flat = FlatForest.from_sklearn(forest)
+    print(f"Flattened {flat.n_trees} trees / {flat.n_nodes} nodes (max depth {flat.max_depth}) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    rows = f"{'batch':>6} | {'engine':<22} | {'p50 ms':>9} | {'p99 ms':>9} | {'rows/s':>10}"
+    print(rows)
+    print('-' * len(rows))
+    for batch_size in (1, 64, 1024, 4096, 8192):
+        X = synthetic_features(batch_size, seed=batch_size)
+        X_df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+        if not np.array_equal(flat.predict(X), forest.predict(X_df)):
+            raise AssertionError(f"FlatForest and sklearn disagree at batch size {batch_size}")
+
+        repeats = args.repeats if batch_size < 1024 else max(args.repeats // 10, 10)
+        engines = [
+            ('sklearn (DataFrame)', lambda: forest.predict(X_df)),
+            ('FlatForest (ndarray)', lambda: flat.predict(X)),
+        ]
+        for name, fn in engines:
+            p50, p99 = time_calls(fn, repeats)
+            print(f"{batch_size:>6} | {name:<22} | {p50:>9.3f} | {p99:>9.3f} | {batch_size / (p50 / 1e3):>10.0f}")
+    print("Predictions identical to RandomForestRegressor.predict at every batch size.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Incremental preprocessing benchmark: full rebuild vs watermark-based incremental runs.
+
+Fills the star schema of bench_training_mart in a SQLite file, builds manga_processed
+with data_preprocessing.build_processed_dataset in full, then changes the mart and runs
+it incrementally:
+
+  unchanged: nothing refreshed since the last run
+  append:    1% new manga, with manga_info_ids after the existing ones
+  update:    10 manga refreshed through database_utils.refresh_training_mart
+  delete:    10 manga deleted from the mart
+
+Every incremental result is compared with a full rebuild of the same mart.
+
+    python benchmarks/bench_incremental_preprocess.py [--sizes 100000 1000000] [--partition_ids 10000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, MetaData, text
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.database_utils import MART_COLUMNS, refresh_training_mart
+from src.data_preprocessing import build_processed_dataset
+from src.parquet_artifacts import read_artifact
+from bench_training_mart import star_schema, fill
+
+QUERY = (f"SELECT {', '.join(f'm.{column}' for column in MART_COLUMNS)} FROM mart_manga_training m "
+         f"{{where}} ORDER BY m.manga_info_id")
+
+
+def timed_build(engine, dataset_dir, incremental, partition_ids):
+    start = time.perf_counter()
+    manifest = build_processed_dataset(engine, QUERY, dataset_dir, incremental=incremental,
+                                       partition_ids=partition_ids, watermark_lag_seconds=0)
+    return time.perf_counter() - start, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark incremental preprocessing.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000], help='Manga per run.')
+    parser.add_argument('--partition_ids', type=int, default=10000, help='manga_info_ids per partition.')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'run':>10} {'seconds':>8} {'rows read':>10} {'rewritten':>10} {'removed':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.sizes:
+            rng = np.random.default_rng(0)
+            engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, f'mart_{n_rows}.db')}")
+            metadata = MetaData()
+            star_schema(metadata)
+            metadata.create_all(engine)
+            fill(engine, n_rows)
+            with engine.begin() as connection:
+                connection.execute(text("UPDATE mart_manga_training SET refreshed_at = '2026-01-01 00:00:00'"))
+            dataset_dir = os.path.join(tmp_dir, f"manga_processed_{n_rows}.parquet")
+            reference_dir = os.path.join(tmp_dir, f"reference_{n_rows}.parquet")
+
+            appended = n_rows // 100
+            columns = ', '.join(MART_COLUMNS)
+            shifted = ', '.join(f"{column} + {n_rows}" if column in ('manga_info_id', 'mal_id') else column
+                                for column in MART_COLUMNS)
+            changes = [
+                ('full', None),
+                ('unchanged', None),
+                ('append', f"INSERT INTO mart_manga_training ({columns}) SELECT {shifted} "
+                           f"FROM mart_manga_training WHERE manga_info_id <= {appended}"),
+                ('update', rng.choice(np.arange(1, n_rows + 1), 10, replace=False)),
+                ('delete', f"DELETE FROM mart_manga_training WHERE manga_info_id IN "
+                           f"({', '.join(str(i) for i in rng.choice(np.arange(1, n_rows + 1), 10, replace=False))})"),
+            ]
+            for label, change in changes:
+                if isinstance(change, str):
+                    with engine.begin() as connection:
+                        connection.execute(text(change))
+                elif change is not None:
+                    refresh_training_mart(engine, [int(i) for i in change])
+                seconds, manifest = timed_build(engine, dataset_dir, label != 'full', args.partition_ids)
+                print(f"{n_rows:>9} {label:>10} {seconds:>8.2f} {manifest['counts']['read']:>10} "
+                      f"{len(manifest['changed']):>10} {len(manifest['removed']):>8}")
+                if label != 'full':
+                    build_processed_dataset(engine, QUERY, reference_dir, incremental=False,
+                                            partition_ids=args.partition_ids)
+                    pd.testing.assert_frame_equal(read_artifact(dataset_dir), read_artifact(reference_dir))
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
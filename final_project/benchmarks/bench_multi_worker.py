@@ -0,0 +1,146 @@
+"""
+Multi-worker serving benchmark: throughput and memory for 1-8 uvicorn workers.
+
+Exports a synthetic forest as a serving artifact into a temporary PROJECT_ROOT,
+starts `uvicorn src.app:app --workers N` against it and drives /predict from
+several client processes. Memory is summed over the uvicorn processes: RSS counts
+the memory-mapped forest once per worker, PSS splits shared pages between the
+workers that map them, USS is each worker's private memory.
+
+    python benchmarks/bench_multi_worker.py [--workers 1 2 4 8] [--seconds 10]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import http.client
+import multiprocessing
+
+import psutil
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.bench_forest_inference import FEATURE_COLUMNS, train_forest
+from src.forest_inference import FlatForest
+
+# The serving API only accepts MLflow-shaped run ids (32 hex digits)
+BENCHMARK_RUN_ID = 'b' * 32
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, n_workers, timeout=120):
+    """Waits until enough consecutive /ready probes succeed to have hit every worker."""
+    deadline = time.time() + timeout
+    streak = 0
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/ready')
+            streak = streak + 1 if conn.getresponse().status == 200 else 0
+            conn.close()
+        except OSError:
+            streak = 0
+        if streak >= 10 * n_workers:
+            return
+        time.sleep(0.02)
+    raise TimeoutError("uvicorn workers did not become ready")
+
+
+def client(port, seconds, seed):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+    deadline = time.time() + seconds
+    sent = 0
+    while time.time() < deadline:
+        body = json.dumps({
+            "manga_info_id": sent, "mal_id": seed * 1000000 + sent, "publishing": True, "approved": True,
+            "scored_by": 1000 + sent % 5000, "members": 5000 + sent % 90000, "favorites": sent % 3000,
+            "volumes": sent % 40, "chapters": sent % 400,
+        })
+        conn.request('POST', '/predict', body, headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"/predict returned {response.status}")
+        sent += 1
+    conn.close()
+    return sent
+
+
+def worker_memory(server):
+    """Sums memory over the uvicorn process tree (supervisor plus workers)."""
+    rss = pss = uss = 0
+    processes = [server] + server.children(recursive=True)
+    for proc in processes:
+        memory = proc.memory_full_info()
+        rss += memory.rss
+        pss += getattr(memory, 'pss', memory.rss)
+        uss += memory.uss
+    return len(processes), rss / 2 ** 20, pss / 2 ** 20, uss / 2 ** 20
+
+
+def run(n_workers, project_root, args):
+    port = free_port()
+    env = dict(os.environ, PROJECT_ROOT=project_root, MODEL_POLL_INTERVAL='0',
+               PREDICTION_CACHE_SIZE='0', MICRO_BATCH_MAX_SIZE=str(args.micro_batch))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'src.app:app', '--port', str(port), '--workers', str(n_workers),
+         '--log-level', 'warning'],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port, n_workers)
+        n_clients = args.clients or 2 * n_workers
+        with multiprocessing.Pool(n_clients) as pool:
+            start = time.perf_counter()
+            pending = pool.starmap_async(client, [(port, args.seconds, i) for i in range(n_clients)])
+            # Sample memory while the workers are under load
+            time.sleep(args.seconds / 2)
+            memory = worker_memory(psutil.Process(server.pid))
+            requests = sum(pending.get())
+            elapsed = time.perf_counter() - start
+        return requests / elapsed, memory
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multi-worker throughput and memory.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Worker counts to test.')
+    parser.add_argument('--seconds', type=float, default=10, help='Load duration per worker count.')
+    parser.add_argument('--clients', type=int, default=0, help='Client processes (default: 2 per worker).')
+    parser.add_argument('--micro-batch', type=int, default=1, help='MICRO_BATCH_MAX_SIZE for the workers (1 = off).')
+    parser.add_argument('--train-rows', type=int, default=50000, help='Rows of synthetic training data.')
+    args = parser.parse_args()
+
+    print(f"Training RandomForestRegressor on {args.train_rows} synthetic rows ({os.cpu_count()} CPUs available)...")
+    forest = FlatForest.from_sklearn(train_forest(args.train_rows), feature_names=FEATURE_COLUMNS)
+
+    with tempfile.TemporaryDirectory() as project_root:
+        processed_dir = os.path.join(project_root, 'data', 'processed')
+        forest.save(os.path.join(processed_dir, 'serving_models', BENCHMARK_RUN_ID), run_id=BENCHMARK_RUN_ID)
+        with open(os.path.join(processed_dir, 'latest_run_id.txt'), 'w') as f:
+            f.write(BENCHMARK_RUN_ID)
+        artifact_mb = sum(a.nbytes for a in forest.arrays().values()) / 2 ** 20
+        print(f"Serving artifact: {forest.n_nodes} nodes, {artifact_mb:.1f} MB")
+
+        header = f"{'workers':>7} | {'req/s':>8} | {'procs':>5} | {'RSS MB':>8} | {'PSS MB':>8} | {'USS MB':>8}"
+        print(header)
+        print('-' * len(header))
+        for n_workers in args.workers:
+            throughput, (procs, rss, pss, uss) = run(n_workers, project_root, args)
+            print(f"{n_workers:>7} | {throughput:>8.0f} | {procs:>5} | {rss:>8.1f} | {pss:>8.1f} | {uss:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
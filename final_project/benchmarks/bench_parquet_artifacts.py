@@ -0,0 +1,82 @@
+"""
+Parquet artifact benchmark: pandas defaults vs the parquet_artifacts storage layer.
+
+Reads the mart of bench_training_mart's synthetic star schema (SQLite) into pandas once,
+then writes it as manga_processed.parquet both ways:
+
+  pandas:    df.to_parquet, snappy, int64/float64/object columns, one row group
+  artifacts: parquet_artifacts.write_artifact, explicit Arrow schema, zstd,
+             dictionary-encoded low-cardinality strings, PARQUET_ROW_GROUP_ROWS row groups
+
+and times the reads the pipeline stages do: every column, the columns model_training
+reads (TRAINING_FEATURES and the target), and a manga_info_id range (the last 10%) read
+with a filter.
+"memory MB" is the pandas memory of the full read.
+
+    python benchmarks/bench_parquet_artifacts.py [--sizes 100000 1000000] [--runs 3]
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, MetaData, text
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.parquet_artifacts import write_artifact, read_artifact, TRAINING_FEATURES, TARGET_COLUMN
+from bench_training_mart import MART_QUERY, star_schema, fill, best_of
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Parquet layout of manga_processed.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000], help='Manga per run.')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per step; the best is reported.')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'layout':>10} {'write s':>8} {'file MB':>8} {'groups':>7} {'read s':>7} "
+          f"{'memory MB':>10} {'features s':>10} {'filter s':>9} {'filter rows':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.sizes:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, f'mart_{n_rows}.db')}")
+            metadata = MetaData()
+            star_schema(metadata)
+            metadata.create_all(engine)
+            fill(engine, n_rows)
+            with engine.connect() as connection:
+                df = pd.read_sql(text(MART_QUERY), connection)
+            engine.dispose()
+            model_columns = TRAINING_FEATURES + [TARGET_COLUMN]
+            low = int(n_rows * 0.9)
+
+            path = os.path.join(tmp_dir, 'manga_processed.parquet')
+            layouts = {
+                'pandas': (lambda: df.to_parquet(path, index=False),
+                           lambda: pd.read_parquet(path),
+                           lambda: pd.read_parquet(path, columns=model_columns),
+                           lambda: pd.read_parquet(path)[lambda frame: frame['manga_info_id'] > low]),
+                'artifacts': (lambda: write_artifact(df, path),
+                              lambda: read_artifact(path),
+                              lambda: read_artifact(path, columns=model_columns),
+                              lambda: read_artifact(path, filters=[('manga_info_id', '>', low)])),
+            }
+            for layout, (write, read, read_features, read_filtered) in layouts.items():
+                write_seconds, _ = best_of(args.runs, write)
+                read_seconds, full = best_of(args.runs, read)
+                features_seconds, _ = best_of(args.runs, read_features)
+                filter_seconds, filtered = best_of(args.runs, read_filtered)
+                print(f"{n_rows:>9} {layout:>10} {write_seconds:>8.2f} {os.path.getsize(path) / 2 ** 20:>8.1f} "
+                      f"{pq.ParquetFile(path).metadata.num_row_groups:>7} {read_seconds:>7.2f} "
+                      f"{full.memory_usage(deep=True).sum() / 2 ** 20:>10.1f} {features_seconds:>10.3f} "
+                      f"{filter_seconds:>9.3f} {len(filtered):>12}")
+                del full, filtered
+                os.remove(path)
+            del df
+
+
+if __name__ == '__main__':
+    main()
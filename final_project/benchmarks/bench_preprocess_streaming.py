@@ -0,0 +1,128 @@
+"""
+preprocess_data memory benchmark: one pd.read_sql of the whole mart vs the streaming writer.
+
+Fills the star schema of bench_training_mart in a SQLite file, then runs each mode in a
+fresh process and reports its time and peak RSS:
+
+  full:   pd.read_sql of mart_manga_training, drop_duplicates, score cleaning and one
+          to_parquet, as preprocess_data did before
+  stream: chunked read through a server-side cursor, cleaned and written as partitioned
+          Parquet by data_preprocessing.build_processed_dataset (full run)
+
+and checks that both files hold the same rows.
+
+    python benchmarks/bench_preprocess_streaming.py [--sizes 100000 1000000] [--chunk_size 50000]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import pandas as pd
+from sqlalchemy import create_engine, MetaData, text
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.database_utils import MART_COLUMNS
+from src.data_preprocessing import build_processed_dataset
+from bench_training_mart import MART_QUERY, star_schema, fill
+
+
+def run_full(engine, path):
+    df = pd.read_sql(text(MART_QUERY), engine)
+    df.drop_duplicates(subset=['mal_id'], inplace=True)
+    df['score'] = pd.to_numeric(df['score'], errors='coerce')
+    df.dropna(subset=['score'], inplace=True)
+    df.to_parquet(path, index=False)
+
+
+def run_stream(engine, path, chunk_size):
+    query = (f"SELECT {', '.join(f'm.{column}' for column in MART_COLUMNS)} FROM mart_manga_training m "
+             f"{{where}} ORDER BY m.manga_info_id")
+    build_processed_dataset(engine, query, path, incremental=False, chunk_size=chunk_size)
+
+
+def artifact_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith('.parquet'))
+    return os.path.getsize(path)
+
+
+def canonical(df):
+    """Numbers as float64, everything else as strings, missing values as None."""
+    return pd.DataFrame({
+        column: values.astype('float64') if pd.api.types.is_numeric_dtype(values)
+        else pd.Series([None if pd.isna(value) else str(value) for value in values], dtype=object)
+        for column, values in df.items()})
+
+
+def peak_rss_mb():
+    """Peak RSS of this process. ru_maxrss carries over the parent's peak across fork and exec; VmHWM does not."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(args):
+    """Runs one mode in this process and prints its seconds and peak RSS in MB."""
+    engine = create_engine(args.url)
+    start = time.perf_counter()
+    if args.mode == 'full':
+        run_full(engine, args.output)
+    else:
+        run_stream(engine, args.output, args.chunk_size)
+    print(time.perf_counter() - start, peak_rss_mb())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark peak memory of preprocess_data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000], help='Manga per run.')
+    parser.add_argument('--chunk_size', type=int, default=50000, help='Rows per streamed chunk.')
+    parser.add_argument('--mode', choices=['full', 'stream'], help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return child(args)
+
+    print(f"{'rows':>9} {'mode':>7} {'seconds':>8} {'peak RSS MB':>12} {'parquet MB':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.sizes:
+            url = f"sqlite:///{os.path.join(tmp_dir, f'mart_{n_rows}.db')}"
+            engine = create_engine(url)
+            metadata = MetaData()
+            star_schema(metadata)
+            metadata.create_all(engine)
+            fill(engine, n_rows)
+            engine.dispose()
+
+            outputs = {}
+            for mode in ('full', 'stream'):
+                outputs[mode] = os.path.join(tmp_dir, f"{mode}_{n_rows}.parquet")
+                result = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode', mode, '--url', url,
+                                         '--output', outputs[mode], '--chunk_size', str(args.chunk_size)],
+                                        check=True, capture_output=True, text=True)
+                seconds, peak_mb = map(float, result.stdout.split()[-2:])
+                print(f"{n_rows:>9} {mode:>7} {seconds:>8.2f} {peak_mb:>12.0f} "
+                      f"{artifact_size(outputs[mode]) / 2 ** 20:>11.1f}")
+
+            # The streamed file has the parquet_artifacts types (int32, dates, categoricals); compare values only
+            pd.testing.assert_frame_equal(*[canonical(pd.read_parquet(outputs[mode])) for mode in ('full', 'stream')])
+            os.remove(outputs['full'])
+            shutil.rmtree(outputs['stream'])
+            os.remove(os.path.join(tmp_dir, f'mart_{n_rows}.db'))
+
+
+if __name__ == '__main__':
+    main()
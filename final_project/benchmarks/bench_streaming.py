@@ -0,0 +1,166 @@
+"""
+Streaming bulk-scoring benchmark: rows/s and server memory for /predict/stream.
+
+Exports a synthetic forest as a serving artifact into a temporary PROJECT_ROOT,
+starts one uvicorn worker and streams N synthetic rows through /predict/stream as
+chunked NDJSON and as an Arrow IPC stream. The server's RSS is sampled while the
+stream runs; it should stay flat as --rows grows. Rows per server CPU second is the
+single-core throughput, also when the client shares the cores. The model's own
+throughput on one chunk is printed first, to separate the endpoint's cost from the
+model's; --max-depth trains shallower trees, to measure the endpoint with a cheap model.
+
+    python benchmarks/bench_streaming.py [--rows 1000000] [--chunk-rows 8192] [--max-depth 8]
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+
+import numpy as np
+import psutil
+import pyarrow as pa
+import pyarrow.ipc
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.bench_forest_inference import FEATURE_COLUMNS, synthetic_features, train_forest
+from benchmarks.bench_multi_worker import BENCHMARK_RUN_ID, free_port, wait_until_ready
+from src.forest_inference import FlatForest
+
+BODY_CHUNK_BYTES = 1 << 16
+
+
+def ndjson_body(n_rows, batch_rows=10000):
+    """Yields the NDJSON body in BODY_CHUNK_BYTES pieces without materializing it."""
+    pending = []
+    size = 0
+    for start in range(0, n_rows, batch_rows):
+        features = synthetic_features(min(batch_rows, n_rows - start), seed=start).astype(int).tolist()
+        for row in features:
+            line = (json.dumps(dict(zip(FEATURE_COLUMNS, row))) + '\n').encode('utf-8')
+            pending.append(line)
+            size += len(line)
+            if size >= BODY_CHUNK_BYTES:
+                yield b''.join(pending)
+                pending, size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def arrow_body(n_rows, batch_rows=65536):
+    """Yields an Arrow IPC stream one record batch at a time."""
+    schema = pa.schema([(name, pa.int64()) for name in FEATURE_COLUMNS])
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    for start in range(0, n_rows, batch_rows):
+        features = synthetic_features(min(batch_rows, n_rows - start), seed=start).astype(np.int64)
+        writer.write_batch(pa.record_batch(list(features.T), schema=schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    writer.close()
+    yield sink.getvalue()
+
+
+def stream(port, media_type, body, n_rows, server):
+    peak_rss = [0]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.is_set():
+            peak_rss[0] = max(peak_rss[0], server.memory_info().rss)
+            time.sleep(0.05)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    cpu_before = sum(server.cpu_times()[:2])
+    start = time.perf_counter()
+    conn.putrequest('POST', '/predict/stream')
+    conn.putheader('Content-Type', media_type)
+    conn.putheader('Transfer-Encoding', 'chunked')
+    conn.endheaders()
+
+    # Send from a separate thread while the response is read here: both directions
+    # are flow-controlled, so a client that only reads after sending everything
+    # stalls as soon as the socket buffers fill up.
+    def send_body():
+        for chunk in body:
+            conn.send(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        conn.send(b'0\r\n\r\n')
+
+    sender = threading.Thread(target=send_body, daemon=True)
+    sender.start()
+    response = conn.getresponse()
+    received = 0
+    while True:
+        data = response.read(BODY_CHUNK_BYTES)
+        if not data:
+            break
+        received += len(data)
+    elapsed = time.perf_counter() - start
+    server_cpu = sum(server.cpu_times()[:2]) - cpu_before
+    sender.join()
+    done.set()
+    sampler.join()
+    if response.status != 200:
+        raise RuntimeError(f"/predict/stream returned {response.status}")
+    return n_rows / elapsed, n_rows / server_cpu, received / 2 ** 20, peak_rss[0] / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming bulk-scoring endpoint.')
+    parser.add_argument('--rows', type=int, default=1000000, help='Rows to stream per format.')
+    parser.add_argument('--chunk-rows', type=int, default=8192, help='STREAM_CHUNK_ROWS for the server.')
+    parser.add_argument('--train-rows', type=int, default=50000, help='Rows of synthetic training data.')
+    parser.add_argument('--max-depth', type=int, default=None, help='max_depth of the trees (default: unlimited, '
+                                                                     'as in model_training).')
+    args = parser.parse_args()
+
+    print(f"Training RandomForestRegressor on {args.train_rows} synthetic rows...")
+    forest = FlatForest.from_sklearn(train_forest(args.train_rows, args.max_depth), feature_names=FEATURE_COLUMNS)
+    features = synthetic_features(args.chunk_rows, seed=1)
+    start = time.perf_counter()
+    forest.predict(features)
+    print(f"Model alone: {args.chunk_rows / (time.perf_counter() - start):,.0f} rows/s "
+          f"({forest.n_trees} trees, {forest.n_nodes} nodes)")
+
+    with tempfile.TemporaryDirectory() as project_root:
+        processed_dir = os.path.join(project_root, 'data', 'processed')
+        forest.save(os.path.join(processed_dir, 'serving_models', BENCHMARK_RUN_ID), run_id=BENCHMARK_RUN_ID)
+        with open(os.path.join(processed_dir, 'latest_run_id.txt'), 'w') as f:
+            f.write(BENCHMARK_RUN_ID)
+
+        port = free_port()
+        env = dict(os.environ, PROJECT_ROOT=project_root, MODEL_POLL_INTERVAL='0',
+                   STREAM_CHUNK_ROWS=str(args.chunk_rows))
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'src.app:app', '--port', str(port), '--log-level', 'warning'],
+            cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(port, 1)
+            process = psutil.Process(server.pid)
+            print(f"Server RSS before streaming: {process.memory_info().rss / 2 ** 20:.1f} MB")
+            for name, media_type, body in [
+                ('NDJSON', 'application/x-ndjson', ndjson_body(args.rows)),
+                ('Arrow IPC', 'application/vnd.apache.arrow.stream', arrow_body(args.rows)),
+            ]:
+                rows_per_second, rows_per_cpu_second, received_mb, peak_mb = stream(
+                    port, media_type, body, args.rows, process)
+                print(f"{name:<10} {args.rows:>9} rows  {rows_per_second:>10,.0f} rows/s  "
+                      f"{rows_per_cpu_second:>10,.0f} rows/server CPU s  "
+                      f"response {received_mb:7.1f} MB  peak server RSS {peak_mb:7.1f} MB")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
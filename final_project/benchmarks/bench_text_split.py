@@ -0,0 +1,86 @@
+"""
+Text split benchmark: reading the training data with and without the dim_manga_text columns.
+
+Fills the star schema of bench_training_mart with synthetic rows whose text attributes
+have realistic sizes (synopsis ~800, background ~200, images ~400 characters), then
+reads the training data the way preprocess_data does:
+
+  wide:   mart_manga_training joined to dim_manga_text, i.e. the columns the mart held
+          before the text moved out (preprocess_data(include_text=True))
+  narrow: mart_manga_training alone (the default)
+
+and reports the read time, the bytes of the result set (sum of the value sizes, a
+lower bound of what the server sends) and the size of the Parquet file written from it.
+
+Runs against SQLite by default. Pass --url to time a scratch MariaDB database; the
+benchmark drops and recreates the star schema tables in it.
+
+    python benchmarks/bench_text_split.py [--sizes 10000 100000] [--url URL]
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+import pandas as pd
+from sqlalchemy import create_engine, MetaData, text
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.database_utils import MART_COLUMNS, MANGA_TEXT_COLUMNS
+from bench_training_mart import star_schema, fill, best_of
+
+NARROW_QUERY = f"SELECT {', '.join(f'm.{column}' for column in MART_COLUMNS)} " \
+               f"FROM mart_manga_training m ORDER BY m.manga_info_id"
+WIDE_QUERY = f"SELECT {', '.join(f'm.{column}' for column in MART_COLUMNS)}, " \
+             f"{', '.join(f't.{column}' for column in MANGA_TEXT_COLUMNS)} " \
+             f"FROM mart_manga_training m LEFT JOIN dim_manga_text t ON t.manga_info_id = m.manga_info_id " \
+             f"ORDER BY m.manga_info_id"
+
+
+def result_bytes(df: pd.DataFrame) -> int:
+    """Bytes of the values of a result set: UTF-8 length of strings, 8 bytes per other non-null value."""
+    total = 0
+    for column in df.columns:
+        values = df[column].dropna()
+        if values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+            total += int(sum(len(str(value).encode('utf-8')) for value in values))
+        else:
+            total += 8 * len(values)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark training data reads with and without dim_manga_text.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Manga per run.')
+    parser.add_argument('--url', default=None, help='SQLAlchemy URL of a scratch database (default: SQLite file).')
+    parser.add_argument('--runs', type=int, default=3, help='Timed reads per query; the best is reported.')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'read':>7} {'seconds':>8} {'result MB':>10} {'parquet MB':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.sizes:
+            engine = create_engine(args.url or f"sqlite:///{os.path.join(tmp_dir, f'text_{n_rows}.db')}")
+            metadata = MetaData()
+            star_schema(metadata)
+            metadata.drop_all(engine)
+            metadata.create_all(engine)
+            fill(engine, n_rows, synopsis_chars=800, background_chars=200, images_chars=400)
+
+            for label, query in (('wide', WIDE_QUERY), ('narrow', NARROW_QUERY)):
+                with engine.connect() as connection:
+                    seconds, df = best_of(args.runs, lambda: pd.read_sql(text(query), connection))
+                parquet_path = os.path.join(tmp_dir, f"{label}_{n_rows}.parquet")
+                df.to_parquet(parquet_path, index=False)
+                print(f"{n_rows:>9} {label:>7} {seconds:>8.2f} {result_bytes(df) / 2 ** 20:>10.1f} "
+                      f"{os.path.getsize(parquet_path) / 2 ** 20:>11.1f}")
+                os.remove(parquet_path)
+                del df
+            metadata.drop_all(engine)
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
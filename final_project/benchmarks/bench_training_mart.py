@@ -0,0 +1,169 @@
+"""
+Training data read benchmark: the former five-way star schema join vs mart_manga_training.
+
+For every size, fills dim_manga_info, fact_manga and the four dimensions with synthetic
+rows, builds mart_manga_training with the same INSERT ... SELECT the ingestion refresh
+uses (database_utils.MART_SELECT), then times reading the training data into pandas:
+
+  join: the query preprocess_data ran before, `SELECT mi.*` joined to fact_manga and
+        the four dimension tables
+  mart: the query preprocess_data runs now, a primary key scan of mart_manga_training
+
+plus an incremental refresh of 1% of the manga (database_utils.refresh_training_mart).
+
+Runs against SQLite by default. Pass --url to time a scratch MariaDB database; the
+benchmark drops and recreates the star schema tables in it.
+
+    python benchmarks/bench_training_mart.py [--sizes 10000 100000 1000000] [--url URL]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import (create_engine, MetaData, Table, Column, Integer, String, Text, Boolean, Date, Numeric,
+                        DateTime, text)
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_DIR)
+
+from src.database_utils import MART_COLUMNS, MART_SELECT, MANGA_TEXT_COLUMNS, refresh_training_mart
+
+JOIN_QUERY = """
+    SELECT
+        mi.*,
+        fm.score, fm.scored_by, fm.rank_val, fm.popularity, fm.members, fm.favorites,
+        fm.volumes, fm.chapters,
+        g.genre_name as primary_genre,
+        a.author_name as primary_author,
+        d.demographic_name as primary_demographic,
+        s.serialization_name as primary_serialization
+    FROM fact_manga fm
+    JOIN dim_manga_info mi ON fm.manga_info_id = mi.manga_info_id
+    LEFT JOIN dim_genres g ON fm.primary_genre_id = g.genre_id
+    LEFT JOIN dim_authors a ON fm.primary_author_id = a.author_id
+    LEFT JOIN dim_demographics d ON fm.primary_demographic_id = d.demographic_id
+    LEFT JOIN dim_serializations s ON fm.primary_serialization_id = s.serialization_id
+"""
+
+MART_QUERY = f"SELECT {', '.join(MART_COLUMNS)} FROM mart_manga_training ORDER BY manga_info_id"
+
+DIMENSION_SIZES = {'genre': 80, 'author': 20000, 'demographic': 8, 'serialization': 1500}
+
+
+def star_schema(metadata):
+    """The star schema tables with the columns of database_utils.SCHEMA_MIGRATIONS, in portable types."""
+    for name in DIMENSION_SIZES:
+        Table(f"dim_{name}s", metadata, Column(f"{name}_id", Integer, primary_key=True),
+              Column(f"{name}_name", String(255), unique=True))
+    Table('dim_manga_info', metadata,
+          Column('manga_info_id', Integer, primary_key=True), Column('mal_id', Integer, unique=True),
+          Column('title', String(512)), Column('title_english', String(512)), Column('title_japanese', String(512)),
+          Column('status', String(255)), Column('type', String(255)), Column('publishing', Boolean),
+          Column('published_from', Date), Column('published_to', Date), Column('approved', Boolean),
+          Column('url', String(1024)), Column('row_hash', String(32)))
+    Table('dim_manga_text', metadata, Column('manga_info_id', Integer, primary_key=True),
+          *[Column(column, Text) for column in MANGA_TEXT_COLUMNS])
+    Table('fact_manga', metadata,
+          Column('fact_id', Integer, primary_key=True), Column('manga_info_id', Integer, unique=True),
+          Column('score', Numeric(3, 2)), Column('scored_by', Integer), Column('rank_val', Integer),
+          Column('popularity', Integer), Column('members', Integer), Column('favorites', Integer),
+          Column('volumes', Integer), Column('chapters', Integer),
+          *[Column(f"primary_{name}_id", Integer, index=True) for name in DIMENSION_SIZES])
+    mart_types = {column.name: column.type for table in ('dim_manga_info', 'fact_manga')
+                  for column in metadata.tables[table].columns}
+    Table('mart_manga_training', metadata,
+          *[Column(column, mart_types.get(column, String(255)), primary_key=column == 'manga_info_id',
+                   unique=column == 'mal_id') for column in MART_COLUMNS],
+          Column('refreshed_at', DateTime, server_default=text('CURRENT_TIMESTAMP'), index=True))
+
+
+def fill(engine, n_rows, seed=0, synopsis_chars=200, background_chars=200, images_chars=2):
+    """Synthetic rows; the text lengths are per-row sizes of the dim_manga_text columns."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_rows + 1)
+    for name, size in DIMENSION_SIZES.items():
+        pd.DataFrame({f"{name}_id": np.arange(1, size + 1), f"{name}_name": [f"{name}_{i}" for i in range(size)]}) \
+            .to_sql(f"dim_{name}s", engine, if_exists='append', index=False, chunksize=10000)
+    pd.DataFrame({
+        'manga_info_id': ids, 'mal_id': ids, 'title': [f"Title {i}" for i in ids],
+        'title_english': [f"English title {i}" for i in ids], 'title_japanese': None,
+        'status': np.where(ids % 5 == 0, 'Publishing', 'Finished'), 'type': 'Manga',
+        'publishing': ids % 5 == 0, 'published_from': pd.Timestamp('2001-02-03').date(), 'published_to': None,
+        'approved': True, 'url': [f"https://myanimelist.net/manga/{i}" for i in ids],
+    }).to_sql('dim_manga_info', engine, if_exists='append', index=False, chunksize=10000)
+
+    # Distinct text per row, from random words of 2-9 letters, so it compresses like prose
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    words = np.array([''.join(rng.choice(letters, size)) for size in rng.integers(2, 10, 5000)], dtype=object)
+
+    def texts(chars):
+        n_words = max(chars // 6, 1)
+        return [' '.join(row)[:chars] for row in words[rng.integers(0, len(words), (n_rows, n_words))]]
+    pd.DataFrame({
+        'manga_info_id': ids, 'title_synonyms': '[]', 'synopsis': texts(synopsis_chars),
+        'background': texts(background_chars), 'images': texts(images_chars),
+    }).to_sql('dim_manga_text', engine, if_exists='append', index=False, chunksize=10000)
+    facts = pd.DataFrame({
+        'manga_info_id': ids, 'score': np.round(rng.uniform(1, 9.99, n_rows), 2),
+        'scored_by': rng.integers(0, 500000, n_rows), 'rank_val': rng.integers(1, n_rows + 1, n_rows),
+        'popularity': rng.integers(1, n_rows + 1, n_rows), 'members': rng.integers(0, 1000000, n_rows),
+        'favorites': rng.integers(0, 50000, n_rows), 'volumes': rng.integers(0, 100, n_rows),
+        'chapters': rng.integers(0, 1000, n_rows),
+    })
+    for name, size in DIMENSION_SIZES.items():
+        facts[f"primary_{name}_id"] = rng.integers(1, size + 1, n_rows)
+    facts.to_sql('fact_manga', engine, if_exists='append', index=False, chunksize=10000)
+    with engine.begin() as connection:
+        connection.execute(text(f"INSERT INTO mart_manga_training ({', '.join(MART_COLUMNS)}) "
+                                f"{MART_SELECT.format(where='')}"))
+
+
+def best_of(runs, function):
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the star schema join against mart_manga_training.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Manga per run.')
+    parser.add_argument('--url', default=None, help='SQLAlchemy URL of a scratch database (default: SQLite file).')
+    parser.add_argument('--runs', type=int, default=3, help='Timed reads per query; the best is reported.')
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'join s':>8} {'mart s':>8} {'speedup':>8} {'refresh 1% s':>13}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.sizes:
+            engine = create_engine(args.url or f"sqlite:///{os.path.join(tmp_dir, f'star_{n_rows}.db')}")
+            metadata = MetaData()
+            star_schema(metadata)
+            metadata.drop_all(engine)
+            metadata.create_all(engine)
+            fill(engine, n_rows)
+
+            with engine.connect() as connection:
+                join_seconds, joined = best_of(args.runs, lambda: pd.read_sql(text(JOIN_QUERY), connection))
+                mart_seconds, mart = best_of(args.runs, lambda: pd.read_sql(text(MART_QUERY), connection))
+            if len(joined) != n_rows or len(mart) != n_rows:
+                raise AssertionError(f"expected {n_rows} rows, join read {len(joined)} and mart read {len(mart)}")
+            del joined, mart
+
+            refreshed_ids = np.arange(1, n_rows + 1, 100)
+            start = time.perf_counter()
+            refresh_training_mart(engine, refreshed_ids)
+            refresh_seconds = time.perf_counter() - start
+            print(f"{n_rows:>9} {join_seconds:>8.2f} {mart_seconds:>8.2f} {join_seconds / mart_seconds:>7.1f}x "
+                  f"{refresh_seconds:>13.2f}")
+            metadata.drop_all(engine)
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,20 +7,26 @@ import os
 from airflow.models.dag import DAG
 from airflow.operators.python import PythonOperator
 # from airflow.operators.bash import BashOperator # NEW IMPORT # REMOVED
-import docker # NEW IMPORT
+import requests
 from airflow.utils.dates import days_ago
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.data_ingestion import ingest_data
+from src.landing_zone import build_landing_zone
 from src.data_preprocessing import preprocess_data
 from src.feature_engineering import feature_engineering
 from src.model_training import model_training
 from src.model_evaluation import model_evaluation
+from src.score_index import build_score_index
 from src.data_validation import validate_data # NEW IMPORT
 from src.model_monitoring import run_model_monitoring # NEW IMPORT
 from src.database_utils import get_db_engine, create_star_schema # <-- NEW IMPORT
 
+FASTAPI_RELOAD_URL = "http://fastapi_app:8000/admin/reload" # Use service name for Docker internal network
+# Shared secret of the FastAPI admin endpoints, the same ADMIN_TOKEN as the service's
+FASTAPI_ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
 
 # Define the Python callable for model_evaluation that pulls XCom
 def _evaluate_model(ti):
@@ -29,14 +35,28 @@ def _evaluate_model(ti):
         raise Exception("MLflow training run_id not found in XComs.")
     model_evaluation(training_run_id=training_run_id)
 
+# Define the Python callable for precomputing the mal_id -> score index of the new model
+def _build_score_index(ti):
+    training_run_id = ti.xcom_pull(task_ids='model_training', key='return_value')
+    if not training_run_id:
+        raise Exception("MLflow training run_id not found in XComs.")
+    build_score_index(training_run_id)
+
+# Define the Python callable for data ingestion; it reads the landing dataset the upstream task built
+def _ingest_data(ti):
+    landing_path = ti.xcom_pull(task_ids='build_landing_zone', key='return_value')
+    if not landing_path:
+        raise Exception("Landing dataset path not found in XComs.")
+    ingest_data(landing_path=landing_path)
+
 # Define the Python callable for creating the star schema
 def _create_star_schema():
     engine = get_db_engine()
     create_star_schema(engine)
 
-# Define the Python callable for data validation
+# Define the Python callable for data validation; only the partitions preprocessing changed are checked
 def _validate_processed_data():
-    validate_data(file_path='/opt/airflow/data/processed/manga_processed.parquet')
+    validate_data(file_path='/opt/airflow/data/processed/manga_processed.parquet', changed_only=True)
 
 # Define the Python callable for model monitoring
 def _run_model_monitoring():
@@ -52,21 +72,28 @@ def _update_deployed_model_id(ti):
     project_root = '/opt/airflow'
     run_id_path = os.path.join(project_root, 'data', 'processed', 'latest_run_id.txt')
 
-    with open(run_id_path, 'w') as f:
+    # Write to a temp file and rename so the FastAPI watcher never sees a partial run_id
+    tmp_path = run_id_path + '.tmp'
+    with open(tmp_path, 'w') as f:
         f.write(training_run_id)
+    os.replace(tmp_path, run_id_path)
     print(f"Updated latest_run_id.txt with run_id: {training_run_id}")
 
-# Define the Python callable for restarting the FastAPI service
-def _restart_fastapi_service():
-    client = docker.from_env()
+# Define the Python callable for hot-reloading the model in the FastAPI service; the
+# service loads the run update_deployed_model_id just published in latest_run_id.txt
+def _reload_fastapi_model():
+    if not FASTAPI_ADMIN_TOKEN:
+        print("ADMIN_TOKEN not set, the FastAPI app picks up latest_run_id.txt on its next poll.")
+        return
     try:
-        container = client.containers.get('fastapi_app')
-        container.restart()
-        print("FastAPI app container restarted successfully.")
-    except docker.errors.NotFound:
-        print("FastAPI app container not found. It might not be running.")
+        response = requests.post(FASTAPI_RELOAD_URL, headers={'X-Admin-Token': FASTAPI_ADMIN_TOKEN}, timeout=600)
+        response.raise_for_status()
+        print(f"FastAPI app now serving: {response.json()}")
+    except requests.exceptions.ConnectionError:
+        # The service picks up latest_run_id.txt on its own once it is running again
+        print("FastAPI app not reachable. It might not be running.")
     except Exception as e:
-        print(f"Error restarting FastAPI app container: {e}")
+        print(f"Error reloading model in FastAPI app: {e}")
         raise
 
 
@@ -87,9 +114,14 @@ with DAG(
         python_callable=_create_star_schema,
     )
 
+    landing_zone_task = PythonOperator(
+        task_id="build_landing_zone",
+        python_callable=build_landing_zone,
+    )
+
     data_ingestion_task = PythonOperator(
         task_id="data_ingestion",
-        python_callable=ingest_data,
+        python_callable=_ingest_data,
     )
 
     data_preprocessing_task = PythonOperator(
@@ -117,14 +149,19 @@ with DAG(
         python_callable=_evaluate_model,
     )
 
+    build_score_index_task = PythonOperator(
+        task_id="build_score_index",
+        python_callable=_build_score_index,
+    )
+
     update_deployed_model_id = PythonOperator(
         task_id="update_deployed_model_id",
         python_callable=_update_deployed_model_id,
     )
 
-    restart_model_serving_service = PythonOperator(
-        task_id="restart_model_serving_service",
-        python_callable=_restart_fastapi_service,
+    reload_model_serving_service = PythonOperator(
+        task_id="reload_model_serving_service",
+        python_callable=_reload_fastapi_model,
     )
 
     model_monitoring_task = PythonOperator(
@@ -138,5 +175,5 @@ with DAG(
     )
 
     # Define the task dependencies
-    start_pipeline >> create_schema_task >> data_ingestion_task >> data_preprocessing_task >> data_validation_task >> feature_engineering_task
-    feature_engineering_task >> model_training_task >> model_evaluation_task >> update_deployed_model_id >> restart_model_serving_service >> model_monitoring_task >> end_pipeline
+    start_pipeline >> create_schema_task >> landing_zone_task >> data_ingestion_task >> data_preprocessing_task >> data_validation_task >> feature_engineering_task
+    feature_engineering_task >> model_training_task >> build_score_index_task >> model_evaluation_task >> update_deployed_model_id >> reload_model_serving_service >> model_monitoring_task >> end_pipeline
@@ -1,8 +1,23 @@
 import os
-import pandas as pd
-import mlflow
-from fastapi import FastAPI
+import hmac
+import json
+import numpy as np
+import logging
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Header, HTTPException, Path, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field # Import Field
+from src.model_serving import ModelManager, ModelNotReadyError
+from src.forest_inference import FlatForest
+from src.micro_batching import MicroBatcher
+from src.prediction_cache import PredictionCache
+from src.bulk_scoring import StreamingScorer
+from src.score_index import ScoreIndex
+from src.serving_metrics import MetricsRegistry, MetricsMiddleware, SIZE_BUCKETS, perf_counter_ns
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Define the input data model
 class MangaFeatures(BaseModel):
@@ -31,30 +46,413 @@ class MangaFeatures(BaseModel):
             }
         }
 
+# Feature order expected by the model (same order as training_columns.txt)
+FEATURE_COLUMNS = list(MangaFeatures.__fields__)
+BOOLEAN_FEATURES = {'publishing', 'approved'}
+
 # Initialize the FastAPI app
 app = FastAPI()
 
-# Load the model
-project_root = '/opt/airflow'
+# Hot-path instrumentation exposed on /metrics
+metrics = MetricsRegistry('manga_api')
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
+def stage_histogram(handler: str, stage: str):
+    return metrics.latency_histogram('stage_duration_seconds', 'Time spent in each request stage.',
+                                     handler=handler, stage=stage)
+
+PREDICT_STAGES = {stage: stage_histogram('predict', stage) for stage in ('parse', 'build', 'cache', 'predict', 'serialize')}
+BATCH_STAGES = {stage: stage_histogram('predict_batch', stage) for stage in ('parse', 'build', 'predict', 'serialize')}
+PREDICT_ROWS = metrics.counter('rows_scored_total', 'Rows scored by the model, per handler.', handler='predict')
+BATCH_ROWS = metrics.counter('rows_scored_total', 'Rows scored by the model, per handler.', handler='predict_batch')
+BATCH_SIZES = metrics.histogram('request_rows', 'Rows per request.', SIZE_BUCKETS, handler='predict_batch')
+
+def json_response(payload: dict, serialize_histogram) -> Response:
+    """Serializes the response body here (instead of in FastAPI) so the time is measured."""
+    start = perf_counter_ns()
+    body = json.dumps(payload).encode('utf-8')
+    serialize_histogram.observe(perf_counter_ns() - start)
+    return Response(content=body, media_type='application/json')
+
+# Model loading: the active model is swapped in place whenever the run-id file changes.
+# With `uvicorn --workers N` every worker runs its own watcher and memory-maps the same
+# read-only artifact files, so the forest is held once in the page cache for all workers.
+project_root = os.getenv("PROJECT_ROOT", '/opt/airflow')
 run_id_path = os.path.join(project_root, 'data', 'processed', 'latest_run_id.txt')
-with open(run_id_path, 'r') as f:
-    run_id = f.read()
+serving_models_dir = os.path.join(project_root, 'data', 'processed', 'serving_models')
+score_indexes_dir = os.path.join(project_root, 'data', 'processed', 'score_indexes')
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "10"))
+# Shared secret of the /admin endpoints, sent in the X-Admin-Token header; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+example_features = MangaFeatures.Config.schema_extra["example"]
+warmup_input = np.array([[example_features[name] for name in FEATURE_COLUMNS]], dtype=np.float64)
+
+def load_serving_model(run_id: str) -> FlatForest:
+    """
+    Loads the slim serving artifact exported by model_training: memory-mapped forest
+    arrays plus the feature schema, without importing MLflow, pandas or sklearn.
+    Runs trained before the artifact existed are exported from the MLflow model first.
+    """
+    artifact_dir = os.path.join(serving_models_dir, run_id)
+    if not os.path.isdir(artifact_dir):
+        # Publish the artifact from the MLflow model once, so all workers map the same files
+        logger.info(f"No serving artifact at {artifact_dir}, exporting it from the MLflow model.")
+        load_mlflow_model(run_id).save(artifact_dir, run_id=run_id, replace=False)
+
+    forest = FlatForest.load(artifact_dir, mmap_mode='r')
+    if forest.feature_names is not None and forest.feature_names != FEATURE_COLUMNS:
+        raise ValueError(f"Model features {forest.feature_names} do not match the API schema {FEATURE_COLUMNS}")
+    return forest
+
+def load_mlflow_model(run_id: str) -> FlatForest:
+    """
+    Loads the RandomForestRegressor logged by model_training and flattens it into a
+    FlatForest, which predicts straight from NumPy arrays without the pyfunc wrapper.
+    """
+    # Imported here so the default serving path never pays for MLflow
+    import pandas as pd
+    import mlflow.sklearn
+
+    model_uri = f"runs:/{run_id}/random_forest_model"
+    estimator = mlflow.sklearn.load_model(model_uri)
+    forest = FlatForest.from_sklearn(estimator)
+    if forest.feature_names is not None and forest.feature_names != FEATURE_COLUMNS:
+        raise ValueError(f"Model features {forest.feature_names} do not match the API schema {FEATURE_COLUMNS}")
+
+    # Sanity check the flattened forest against sklearn before it can be swapped in
+    warmup_df = pd.DataFrame(warmup_input, columns=FEATURE_COLUMNS)
+    if not np.array_equal(forest.predict(warmup_input), estimator.predict(warmup_df)):
+        raise ValueError("Flattened forest disagrees with the sklearn model on the warm-up row")
+    return forest
+
+model_manager = ModelManager(run_id_path, load_serving_model, warmup_input, poll_interval=MODEL_POLL_INTERVAL)
 
-model_uri = f"runs:/{run_id}/random_forest_model"
-model = mlflow.pyfunc.load_model(model_uri)
+def publish_model_metrics(old, new):
+    if old is not None:
+        metrics.remove('model_info', run_id=old.run_id)
+    metrics.gauge('model_info', 'Run id of the model being served (value is always 1).', run_id=new.run_id).set(1)
+    metrics.counter('model_loads_total', 'Models loaded and swapped in.').inc()
+
+model_manager.add_swap_listener(publish_model_metrics)
+metrics.gauge('model_ready', '1 once a model has passed its warm-up prediction.', function=lambda: int(model_manager.ready))
+metrics.gauge('model_load_seconds', 'Load and warm-up time of the active model.',
+              function=lambda: model_manager.status()['load_seconds'])
+
+# Precomputed mal_id -> score index written by the build_score_index pipeline stage,
+# which the DAG runs before it publishes the run id. It is resolved once per model swap
+# and only used while its run id is active.
+score_index = None
+
+def open_score_index(run_id: str) -> Optional[ScoreIndex]:
+    """Memory-maps the score index of run_id and makes it the active one; None if it has not been built."""
+    global score_index
+    index_dir = os.path.join(score_indexes_dir, run_id)
+    if not os.path.isdir(index_dir):
+        score_index = None
+        return None
+    score_index = ScoreIndex.load(index_dir, mmap_mode='r')
+    logger.info(f"Loaded score index with {len(score_index)} mal_ids for run_id {run_id}.")
+    return score_index
+
+def load_score_index(old, new):
+    if open_score_index(new.run_id) is None:
+        logger.info(f"No score index for run_id {new.run_id}, /score falls back to live inference.")
+
+model_manager.add_swap_listener(load_score_index)
+SCORE_INDEX_HITS = metrics.counter('score_index_lookups_total', 'Lookups in the precomputed score index.', result='hit')
+SCORE_INDEX_MISSES = metrics.counter('score_index_lookups_total', 'Lookups in the precomputed score index.', result='miss')
+SCORE_ROWS = metrics.counter('rows_scored_total', 'Rows scored by the model, per handler.', handler='score')
+metrics.gauge('score_index_entries', 'mal_ids in the active score index.',
+              function=lambda: len(score_index) if score_index is not None else 0)
+
+# Micro-batching of concurrent /predict calls (MICRO_BATCH_MAX_SIZE=1 disables it)
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+MICRO_BATCH_MAX_DELAY_MS = float(os.getenv("MICRO_BATCH_MAX_DELAY_MS", "2"))
+
+def predict_with_active_model(feature_matrix: np.ndarray) -> np.ndarray:
+    return model_manager.current.model.predict(feature_matrix)
+
+micro_batcher = None
+if MICRO_BATCH_MAX_SIZE > 1:
+    micro_batcher = MicroBatcher(predict_with_active_model, max_batch_size=MICRO_BATCH_MAX_SIZE,
+                                 max_delay_ms=MICRO_BATCH_MAX_DELAY_MS)
+    metrics.gauge('micro_batch_queue_depth', 'Rows waiting for the next micro-batch.',
+                  function=lambda: micro_batcher.queue_depth)
+    metrics.counter('micro_batches_total', 'Micro-batches dispatched.', function=lambda: micro_batcher.batches)
+    metrics.gauge('micro_batch_mean_wait_seconds', 'Mean time rows waited in the micro-batch queue.',
+                  function=lambda: micro_batcher.stats()['mean_wait_ms'] / 1000)
+
+# Prediction cache keyed by run_id + features (PREDICTION_CACHE_SIZE=0 disables it)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600"))
+PREDICTION_CACHE_MAX_MB = float(os.getenv("PREDICTION_CACHE_MAX_MB", "64"))
+
+prediction_cache = None
+if PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(max_entries=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL_SECONDS,
+                                       max_bytes=PREDICTION_CACHE_MAX_MB * 1024 * 1024)
+    model_manager.add_swap_listener(prediction_cache.on_model_swap)
+    for counter in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+        metrics.counter(f'prediction_cache_{counter}_total', f'Prediction cache {counter}.',
+                        function=lambda counter=counter: getattr(prediction_cache, counter))
+    metrics.gauge('prediction_cache_entries', 'Entries in the prediction cache.',
+                  function=lambda: prediction_cache.stats()['entries'])
+    metrics.gauge('prediction_cache_bytes', 'Estimated memory used by the prediction cache.',
+                  function=lambda: prediction_cache.bytes)
+
+@app.on_event("startup")
+def load_model_on_startup():
+    # Loads and warms up the model in the background; /ready reports when it is done
+    model_manager.start_watching()
+
+@app.on_event("startup")
+async def start_micro_batcher():
+    if micro_batcher is not None:
+        await micro_batcher.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+    model_manager.stop_watching()
+
+async def predict_one(feature_key: tuple) -> float:
+    """Scores one normalized feature tuple, through the micro-batcher when it is enabled."""
+    feature_row = np.array(feature_key, dtype=np.float64)
+    if micro_batcher is not None:
+        prediction = await micro_batcher.submit(feature_row)
+    else:
+        prediction = (await run_in_threadpool(predict_with_active_model, feature_row[np.newaxis, :]))[0]
+    return float(prediction)
 
 @app.post("/predict", response_model=dict, summary="Predict manga score based on features")
-def predict(features: MangaFeatures):
+async def predict(features: MangaFeatures, request: Request):
     """
     Receives manga features and returns a score prediction.
+    Repeated feature sets are answered from the prediction cache, and concurrent
+    calls are grouped into one batched prediction by the micro-batcher.
     """
-    # Convert input to DataFrame
-    feature_df = pd.DataFrame([features.dict()])
+    # Body read, JSON decoding and validation all happen before the handler runs
+    start = perf_counter_ns()
+    PREDICT_STAGES['parse'].observe(start - request.state.request_start_ns)
+
+    # Normalized features: every field is an int or bool, booleans become 0/1
+    values = features.dict()
+    feature_key = tuple(int(values[name]) for name in FEATURE_COLUMNS)
+    now = perf_counter_ns()
+    PREDICT_STAGES['build'].observe(now - start)
+
+    run_id = model_manager.current.run_id
+    if prediction_cache is not None:
+        cached = prediction_cache.get(run_id, feature_key)
+        start, now = now, perf_counter_ns()
+        PREDICT_STAGES['cache'].observe(now - start)
+        if cached is not None:
+            return json_response({"predicted_score": cached}, PREDICT_STAGES['serialize'])
 
     # Predict
-    prediction = model.predict(feature_df)
+    prediction = await predict_one(feature_key)
+    PREDICT_STAGES['predict'].observe(perf_counter_ns() - now)
+    PREDICT_ROWS.inc()
+
+    if prediction_cache is not None:
+        prediction_cache.put(run_id, feature_key, prediction)
+    return json_response({"predicted_score": prediction}, PREDICT_STAGES['serialize'])
+
+@app.get("/score/{mal_id}", response_model=dict, summary="Precomputed score of a known manga")
+async def score(mal_id: int = Path(..., ge=0, lt=2 ** 31, description="MyAnimeList ID of the manga."),
+                manga_info_id: Optional[int] = None, publishing: Optional[bool] = None,
+                approved: Optional[bool] = None, scored_by: Optional[int] = None, members: Optional[int] = None,
+                favorites: Optional[int] = None, volumes: Optional[int] = None, chapters: Optional[int] = None):
+    """
+    Returns the score precomputed for mal_id by the active model, without running it.
+    For a mal_id missing from the index the remaining features can be passed as query
+    parameters, and the score is then predicted live like /predict.
+    """
+    served = model_manager.current
+    index = score_index
+    # The model is swapped in before the listeners open its index
+    if index is not None and index.run_id == served.run_id:
+        prediction = index.lookup(mal_id)
+        if prediction is not None:
+            SCORE_INDEX_HITS.inc()
+            return {"mal_id": mal_id, "predicted_score": prediction, "source": "index", "run_id": served.run_id}
+    SCORE_INDEX_MISSES.inc()
+
+    values = dict(manga_info_id=manga_info_id, mal_id=mal_id, publishing=publishing, approved=approved,
+                  scored_by=scored_by, members=members, favorites=favorites, volumes=volumes, chapters=chapters)
+    missing = [name for name in FEATURE_COLUMNS if values[name] is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"mal_id {mal_id} is not in the score index; "
+                                                    f"pass {missing} as query parameters to predict it live.")
+    feature_key = tuple(int(values[name]) for name in FEATURE_COLUMNS)
+    prediction = None
+    if prediction_cache is not None:
+        prediction = prediction_cache.get(served.run_id, feature_key)
+    if prediction is None:
+        prediction = await predict_one(feature_key)
+        SCORE_ROWS.inc()
+        if prediction_cache is not None:
+            prediction_cache.put(served.run_id, feature_key, prediction)
+    return {"mal_id": mal_id, "predicted_score": prediction, "source": "model", "run_id": served.run_id}
+
+def _to_float(name: str, value) -> float:
+    """Converts a single payload value to float, returning NaN when it is unusable."""
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if name in BOOLEAN_FEATURES and isinstance(value, str) and value.lower() in ('true', 'false'):
+        return float(value.lower() == 'true')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _coerce_column(name: str, values: list, row_errors: Dict[int, List[str]]) -> np.ndarray:
+    """
+    Converts one column of the batch payload to float64 in a single vectorized step.
+    Rows holding unusable values are recorded in row_errors.
+    """
+    try:
+        column = np.asarray(values, dtype=np.float64)
+        if column.ndim != 1:
+            raise ValueError("nested values")
+    except (TypeError, ValueError):
+        # Slow path, only taken when the column holds non-numeric strings, lists or objects
+        column = np.array([_to_float(name, value) for value in values], dtype=np.float64)
+
+    if name in BOOLEAN_FEATURES:
+        expected = 'a boolean'
+        invalid = ~np.isin(column, (0.0, 1.0))
+    else:
+        expected = 'an integer'
+        invalid = ~np.isfinite(column) | (column != np.floor(column))
+    for i in np.flatnonzero(invalid).tolist():
+        row_errors.setdefault(i, []).append(f"{name}: expected {expected}, got {values[i]!r}")
+    return column
+
+def build_feature_matrix(columns: dict, n_rows: int):
+    """Stacks the feature columns into a float64 matrix; returns it with the per-row errors."""
+    row_errors = {}
+    feature_matrix = np.empty((n_rows, len(FEATURE_COLUMNS)), dtype=np.float64)
+    for j, name in enumerate(FEATURE_COLUMNS):
+        feature_matrix[:, j] = _coerce_column(name, columns[name], row_errors)
+    return feature_matrix, row_errors
+
+@app.post("/predict/batch", response_model=dict, summary="Predict manga scores for a column-oriented batch")
+async def predict_batch(request: Request):
+    """
+    Scores many manga in one vectorized model call.
+
+    The body is column-oriented, one list per feature, e.g.
+    {"columns": {"manga_info_id": [1, 2], "mal_id": [2, 3], ..., "chapters": [364, 12]}}.
+    Predictions are returned in input order; rows that fail validation get a null
+    prediction and an entry in "errors" instead of failing the whole batch.
+    """
+    try:
+        payload = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    start = perf_counter_ns()
+    BATCH_STAGES['parse'].observe(start - request.state.request_start_ns)
+
+    columns = payload.get('columns') if isinstance(payload, dict) else None
+    if not isinstance(columns, dict):
+        raise HTTPException(status_code=422, detail="Body must be an object with a 'columns' mapping of feature name to list of values.")
+
+    missing = [name for name in FEATURE_COLUMNS if name not in columns]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing feature columns: {missing}")
+    if any(not isinstance(columns[name], list) for name in FEATURE_COLUMNS):
+        raise HTTPException(status_code=422, detail="Every feature column must be a list.")
+
+    lengths = {len(columns[name]) for name in FEATURE_COLUMNS}
+    if len(lengths) != 1:
+        raise HTTPException(status_code=422, detail="All feature columns must have the same length.")
+    n_rows = lengths.pop()
+
+    feature_matrix, row_errors = build_feature_matrix(columns, n_rows)
+
+    valid = np.ones(n_rows, dtype=bool)
+    if row_errors:
+        valid[list(row_errors)] = False
+    now = perf_counter_ns()
+    BATCH_STAGES['build'].observe(now - start)
+    BATCH_SIZES.observe(n_rows)
+
+    predictions = [None] * n_rows
+    if valid.any():
+        # One vectorized predict call for the whole batch
+        scores = await run_in_threadpool(predict_with_active_model, feature_matrix[valid])
+        for i, score in zip(np.flatnonzero(valid).tolist(), scores.tolist()):
+            predictions[i] = score
+        BATCH_STAGES['predict'].observe(perf_counter_ns() - now)
+        BATCH_ROWS.inc(int(valid.sum()))
+
+    errors = [{"row": i, "errors": row_errors[i]} for i in sorted(row_errors)]
+    payload = {"predictions": predictions, "errors": errors, "n_rows": n_rows, "n_failed": len(errors)}
+    return json_response(payload, BATCH_STAGES['serialize'])
+
+# Streaming bulk scoring for catalogue-sized NDJSON / Arrow IPC bodies. It is a raw ASGI
+# endpoint so that it can read the request and write predictions at the same time.
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "8192"))
+streaming_scorer = StreamingScorer(model_manager, build_feature_matrix, FEATURE_COLUMNS, chunk_rows=STREAM_CHUNK_ROWS)
+app.add_route("/predict/stream", streaming_scorer, methods=["POST"], include_in_schema=False)
+metrics.counter('rows_scored_total', 'Rows scored by the model, per handler.', handler='predict_stream',
+                function=lambda: streaming_scorer.rows)
+metrics.counter('stream_chunks_total', 'Chunks scored by the streaming endpoint.', function=lambda: streaming_scorer.chunks)
+
+@app.exception_handler(ModelNotReadyError)
+async def model_not_ready_handler(request: Request, exc: ModelNotReadyError):
+    return JSONResponse(status_code=503, content={"detail": "Model is still loading."})
+
+@app.get("/ready", summary="Readiness probe: 200 once a model has passed its warm-up prediction")
+def readiness():
+    if not model_manager.ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True, "active_run_id": model_manager.current.run_id}
+
+@app.get("/status", summary="Report the model currently being served")
+def model_status():
+    return model_manager.status()
+
+@app.get("/batching/stats", summary="Micro-batching queue depth, batch sizes and wait times")
+def batching_stats():
+    if micro_batcher is None:
+        return {"enabled": False}
+    return dict(micro_batcher.stats(), enabled=True)
+
+@app.get("/cache/stats", summary="Prediction cache size, hit/miss and eviction counters")
+def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return dict(prediction_cache.stats(), enabled=True)
+
+def check_admin_token(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them.")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token header.")
+
+@app.post("/admin/reload", summary="Load and warm up the published model, then swap it in")
+def reload_model(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Reloads the model from latest_run_id.txt without waiting for the next poll; requires
+    the ADMIN_TOKEN in the X-Admin-Token header. The previous model keeps serving until
+    the new one has passed its warm-up prediction. With several uvicorn workers only the
+    worker handling this call reloads now; the others follow the same file on their
+    next poll, so all of them end up on the published run.
+    """
+    check_admin_token(x_admin_token)
+    try:
+        model_manager.reload(force=force)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed, previous model still active: {e}")
+    return model_manager.status()
 
-    return {"predicted_score": prediction[0]}
+@app.get("/metrics", response_class=PlainTextResponse, summary="Prometheus metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,333 @@
+import io
+import json
+import queue
+import asyncio
+import logging
+import threading
+from itertools import islice
+
+import numpy as np
+
+from src.model_serving import ModelNotReadyError
+
+logger = logging.getLogger(__name__)
+
+# orjson decodes an NDJSON chunk about twice as fast; json is the fallback
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Sentinels passed from the event loop to the scoring thread
+_END_OF_BODY = None
+
+
+class StreamAborted(Exception):
+    """The client disconnected or the response could not be sent."""
+
+
+class InvalidStream(ValueError):
+    """The request body cannot be scored; reported as 422 when no output was sent yet."""
+
+
+class _BodyReader(io.RawIOBase):
+    """
+    Blocking file-like view of the request body for the scoring thread.
+    The event loop feeds body chunks into a bounded queue; every chunk taken out
+    frees a slot, so at most max_buffered_chunks chunks are held in memory.
+    """
+
+    def __init__(self, chunks: queue.Queue, release_slot):
+        self._chunks = chunks
+        self._release_slot = release_slot
+        self._current = memoryview(b'')
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._current and not self._eof:
+            chunk = self._chunks.get()
+            self._release_slot()
+            if chunk is _END_OF_BODY:
+                self._eof = True
+            elif isinstance(chunk, BaseException):
+                raise chunk
+            else:
+                self._current = memoryview(chunk)
+        n = min(len(buffer), len(self._current))
+        buffer[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+
+class _OutputSink:
+    """Write-only file object for pyarrow's stream writer; collects the bytes of one batch."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+class StreamingScorer:
+    """
+    ASGI endpoint scoring a streamed NDJSON or Arrow IPC body in fixed-size chunks.
+
+    The request body is handed to a scoring thread through a bounded queue and the
+    predictions flow back through a bounded asyncio queue, so a chunk is scored
+    while the next one is still arriving and memory stays flat however large the
+    catalogue is. Every stream is scored by the model that was active when it started.
+
+    NDJSON in: one feature object per line. NDJSON out: {"row": i, "predicted_score": x}
+    per line, or {"row": i, "errors": [...]} for rows that fail validation.
+    Arrow in: a stream with one column per feature. Arrow out: a stream of
+    (row, predicted_score, error) batches, one per scored chunk.
+
+    Both directions are flow-controlled, so clients must read the response while
+    they are still sending (e.g. a sender thread, or httpx/aiohttp streaming);
+    a client that reads only after uploading everything stalls once the socket
+    buffers are full.
+    """
+
+    def __init__(self, model_manager, build_feature_matrix, feature_columns, chunk_rows=8192,
+                 max_buffered_chunks=16, executor=None):
+        self.model_manager = model_manager
+        self.build_feature_matrix = build_feature_matrix
+        self.feature_columns = list(feature_columns)
+        self.chunk_rows = int(chunk_rows)
+        self.max_buffered_chunks = int(max_buffered_chunks)
+        self.executor = executor
+        self.streams = 0
+        self.rows = 0
+        self.chunks = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        if scope['method'] != 'POST':
+            return await self._send_error(send, 405, "Method not allowed, use POST.")
+        media_type = self._media_type(scope)
+        if media_type is None:
+            return await self._send_error(
+                send, 415, f"Content-Type must be {NDJSON_MEDIA_TYPE} or {ARROW_MEDIA_TYPE}.")
+        try:
+            served = self.model_manager.current
+        except ModelNotReadyError:
+            return await self._send_error(send, 503, "Model is still loading.")
+
+        loop = asyncio.get_running_loop()
+        body_chunks = queue.Queue()
+        slots = asyncio.Semaphore(self.max_buffered_chunks)
+        output = asyncio.Queue(maxsize=4)
+        cancelled = threading.Event()
+
+        def emit(item):
+            if cancelled.is_set():
+                raise StreamAborted()
+            asyncio.run_coroutine_threadsafe(output.put(item), loop).result()
+
+        reader = _BodyReader(body_chunks, lambda: loop.call_soon_threadsafe(slots.release))
+        score = self._score_arrow if media_type == ARROW_MEDIA_TYPE else self._score_ndjson
+        worker = loop.run_in_executor(self.executor, self._run, score, reader, served.model, emit)
+        pump = loop.create_task(self._pump_body(receive, body_chunks, slots, cancelled))
+        self.streams += 1
+
+        started = False
+        try:
+            while True:
+                kind, payload = await output.get()
+                if kind == 'done':
+                    break
+                if kind == 'error':
+                    if not started:
+                        await self._send_error(send, 422 if isinstance(payload, InvalidStream) else 500, str(payload))
+                        return
+                    if media_type == NDJSON_MEDIA_TYPE:
+                        await send({'type': 'http.response.body',
+                                    'body': (json.dumps({"error": str(payload)}) + '\n').encode('utf-8'),
+                                    'more_body': True})
+                    break
+                if not started:
+                    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                        (b'content-type', media_type.encode('latin-1')),
+                        (b'x-model-run-id', served.run_id.encode('latin-1')),
+                    ]})
+                    started = True
+                await send({'type': 'http.response.body', 'body': payload, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            # Unblock the scoring thread whichever side stopped first, then wait for it
+            cancelled.set()
+            pump.cancel()
+            body_chunks.put(StreamAborted())
+            while not worker.done():
+                try:
+                    output.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.001)
+            await asyncio.gather(pump, return_exceptions=True)
+
+    async def _pump_body(self, receive, body_chunks, slots, cancelled):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                cancelled.set()
+                body_chunks.put(StreamAborted("client disconnected"))
+                return
+            if message.get('body'):
+                await slots.acquire()
+                body_chunks.put(message['body'])
+            if not message.get('more_body', False):
+                await slots.acquire()
+                body_chunks.put(_END_OF_BODY)
+                return
+
+    def _run(self, score, reader, model, emit):
+        try:
+            score(reader, model, emit)
+            emit(('done', None))
+        except StreamAborted:
+            pass
+        except Exception as e:
+            if not isinstance(e, InvalidStream):
+                logger.exception("Streaming scoring failed.")
+            try:
+                emit(('error', e))
+            except StreamAborted:
+                pass
+
+    def _predict_chunk(self, model, columns: dict, n_rows: int):
+        feature_matrix, row_errors = self.build_feature_matrix(columns, n_rows)
+        scores = np.full(n_rows, np.nan)
+        valid = np.ones(n_rows, dtype=bool)
+        if row_errors:
+            valid[list(row_errors)] = False
+        if valid.any():
+            scores[valid] = model.predict(feature_matrix[valid])
+        self.rows += n_rows
+        self.chunks += 1
+        return scores, row_errors
+
+    def _score_ndjson(self, reader, model, emit):
+        lines = io.BufferedReader(reader, buffer_size=1 << 16)
+        offset = 0
+        while True:
+            chunk = [line for line in islice(lines, self.chunk_rows) if line.strip()]
+            if not chunk:
+                # islice came back short only on blank lines or at the end of the body
+                if lines.peek(1):
+                    continue
+                return
+            records, parse_errors = self._parse_ndjson(chunk)
+            columns = {name: [record.get(name) for record in records] for name in self.feature_columns}
+            scores, row_errors = self._predict_chunk(model, columns, len(records))
+            row_errors.update(parse_errors)
+
+            out = []
+            for i, score in enumerate(scores.tolist()):
+                if i in row_errors:
+                    out.append(json.dumps({"row": offset + i, "errors": row_errors[i]}))
+                else:
+                    out.append(f'{{"row": {offset + i}, "predicted_score": {score!r}}}')
+            out.append('')
+            emit(('data', '\n'.join(out).encode('utf-8')))
+            offset += len(records)
+
+    def _parse_ndjson(self, lines):
+        """Decodes a chunk of lines in one json.loads call, falling back to per-line decoding."""
+        try:
+            records = _json_loads(b'[' + b','.join(lines) + b']')
+        except ValueError:
+            return self._parse_lines(lines)
+        if len(records) != len(lines) or not all(isinstance(record, dict) for record in records):
+            return self._parse_lines(lines)
+        return records, {}
+
+    def _parse_lines(self, lines):
+        """Slow path for chunks holding malformed lines: each bad line becomes a row error."""
+        records, parse_errors = [], {}
+        for i, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = None
+                parse_errors[i] = [f"invalid JSON: {e}"]
+            if not isinstance(record, dict):
+                parse_errors.setdefault(i, ["each line must be a JSON object"])
+                record = {}
+            records.append(record)
+        return records, parse_errors
+
+    def _score_arrow(self, reader, model, emit):
+        # Imported here so the JSON endpoints never pay for pyarrow
+        import pyarrow as pa
+        import pyarrow.ipc
+
+        try:
+            batches = pa.ipc.open_stream(io.BufferedReader(reader, buffer_size=1 << 16))
+        except pa.ArrowInvalid as e:
+            raise InvalidStream(f"Invalid Arrow IPC stream: {e}")
+        missing = [name for name in self.feature_columns if name not in batches.schema.names]
+        if missing:
+            raise InvalidStream(f"Missing feature columns: {missing}")
+
+        out_schema = pa.schema([('row', pa.int64()), ('predicted_score', pa.float64()), ('error', pa.string())])
+        sink = _OutputSink()
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), out_schema)
+        emit(('data', sink.take()))
+        offset = 0
+        for batch in batches:
+            for start in range(0, batch.num_rows, self.chunk_rows):
+                chunk = batch.slice(start, self.chunk_rows)
+                columns = {name: chunk.column(batches.schema.get_field_index(name)).to_numpy(zero_copy_only=False)
+                           for name in self.feature_columns}
+                scores, row_errors = self._predict_chunk(model, columns, chunk.num_rows)
+                errors = [None] * chunk.num_rows
+                for i, messages in row_errors.items():
+                    errors[i] = '; '.join(messages)
+                writer.write_batch(pa.record_batch([
+                    pa.array(np.arange(offset, offset + chunk.num_rows, dtype=np.int64)),
+                    pa.array(scores, mask=np.isnan(scores) if row_errors else None),
+                    pa.array(errors, type=pa.string()),
+                ], schema=out_schema))
+                emit(('data', sink.take()))
+                offset += chunk.num_rows
+        writer.close()
+        emit(('data', sink.take()))
+
+    @staticmethod
+    def _media_type(scope):
+        for name, value in scope['headers']:
+            if name == b'content-type':
+                media_type = value.decode('latin-1').split(';')[0].strip().lower()
+                if media_type in (NDJSON_MEDIA_TYPE, 'application/jsonl', 'application/x-jsonlines'):
+                    return NDJSON_MEDIA_TYPE
+                if media_type == ARROW_MEDIA_TYPE:
+                    return ARROW_MEDIA_TYPE
+                return None
+        return None
+
+    @staticmethod
+    async def _send_error(send, status, detail):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': json.dumps({"detail": detail}).encode('utf-8')})
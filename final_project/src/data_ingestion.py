@@ -1,218 +1,552 @@
 import pandas as pd
+import numpy as np
 import os
 import json
-from sqlalchemy import text
-from src.database_utils import get_db_engine
+import time
+import queue
+import hashlib
+import resource
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text, bindparam
+from src.database_utils import (get_db_engine, bulk_execute, report_pool_stats, refresh_training_mart,
+                                 MANGA_TEXT_COLUMNS)
 
-def ingest_data():
+# Nested JSON list columns of manga.csv: (column, dimension table, id column, name column)
+DIMENSIONS = (
+    ('genres', 'dim_genres', 'genre_id', 'genre_name'),
+    ('authors', 'dim_authors', 'author_id', 'author_name'),
+    ('demographics', 'dim_demographics', 'demographic_id', 'demographic_name'),
+    ('serializations', 'dim_serializations', 'serialization_id', 'serialization_name'),
+)
+
+# Many-to-many bridge table of every nested column, holding all of its entries
+BRIDGE_TABLES = {
+    'genres': 'manga_genres',
+    'authors': 'manga_authors',
+    'demographics': 'manga_demographics',
+    'serializations': 'manga_serializations',
+}
+
+# Source columns whose content decides whether a manga changed since the last run
+FINGERPRINT_COLUMNS = [
+    'mal_id', 'title', 'title_english', 'title_japanese', 'title_synonyms', 'synopsis', 'background',
+    'status', 'published_from', 'published_to', 'url', 'type', 'approved', 'images',
+    'score', 'scored_by', 'rank', 'popularity', 'members', 'favorites', 'volumes', 'chapters',
+    'genres', 'authors', 'demographics', 'serializations',
+]
+
+# Declared types of the numeric and boolean source columns; the landing dataset stores
+# them with these types and fingerprints normalize them by it
+INTEGER_COLUMNS = ['mal_id', 'scored_by', 'rank', 'popularity', 'members', 'favorites', 'volumes', 'chapters']
+FLOAT_COLUMNS = ['score']
+BOOLEAN_COLUMNS = ['approved']
+
+def _fingerprint_text(column: str, values: pd.Series) -> list:
+    """
+    The values of one fingerprint column as text, by the column's declared type rather
+    than the dtype pandas inferred for the chunk: integers without a fraction, floats as
+    repr(float), booleans as True/False and missing values as empty strings.
+    """
+    if column in INTEGER_COLUMNS:
+        numbers = pd.to_numeric(values, errors='coerce')
+        return ['' if pd.isna(number) else str(int(number)) for number in numbers]
+    if column in FLOAT_COLUMNS:
+        numbers = pd.to_numeric(values, errors='coerce')
+        return ['' if pd.isna(number) else repr(float(number)) for number in numbers]
+    if column in BOOLEAN_COLUMNS:
+        flags = values.astype(object).map({True: 'True', False: 'False', 'True': 'True', 'False': 'False'})
+        return ['' if pd.isna(flag) else flag for flag in flags]
+    # Text columns: a chunk with a missing value reads all-digit text such as a title
+    # of "1984" as the float 1984.0
+    return ['' if missing else str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+            for value, missing in zip(values.astype(object), values.isna())]
+
+def row_fingerprints(df: pd.DataFrame) -> pd.Series:
+    """
+    MD5 of each row's normalized source fields (see _fingerprint_text). A row hashes the
+    same whichever chunk it is read in.
+    """
+    columns = [column for column in FINGERPRINT_COLUMNS if column in df.columns]
+    texts = [_fingerprint_text(column, df[column]) for column in columns]
+    return pd.Series([hashlib.md5('\x1f'.join(values).encode('utf-8')).hexdigest() for values in zip(*texts)],
+                     index=df.index, dtype=object)
+
+# orjson decodes the nested list columns several times faster; json is the fallback
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+def safe_json_loads(s):
+    try:
+        return _json_loads(s) if isinstance(s, str) and s.startswith('[') else []
+    except ValueError:
+        return []
+
+def explode_nested(series: pd.Series) -> pd.DataFrame:
+    """
+    Parses a JSON list column exactly once into a normalized frame with one row per
+    list entry: (row, position, name). `row` is the label of the source row and
+    `position` the entry's index in its list. Entries are {"name": ...} objects or
+    plain strings; anything else is skipped. Values that are already lists (as in the
+    Parquet landing dataset) are used as they are.
+    """
+    rows, positions, names = [], [], []
+    for row, value in series.items():
+        entries = value if isinstance(value, (list, np.ndarray)) else safe_json_loads(value)
+        for position, entry in enumerate(entries):
+            name = entry.get('name') if isinstance(entry, dict) else entry
+            if isinstance(name, str) and name:
+                rows.append(row)
+                positions.append(position)
+                names.append(name)
+    return pd.DataFrame({'row': rows, 'position': np.array(positions, dtype=np.int32), 'name': names},
+                        columns=['row', 'position', 'name'])
+
+def build_fact_rows(df: pd.DataFrame, exploded: dict, key_maps: dict) -> pd.DataFrame:
+    """
+    Builds every fact_manga row at once. The primary key of each dimension is the
+    entry at position 0 of the row's list, resolved through the name -> id dict.
+    """
+    fact_rows = pd.DataFrame({
+        'manga_info_id': df['manga_info_id'],
+        'score': df['score'],
+        'scored_by': df['scored_by'],
+        'rank_val': df['rank'] if 'rank' in df.columns else None,
+        'popularity': df['popularity'] if 'popularity' in df.columns else None,
+        'members': df['members'],
+        'favorites': df['favorites'],
+        'volumes': df['volumes'],
+        'chapters': df['chapters'],
+    })
+    for column, _, id_column, _ in DIMENSIONS:
+        entries = exploded[column]
+        primary = entries[entries['position'] == 0]
+        primary_ids = pd.Series(primary['name'].map(key_maps[column]).to_numpy(), index=primary['row'].to_numpy())
+        fact_rows[f'primary_{id_column}'] = primary_ids.reindex(df.index).astype('Int64')
+    return fact_rows
+
+def build_secondary_genre_rows(df: pd.DataFrame, genres: pd.DataFrame, genre_ids: dict) -> pd.DataFrame:
+    """Builds the manga_secondary_genres rows: every genre after the first one of each manga."""
+    secondary = genres[genres['position'] > 0]
+    bridge_rows = pd.DataFrame({
+        'manga_info_id': df.loc[secondary['row'], 'manga_info_id'].to_numpy(),
+        'genre_id': secondary['name'].map(genre_ids).to_numpy(),
+    })
+    return bridge_rows.dropna().astype('int64').drop_duplicates()
+
+def build_bridge_rows(df: pd.DataFrame, entries: pd.DataFrame, key_map: dict, id_column: str) -> pd.DataFrame:
+    """
+    Builds the rows of a full bridge table by joining exploded entries to manga_info_id
+    and the dimension key: (manga_info_id, <id_column>, position). A name listed twice
+    for one manga keeps its first position.
+    """
+    bridge_rows = pd.DataFrame({
+        'manga_info_id': df.loc[entries['row'], 'manga_info_id'].to_numpy(),
+        id_column: entries['name'].map(key_map).to_numpy(),
+        'position': entries['position'].to_numpy(),
+    })
+    return bridge_rows.dropna().astype('int64').drop_duplicates(subset=['manga_info_id', id_column])
+
+MANGA_INFO_UPSERT = text("""
+    INSERT INTO dim_manga_info (mal_id, title, title_english, title_japanese,
+                                status, publishing, published_from,
+                                published_to, approved, url, type, row_hash)
+    VALUES (:mal_id, :title, :title_english, :title_japanese,
+            :status, :publishing, :published_from,
+            :published_to, :approved, :url, :type, :row_hash)
+    ON DUPLICATE KEY UPDATE
+        title=VALUES(title), title_english=VALUES(title_english),
+        title_japanese=VALUES(title_japanese),
+        status=VALUES(status), publishing=VALUES(publishing),
+        published_from=VALUES(published_from), published_to=VALUES(published_to),
+        approved=VALUES(approved), url=VALUES(url), type=VALUES(type),
+        row_hash=VALUES(row_hash);
+""")
+
+MANGA_TEXT_UPSERT = text("""
+    INSERT INTO dim_manga_text (manga_info_id, title_synonyms, synopsis, background, images)
+    VALUES (:manga_info_id, :title_synonyms, :synopsis, :background, :images)
+    ON DUPLICATE KEY UPDATE
+        title_synonyms=VALUES(title_synonyms), synopsis=VALUES(synopsis),
+        background=VALUES(background), images=VALUES(images);
+""")
+
+FACT_MANGA_UPSERT = text("""
+    INSERT INTO fact_manga (manga_info_id, score, scored_by, rank_val, popularity,
+                            members, favorites, volumes, chapters,
+                            primary_genre_id, primary_author_id,
+                            primary_demographic_id, primary_serialization_id)
+    VALUES (:manga_info_id, :score, :scored_by, :rank_val, :popularity,
+            :members, :favorites, :volumes, :chapters,
+            :primary_genre_id, :primary_author_id,
+            :primary_demographic_id, :primary_serialization_id)
+    ON DUPLICATE KEY UPDATE
+        score=VALUES(score), scored_by=VALUES(scored_by), rank_val=VALUES(rank_val),
+        popularity=VALUES(popularity), members=VALUES(members), favorites=VALUES(favorites),
+        volumes=VALUES(volumes), chapters=VALUES(chapters),
+        primary_genre_id=VALUES(primary_genre_id), primary_author_id=VALUES(primary_author_id),
+        primary_demographic_id=VALUES(primary_demographic_id),
+        primary_serialization_id=VALUES(primary_serialization_id);
+""")
+
+SECONDARY_GENRE_INSERT = text("""
+    INSERT IGNORE INTO manga_secondary_genres (manga_info_id, genre_id)
+    VALUES (:manga_info_id, :genre_id);
+""")
+
+BRIDGE_INSERTS = {
+    BRIDGE_TABLES[column]: text(f"""
+        INSERT IGNORE INTO {BRIDGE_TABLES[column]} (manga_info_id, {id_column}, position)
+        VALUES (:manga_info_id, :{id_column}, :position);
+    """)
+    for column, _, id_column, _ in DIMENSIONS
+}
+BRIDGE_INSERTS['manga_secondary_genres'] = SECONDARY_GENRE_INSERT
+
+# Rows per CSV chunk read by ingest_data; peak memory scales with it
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "10000"))
+# Threads (and pooled connections) loading dimensions and fact/bridge partitions
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+
+def build_manga_info_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalizes the dim_manga_info columns of a chunk of manga.csv, together with the
+    MANGA_TEXT_COLUMNS that are loaded into dim_manga_text.
+    """
+    # Dynamically select columns that exist in the DataFrame
+    manga_info_cols = [
+        'mal_id', 'title', 'title_english', 'title_japanese', 'title_synonyms',
+        'synopsis', 'background', 'status', 'published_from', 'published_to',
+        'url', 'type', 'row_hash'
+    ]
+
+    # Add 'approved' and 'images' if they exist in the DataFrame
+    if 'approved' in df.columns:
+        manga_info_cols.append('approved')
+    if 'images' in df.columns:
+        manga_info_cols.append('images')
+
+    manga_info_data = df[manga_info_cols].copy()
+    manga_info_data['publishing'] = (manga_info_data['status'] == 'Publishing').astype(int)
+
+    # Handle 'approved' column if it was not in original df
+    if 'approved' not in manga_info_data.columns:
+        manga_info_data['approved'] = False # Default value
+    else:
+        # Missing values are not approved (nullable booleans cannot cast NA to bool)
+        manga_info_data['approved'] = manga_info_data['approved'].fillna(False).astype(bool)
+
+    # Handle 'images' column if it was not in original df
+    if 'images' not in manga_info_data.columns:
+        manga_info_data['images'] = None
+
+    for column in ('published_from', 'published_to'):
+        dates = pd.to_datetime(manga_info_data[column], errors='coerce')
+        manga_info_data[column] = dates.dt.strftime('%Y-%m-%d').where(dates.notna(), None)
+    return manga_info_data
+
+def prepare_chunk(chunk: pd.DataFrame, known_hashes: dict, seen_mal_ids: set) -> dict:
+    """
+    CPU side of ingestion for one CSV chunk: fingerprints the rows, keeps only new or
+    changed manga, and normalizes them into dim_manga_info rows and exploded nested
+    columns. known_hashes and seen_mal_ids are updated so later chunks compare against
+    this one. Rows without a usable mal_id are dropped and counted as invalid.
+    """
+    # A missing mal_id comes through as NaN; such rows cannot be keyed and are skipped
+    mal_ids = pd.to_numeric(chunk['mal_id'], errors='coerce')
+    has_mal_id = mal_ids.notna()
+    n_invalid = int((~has_mal_id).sum())
+    chunk = chunk[has_mal_id].assign(mal_id=mal_ids[has_mal_id].astype('int64'))
+
+    # The last row of a repeated mal_id wins, as it did with row-by-row upserts
+    chunk = chunk.drop_duplicates(subset='mal_id', keep='last').reset_index(drop=True)
+    if 'row_hash' not in chunk.columns:
+        chunk['row_hash'] = row_fingerprints(chunk)
+
+    is_new = ~chunk['mal_id'].isin(known_hashes)
+    is_changed = ~is_new & (chunk['mal_id'].map(known_hashes) != chunk['row_hash'])
+    seen_mal_ids.update(chunk['mal_id'].tolist())
+    known_hashes.update(zip(chunk['mal_id'], chunk['row_hash']))
+
+    prepared = {
+        'n_rows': len(chunk) + n_invalid,
+        'invalid': n_invalid,
+        'inserted': int(is_new.sum()),
+        'updated': int(is_changed.sum()),
+        'skipped': int((~is_new & ~is_changed).sum()),
+        'updated_mal_ids': chunk.loc[is_changed, 'mal_id'].tolist(),
+    }
+    chunk = chunk[is_new | is_changed].reset_index(drop=True)
+    prepared['df'] = chunk
+    prepared['manga_info_rows'] = build_manga_info_rows(chunk)
+    # Parse every nested JSON column exactly once into (row, position, name) entries;
+    # dimension inserts, primary keys and bridge rows all use these frames
+    prepared['exploded'] = {column: explode_nested(chunk[column]) for column, _, _, _ in DIMENSIONS}
+    return prepared
+
+def _select_in(engine, query: str, values: list) -> pd.DataFrame:
     """
-    Reads the manga dataset from a CSV file and inserts it into MariaDB star schema.
+    Runs `query` with an expanding IN (:values) parameter, in slices the server accepts.
+    Each call uses a fresh connection so it sees the rows bulk_execute just committed.
+    """
+    statement = text(query).bindparams(bindparam('values', expanding=True))
+    with engine.connect() as connection:
+        frames = [pd.read_sql(statement, connection, params={'values': values[start:start + 5000]})
+                  for start in range(0, len(values), 5000)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+class _TableStats:
+    """
+    Accumulates rows and seconds per table across chunks and worker threads for the
+    final report. With concurrent loads the seconds are summed worker time.
+    """
+
+    def __init__(self, engine, batch_size):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def load(self, statement, rows, table_name, row_label=None):
+        start = time.perf_counter()
+        loaded, failed = bulk_execute(self.engine, statement, rows, table_name, self.batch_size,
+                                      row_label=row_label, report=False)
+        self.add(table_name, loaded, failed, time.perf_counter() - start)
+
+    def add(self, table_name, loaded, failed, seconds):
+        with self._lock:
+            totals = self.tables.setdefault(table_name, [0, 0, 0.0])
+            totals[0] += loaded
+            totals[1] += failed
+            totals[2] += seconds
+
+    def report(self):
+        for table_name, (loaded, failed, seconds) in self.tables.items():
+            rate = loaded / seconds if seconds > 0 else 0.0
+            print(f"{table_name}: {loaded} rows loaded, {failed} failed in {seconds:.2f}s ({rate:.0f} rows/s).")
+
+def load_dimension(engine, column, table, id_column, name_column, names, key_map: dict, stats: _TableStats) -> dict:
+    """
+    Bulk-inserts the names a dimension does not have yet and reads their ids back.
+    Returns the name -> id entries to add to the dimension's dict.
+    """
+    new_names = [name for name in names if name not in key_map]
+    if not new_names:
+        return {}
+    stats.load(text(f"INSERT IGNORE INTO {table} ({name_column}) VALUES (:{name_column})"),
+               [{name_column: name} for name in new_names], table)
+    new_keys = _select_in(engine, f"SELECT {id_column}, {name_column} FROM {table} WHERE {name_column} IN :values",
+                          new_names)
+    return dict(zip(new_keys[name_column], new_keys[id_column]))
+
+def manga_info_id_ranges(manga_info_ids, workers: int) -> list:
+    """Splits the ids into at most `workers` contiguous, similarly sized (low, high) ranges."""
+    ids = np.sort(np.asarray(manga_info_ids, dtype=np.int64))
+    bounds = np.linspace(0, len(ids), workers + 1).astype(int)
+    return [(ids[low], ids[high - 1]) for low, high in zip(bounds[:-1], bounds[1:]) if high > low]
+
+def _in_range(rows: pd.DataFrame, id_range) -> pd.DataFrame:
+    return rows[rows['manga_info_id'].between(*id_range)]
+
+def load_manga_partition(text_rows: pd.DataFrame, fact_rows: pd.DataFrame, updated_info_ids: pd.Series,
+                         bridges: dict, stats: _TableStats):
+    """
+    Loads the dim_manga_text, fact and bridge rows (bridge table -> rows) of one
+    manga_info_id range; ranges never share rows.
+    """
+    stats.load(MANGA_TEXT_UPSERT, text_rows, 'dim_manga_text',
+               row_label=lambda row: f"manga_info_id {row['manga_info_id']}")
+
+    # Upsert into fact_manga: one row per manga, updated in place
+    stats.load(FACT_MANGA_UPSERT, fact_rows, 'fact_manga',
+               row_label=lambda row: f"manga_info_id {row['manga_info_id']}")
+
+    # Bridge rows of changed manga are replaced as a whole
+    updated_rows = [{'manga_info_id': int(manga_info_id)} for manga_info_id in updated_info_ids]
+    for table, bridge_rows in bridges.items():
+        stats.load(text(f"DELETE FROM {table} WHERE manga_info_id = :manga_info_id"), updated_rows,
+                   f"{table} (deletes)")
+        stats.load(BRIDGE_INSERTS[table], bridge_rows, table)
+
+def write_chunk(engine, prepared: dict, key_maps: dict, stats: _TableStats,
+                executor: ThreadPoolExecutor, workers: int):
+    """
+    DB side of ingestion for one prepared chunk: upserts the manga, then loads the four
+    dimensions concurrently on `executor`, then the fact and bridge rows partitioned by
+    manga_info_id range across the same workers. The chunk's mart_manga_training rows are
+    refreshed last, on the calling thread: concurrent DELETEs of not yet existing keys
+    take gap locks that deadlock the INSERTs of neighbouring ranges.
+    """
+    if prepared['invalid']:
+        print(f"Skipping {prepared['invalid']} rows without a valid mal_id.")
+        stats.add('dim_manga_info', 0, prepared['invalid'], 0.0)
+    df = prepared['df']
+    if df.empty:
+        return
+    manga_info_rows = prepared['manga_info_rows']
+    stats.load(MANGA_INFO_UPSERT, manga_info_rows.drop(columns=MANGA_TEXT_COLUMNS), 'dim_manga_info',
+               row_label=lambda row: f"mal_id {row['mal_id']}")
+
+    # Get manga_info_id for later use
+    manga_info_map = _select_in(engine, "SELECT mal_id, manga_info_id FROM dim_manga_info WHERE mal_id IN :values",
+                                [int(mal_id) for mal_id in df['mal_id']])
+    df = df.merge(manga_info_map, on='mal_id', how='left')
+    exploded = prepared['exploded']
+    # Both frames keep the chunk's row order
+    text_rows = manga_info_rows[MANGA_TEXT_COLUMNS].assign(manga_info_id=df['manga_info_id'].to_numpy())
+
+    # The dimensions are independent tables: insert their new names and read the ids back in parallel
+    futures = {column: executor.submit(load_dimension, engine, column, table, id_column, name_column,
+                                       exploded[column]['name'].unique(), key_maps[column], stats)
+               for column, table, id_column, name_column in DIMENSIONS}
+    for column, future in futures.items():
+        key_maps[column].update(future.result())
+
+    fact_rows = build_fact_rows(df, exploded, key_maps)
+    bridges = {BRIDGE_TABLES[column]: build_bridge_rows(df, exploded[column], key_maps[column], id_column)
+               for column, _, id_column, _ in DIMENSIONS}
+    bridges['manga_secondary_genres'] = build_secondary_genre_rows(df, exploded['genres'], key_maps['genres'])
+    updated_info_ids = df.loc[df['mal_id'].isin(prepared['updated_mal_ids']), 'manga_info_id']
+    futures = [executor.submit(load_manga_partition, _in_range(text_rows, id_range), _in_range(fact_rows, id_range),
+                               updated_info_ids[updated_info_ids.between(*id_range)],
+                               {table: _in_range(rows, id_range) for table, rows in bridges.items()}, stats)
+               for id_range in manga_info_id_ranges(fact_rows['manga_info_id'], workers)]
+    for future in futures:
+        future.result()
+
+    # Only the manga of this chunk are rebuilt in the training mart
+    start = time.perf_counter()
+    refreshed = refresh_training_mart(engine, fact_rows['manga_info_id'])
+    stats.add('mart_manga_training', refreshed, 0, time.perf_counter() - start)
+
+def _read_chunks(source_chunks, known_hashes, seen_mal_ids, chunks: queue.Queue, stop: threading.Event):
+    """Producer: reads and prepares source chunks ahead of the writer, at most queue maxsize at a time."""
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    try:
+        for chunk in source_chunks:
+            if stop.is_set():
+                return
+            put(prepare_chunk(chunk, known_hashes, seen_mal_ids))
+        put(None)
+    except BaseException as e:
+        put(e)
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def ingest_data(batch_size=None, chunk_size=None, workers=None, landing_path=None):
+    """
+    Streams the manga dataset into the MariaDB star schema.
+
+    Reads the Parquet landing dataset at `landing_path`, which the DAG's
+    build_landing_zone task returns. Without one the CSV is converted here first (see
+    landing_zone.build_landing_zone, a no-op while the CSV is unchanged). It is read
+    in chunks of at most `chunk_size` rows (default INGEST_CHUNK_ROWS). A reader
+    thread normalizes chunk N+1 while chunk N is written, and at most two
+    prepared chunks wait in between, so memory is bounded by the chunk size rather than
+    the file size. Each chunk is written by `workers` threads (default INGEST_WORKERS),
+    each with its own pooled connection: the four dimensions load concurrently, then
+    the fact and bridge rows in disjoint manga_info_id ranges.
+
+    Ingestion is incremental: every source row is fingerprinted, and only new or changed
+    manga are upserted (fact_manga in place), while manga missing from the CSV are deleted.
+    Rows are written with bulk_execute: `batch_size` rows per executemany call and
+    transaction (default INGEST_BATCH_SIZE).
+    Returns the inserted/updated/deleted/skipped counts.
     """
     project_root = '/opt/airflow'
     raw_data_path = os.path.join(project_root, 'data', 'manga.csv')
+    chunk_size = chunk_size or INGEST_CHUNK_ROWS
+    workers = workers or INGEST_WORKERS
+    start = time.perf_counter()
 
-    print(f"Reading data from {raw_data_path}")
-    df = pd.read_csv(raw_data_path)
-    print("Data read successfully. Shape:", df.shape)
+    # Imported here: landing_zone builds on the parsing helpers of this module
+    from src.landing_zone import build_landing_zone, iter_landing_chunks
+    if landing_path is None:
+        landing_path = build_landing_zone(raw_data_path)
 
-    engine = get_db_engine()
+    # One connection per worker plus the one the main thread reads ids with
+    engine = get_db_engine(pool_size=workers + 1)
+    stats = _TableStats(engine, batch_size)
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'skipped': 0}
 
     with engine.connect() as connection:
-        print("Inserting into dim_manga_info...")
-        
-        # Dynamically select columns that exist in the DataFrame
-        manga_info_cols = [
-            'mal_id', 'title', 'title_english', 'title_japanese', 'title_synonyms',
-            'synopsis', 'background', 'status', 'published_from', 'published_to',
-            'url', 'type'
-        ]
-        
-        # Add 'approved' and 'images' if they exist in the DataFrame
-        if 'approved' in df.columns:
-            manga_info_cols.append('approved')
-        if 'images' in df.columns:
-            manga_info_cols.append('images')
-
-        manga_info_data = df[manga_info_cols].copy()
-        manga_info_data['publishing'] = manga_info_data['status'].apply(lambda x: 1 if x == 'Publishing' else 0)
-        
-        # Handle 'approved' column if it was not in original df
-        if 'approved' not in manga_info_data.columns:
-            manga_info_data['approved'] = False # Default value
-        else:
-            manga_info_data['approved'] = manga_info_data['approved'].astype(bool)
-
-        # Handle 'images' column if it was not in original df
-        if 'images' not in manga_info_data.columns:
-            manga_info_data['images'] = None 
-  
-        manga_info_data['published_from'] = pd.to_datetime(manga_info_data['published_from'], errors='coerce')
-        manga_info_data['published_to'] = pd.to_datetime(manga_info_data['published_to'], errors='coerce')
-
-        manga_info_data['published_from'] = manga_info_data['published_from'].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) else None)
-        manga_info_data['published_to'] = manga_info_data['published_to'].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) else None)
-
-        for index, row in manga_info_data.iterrows():
-            try:
-                params = row.to_dict()
-                params['published_from'] = params['published_from'] if pd.notna(params['published_from']) else None
-                params['published_to'] = params['published_to'] if pd.notna(params['published_to']) else None
-
-                insert_stmt = text("""
-                    INSERT INTO dim_manga_info (mal_id, title, title_english, title_japanese, title_synonyms,
-                                                synopsis, background, status, publishing, published_from,
-                                                published_to, approved, url, images, type)
-                    VALUES (:mal_id, :title, :title_english, :title_japanese, :title_synonyms,
-                            :synopsis, :background, :status, :publishing, :published_from,
-                            :published_to, :approved, :url, :images, :type)
-                    ON DUPLICATE KEY UPDATE
-                        title=VALUES(title), title_english=VALUES(title_english),
-                        title_japanese=VALUES(title_japanese), title_synonyms=VALUES(title_synonyms),
-                        synopsis=VALUES(synopsis), background=VALUES(background),
-                        status=VALUES(status), publishing=VALUES(publishing),
-                        published_from=VALUES(published_from), published_to=VALUES(published_to),
-                        approved=VALUES(approved), url=VALUES(url), images=VALUES(images), type=VALUES(type);
-                """)
-                connection.execute(insert_stmt, params)
-            except Exception as e:
-                print(f"Error inserting/updating manga_info for mal_id {row['mal_id']}: {e}")
-        print("dim_manga_info populated.")
-
-        # Get manga_info_id for later use
-        manga_info_map = pd.read_sql("SELECT mal_id, manga_info_id FROM dim_manga_info", connection)
-        df = df.merge(manga_info_map, on='mal_id', how='left')
-
-        # Process and insert into dim_genres
-        print("Inserting into dim_genres...")
-        # Ensure 'genres' column is treated as string and then parsed
-        def _safe_json_loads(s):
-            try:
-                return json.loads(s)
-            except json.decoder.JSONDecodeError:
-                return []
-        def safe_json_loads(s):
-            try:
-                return json.loads(s) if isinstance(s, str) and s.startswith('[') else []
-            except json.JSONDecodeError:
-                return []
-
-        unique_genres = df['genres'].astype(str).dropna().apply(safe_json_loads).explode().dropna().apply(lambda x: x['name'] if isinstance(x, dict) else x).unique()
-        for genre_name in unique_genres:
-            if genre_name:
-                insert_stmt = text("INSERT IGNORE INTO dim_genres (genre_name) VALUES (:genre_name)")
-                connection.execute(insert_stmt, {'genre_name': genre_name})
-        print("dim_genres populated.")
-
-        # Get genre_id for later use
-        genre_map = pd.read_sql("SELECT genre_id, genre_name FROM dim_genres", connection)
-
-        # Process and insert into dim_authors
-        print("Inserting into dim_authors...")
-        unique_authors = df['authors'].astype(str).dropna().apply(safe_json_loads).explode().dropna().apply(lambda x: x['name'] if isinstance(x, dict) else x).unique()
-        for author_name in unique_authors:
-            if author_name:
-                insert_stmt = text("INSERT IGNORE INTO dim_authors (author_name) VALUES (:author_name)")
-                connection.execute(insert_stmt, {'author_name': author_name})
-        print("dim_authors populated.")
-
-        # Get author_id for later use
-        author_map = pd.read_sql("SELECT author_id, author_name FROM dim_authors", connection)
-
-        # Process and insert into dim_demographics
-        print("Inserting into dim_demographics...")
-        unique_demographics = df['demographics'].astype(str).dropna().apply(safe_json_loads).explode().dropna().apply(lambda x: x['name'] if isinstance(x, dict) else x).unique()
-        for demo_name in unique_demographics:
-            if demo_name:
-                insert_stmt = text("INSERT IGNORE INTO dim_demographics (demographic_name) VALUES (:demographic_name)")
-                connection.execute(insert_stmt, {'demographic_name': demo_name})
-        print("dim_demographics populated.")
-
-        # Get demographic_id for later use
-        demographic_map = pd.read_sql("SELECT demographic_id, demographic_name FROM dim_demographics", connection)
-
-        # Process and insert into dim_serializations
-        print("Inserting into dim_serializations...")
-        unique_serializations = df['serializations'].astype(str).dropna().apply(safe_json_loads).explode().dropna().apply(lambda x: x['name'] if isinstance(x, dict) else x).unique()
-        for ser_name in unique_serializations:
-            if ser_name:
-                insert_stmt = text("INSERT IGNORE INTO dim_serializations (serialization_name) VALUES (:serialization_name)")
-                connection.execute(insert_stmt, {'serialization_name': ser_name})
-        print("dim_serializations populated.")
-
-        # Get serialization_id for later use
-        serialization_map = pd.read_sql("SELECT serialization_id, serialization_name FROM dim_serializations", connection)
-
-        # Insert into fact_manga
-        print("Inserting into fact_manga...")
-        for index, row in df.iterrows():
-            primary_genre_id = None
-            genres_list = safe_json_loads(row['genres'])
-            if genres_list and isinstance(genres_list[0], dict) and 'name' in genres_list[0]:
-                primary_genre_name = genres_list[0]['name']
-                primary_genre_id = genre_map[genre_map['genre_name'] == primary_genre_name]['genre_id'].iloc[0]
-
-            primary_author_id = None
-            authors_list = safe_json_loads(row['authors'])
-            if authors_list and isinstance(authors_list[0], dict) and 'name' in authors_list[0]:
-                primary_author_name = authors_list[0]['name']
-                primary_author_id = author_map[author_map['author_name'] == primary_author_name]['author_id'].iloc[0]
-
-            primary_demographic_id = None
-            demographics_list = safe_json_loads(row['demographics'])
-            if demographics_list and isinstance(demographics_list[0], dict) and 'name' in demographics_list[0]:
-                primary_demographic_name = demographics_list[0]['name']
-                primary_demographic_id = demographic_map[demographic_map['demographic_name'] == primary_demographic_name]['demographic_id'].iloc[0]
-
-            primary_serialization_id = None
-            serializations_list = safe_json_loads(row['serializations'])
-            if serializations_list and isinstance(serializations_list[0], dict) and 'name' in serializations_list[0]:
-                primary_serialization_name = serializations_list[0]['name']
-                primary_serialization_id = serialization_map[serialization_map['serialization_name'] == primary_serialization_name]['serialization_id'].iloc[0]
-
-            insert_stmt = text("""
-                INSERT INTO fact_manga (manga_info_id, score, scored_by, rank_val, popularity,
-                                        members, favorites, volumes, chapters,
-                                        primary_genre_id, primary_author_id,
-                                        primary_demographic_id, primary_serialization_id)
-                VALUES (:manga_info_id, :score, :scored_by, :rank_val, :popularity,
-                        :members, :favorites, :volumes, :chapters,
-                        :primary_genre_id, :primary_author_id,
-                        :primary_demographic_id, :primary_serialization_id);
-            """)
-            connection.execute(insert_stmt, {
-                'manga_info_id': row['manga_info_id'],
-                'score': row['score'],
-                'scored_by': row['scored_by'],
-                'rank_val': row.get('rank'), # Use .get() to avoid KeyError
-                'popularity': row.get('popularity'), # Use .get() to avoid KeyError
-                'members': row['members'],
-                'favorites': row['favorites'],
-                'volumes': row['volumes'],
-                'chapters': row['chapters'],
-                'primary_genre_id': primary_genre_id,
-                'primary_author_id': primary_author_id,
-                'primary_demographic_id': primary_demographic_id,
-                'primary_serialization_id': primary_serialization_id
-            })
-        print("fact_manga populated.")
-
-        # Insert into manga_secondary_genres (bridge table)
-        print("Inserting into manga_secondary_genres...")
-        for index, row in df.iterrows():
-            genres_list = safe_json_loads(row['genres'])
-            if genres_list and len(genres_list) > 1:
-                for genre_dict in genres_list[1:]: # Secondary genres
-                    if isinstance(genre_dict, dict) and 'name' in genre_dict:
-                        genre_name = genre_dict['name']
-                        genre_id = genre_map[genre_map['genre_name'] == genre_name]['genre_id'].iloc[0]
-                        insert_stmt = text("""
-                            INSERT IGNORE INTO manga_secondary_genres (manga_info_id, genre_id)
-                            VALUES (:manga_info_id, :genre_id);
-                        """)
-                        connection.execute(insert_stmt, {'manga_info_id': row['manga_info_id'], 'genre_id': genre_id})
-        print("manga_secondary_genres populated.")
-
-    print("Data ingestion to MariaDB complete.")
+        # Fingerprints of the previous load; a manga without a fact row (e.g. an
+        # interrupted run) has no valid fingerprint and is reloaded
+        existing = pd.read_sql("""
+            SELECT d.mal_id, d.manga_info_id,
+                   CASE WHEN f.manga_info_id IS NULL THEN NULL ELSE d.row_hash END AS row_hash
+            FROM dim_manga_info d
+            LEFT JOIN fact_manga f ON f.manga_info_id = d.manga_info_id
+        """, connection)
+        known_hashes = dict(zip(existing['mal_id'], existing['row_hash']))
+        existing_info_ids = dict(zip(existing['mal_id'], existing['manga_info_id']))
+        del existing
+
+        # Dimension name -> id dicts, extended as chunks bring new names
+        key_maps = {}
+        for column, table, id_column, name_column in DIMENSIONS:
+            key_map = pd.read_sql(f"SELECT {id_column}, {name_column} FROM {table}", connection)
+            key_maps[column] = dict(zip(key_map[name_column], key_map[id_column]))
+
+    print(f"Streaming {landing_path} in chunks of {chunk_size} rows...")
+    source_chunks = iter_landing_chunks(landing_path, chunk_size)
+    seen_mal_ids = set()
+    chunks = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_chunks, name='csv-reader', daemon=True,
+                              args=(source_chunks, known_hashes, seen_mal_ids, chunks, stop))
+    reader.start()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest-writer')
+    n_rows = n_chunks = 0
+    try:
+        while True:
+            prepared = chunks.get()
+            if prepared is None:
+                break
+            if isinstance(prepared, BaseException):
+                raise prepared
+            write_chunk(engine, prepared, key_maps, stats, executor, workers)
+            n_chunks += 1
+            n_rows += prepared['n_rows']
+            for key in ('inserted', 'updated', 'skipped'):
+                counts[key] += prepared[key]
+            print(f"Chunk {n_chunks}: {prepared['n_rows']} rows ({prepared['inserted']} new, "
+                  f"{prepared['updated']} changed), peak RSS {_peak_rss_mb():.0f} MB")
+    finally:
+        stop.set()
+        reader.join()
+        executor.shutdown()
+
+    # Manga that disappeared from the source; bridge and fact rows before the dimension
+    removed_rows = [{'manga_info_id': int(manga_info_id)} for mal_id, manga_info_id in existing_info_ids.items()
+                    if mal_id not in seen_mal_ids]
+    counts['deleted'] = len(removed_rows)
+    if removed_rows:
+        print(f"Deleting {len(removed_rows)} removed manga...")
+        for table in ['mart_manga_training'] + list(BRIDGE_INSERTS) + ['fact_manga', 'dim_manga_text', 'dim_manga_info']:
+            stats.load(text(f"DELETE FROM {table} WHERE manga_info_id = :manga_info_id"),
+                       removed_rows, f"{table} (deletes)")
+
+    stats.report()
+    report_pool_stats(engine)
+    elapsed = time.perf_counter() - start
+    print(f"Data ingestion to MariaDB complete: {counts['inserted']} inserted, {counts['updated']} updated, "
+          f"{counts['deleted']} deleted, {counts['skipped']} skipped.")
+    print(f"Read {n_rows} landing rows in {n_chunks} chunks in {elapsed:.1f}s "
+          f"({n_rows / elapsed if elapsed > 0 else 0:.0f} rows/s), peak RSS {_peak_rss_mb():.0f} MB.")
+    return counts
 
 if __name__ == '__main__':
     ingest_data()
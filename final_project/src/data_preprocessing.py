@@ -1,59 +1,300 @@
 import pandas as pd
 import os
-from src.database_utils import get_db_engine
+import re
+import hashlib
+from sqlalchemy import text
+from src.database_utils import get_db_engine, MART_COLUMNS, MANGA_TEXT_COLUMNS
+from src.parquet_artifacts import ArtifactWriter, read_partition_manifest, write_partition_manifest
 
-def preprocess_data():
+# Adds the multi-hot genre and author count features of the bridge tables to the
+# processed data, for analysis. Off by default: model_training reads only
+# parquet_artifacts.TRAINING_FEATURES, the fixed feature set of the served API, so the
+# bridge features are not used for training.
+PREPROCESS_BRIDGE_FEATURES = os.getenv("PREPROCESS_BRIDGE_FEATURES", "0") == "1"
+
+# Rows fetched from the server-side cursor and cleaned at a time; parquet_artifacts sets the row groups
+PREPROCESS_CHUNK_ROWS = int(os.getenv("PREPROCESS_CHUNK_ROWS", "50000"))
+
+# Rewrite only the partitions of manga_processed changed since the last run's high-water mark
+PREPROCESS_INCREMENTAL = os.getenv("PREPROCESS_INCREMENTAL", "1") == "1"
+# manga_info_ids per partition of manga_processed
+PREPROCESS_PARTITION_IDS = int(os.getenv("PREPROCESS_PARTITION_IDS", "10000"))
+# The high-water mark is moved back by this much, for mart refreshes that commit after a later one was read
+PREPROCESS_WATERMARK_LAG_SECONDS = int(os.getenv("PREPROCESS_WATERMARK_LAG_SECONDS", "600"))
+# Version of the manga_processed layout written by build_processed_dataset
+PROCESSED_FORMAT_VERSION = 1
+
+def bridge_feature_sql(genres: pd.DataFrame):
+    """
+    Builds the SELECT columns and LEFT JOINs that add the bridge table features to the
+    mart_manga_training query (alias m), all aggregated in SQL:
+
+      genre_<name>        1 if the manga has the genre, one column per row of `genres`
+      n_genres, n_authors number of genres and authors of the manga
+      author_max_works    works of the manga's most prolific author
+      author_total_works  works of all of its authors together
+    """
+    genre_columns, used = [], set()
+    for genre_id, genre_name in genres[['genre_id', 'genre_name']].itertuples(index=False, name=None):
+        column = 'genre_' + (re.sub(r'[^0-9a-z]+', '_', str(genre_name).lower()).strip('_') or str(genre_id))
+        if column in used:
+            column = f"{column}_{genre_id}"
+        used.add(column)
+        genre_columns.append((int(genre_id), column))
+
+    genre_sums = ''.join(f", SUM(genre_id = {genre_id}) AS `{column}`" for genre_id, column in genre_columns)
+    select = ''.join(f",\n            COALESCE(gf.`{column}`, 0) AS `{column}`" for _, column in genre_columns)
+    select += """,
+            COALESCE(gf.n_genres, 0) AS n_genres,
+            COALESCE(af.n_authors, 0) AS n_authors,
+            COALESCE(af.author_max_works, 0) AS author_max_works,
+            COALESCE(af.author_total_works, 0) AS author_total_works"""
+    joins = f"""
+        LEFT JOIN (
+            SELECT manga_info_id, COUNT(*) AS n_genres{genre_sums}
+            FROM manga_genres
+            GROUP BY manga_info_id
+        ) gf ON gf.manga_info_id = m.manga_info_id
+        LEFT JOIN (
+            SELECT ma.manga_info_id, COUNT(*) AS n_authors,
+                   MAX(w.works) AS author_max_works, SUM(w.works) AS author_total_works
+            FROM manga_authors ma
+            JOIN (SELECT author_id, COUNT(*) AS works FROM manga_authors GROUP BY author_id) w
+                ON w.author_id = ma.author_id
+            GROUP BY ma.manga_info_id
+        ) af ON af.manga_info_id = m.manga_info_id"""
+    return select, joins
+
+def clean_chunk(chunk: pd.DataFrame, seen_mal_ids: set):
+    """
+    Drops the rows of a mal_id already seen in this or an earlier chunk (the first row
+    wins, as with one drop_duplicates over the whole table), then the rows whose score
+    is missing or not numeric. seen_mal_ids is updated with the chunk's mal_ids.
+    Returns the cleaned chunk and the number of duplicates dropped.
+    """
+    keys = chunk['mal_id'].astype(object).where(chunk['mal_id'].notna(), None)
+    # Set lookups per key; Series.isin would copy the whole running set into an array on every chunk
+    is_seen = pd.Series([key in seen_mal_ids for key in keys.tolist()], index=keys.index, dtype=bool)
+    is_first = ~keys.duplicated() & ~is_seen
+    seen_mal_ids.update(keys[is_first].tolist())
+    deduplicated = chunk[is_first].copy()
+    deduplicated['score'] = pd.to_numeric(deduplicated['score'], errors='coerce')
+    return deduplicated.dropna(subset=['score']), len(chunk) - len(deduplicated)
+
+def partition_file(partition: int) -> str:
+    return f"part-{partition:05d}.parquet"
+
+def write_partitions(chunks, dataset_dir: str, partition_ids: int, seen_mal_ids: set, counts: dict) -> dict:
+    """
+    Cleans chunks ordered by manga_info_id with clean_chunk and writes them to one file
+    per range of `partition_ids` ids through an ArtifactWriter, so memory is bounded by
+    the chunk size whatever the table size. Adds to `counts`; returns
+    {file name: {partition, source_rows, rows}} of the partitions written.
+    """
+    written, writer, partition, source_rows = {}, None, None, 0
+
+    def finish():
+        writer.close()
+        written[partition_file(partition)] = {'partition': partition, 'source_rows': source_rows,
+                                              'rows': writer.rows}
+        counts['written'] += writer.rows
+        counts['row_groups'] += writer.row_groups
+
+    try:
+        for chunk in chunks:
+            for key, rows in chunk.groupby(chunk['manga_info_id'] // partition_ids, sort=False):
+                if key != partition:
+                    if writer is not None:
+                        finish()
+                    partition, source_rows = int(key), 0
+                    writer = ArtifactWriter(os.path.join(dataset_dir, partition_file(partition)))
+                cleaned, duplicates = clean_chunk(rows, seen_mal_ids)
+                writer.write(cleaned)
+                source_rows += len(rows)
+                counts['read'] += len(rows)
+                counts['duplicates'] += duplicates
+                counts['missing_score'] += len(rows) - duplicates - len(cleaned)
+        if writer is not None:
+            finish()
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        raise
+    return written
+
+def _read_chunks(engine, query: str, chunk_size: int):
+    """Streams a query through a server-side cursor in DataFrames of chunk_size rows."""
+    with engine.connect() as connection:
+        connection = connection.execution_options(stream_results=True)
+        for chunk in pd.read_sql(text(query), connection, chunksize=chunk_size):
+            yield chunk
+
+def _partition_query(partition_ids: int, where='') -> str:
+    start = f"manga_info_id - manga_info_id % {partition_ids}"
+    return f"SELECT {start} AS partition_start, COUNT(*) AS source_rows FROM mart_manga_training {where} GROUP BY {start}"
+
+def mart_partitions(engine, partition_ids: int, refreshed_since=None) -> dict:
+    """
+    Rows per partition of mart_manga_training, {partition: source_rows}, from its primary
+    key; with refreshed_since only the rows refreshed after it, from the refreshed_at
+    index.
+    """
+    where, params = '', {}
+    if refreshed_since is not None:
+        where, params = "WHERE refreshed_at > :since", {'since': refreshed_since}
+    with engine.connect() as connection:
+        rows = connection.execute(text(_partition_query(partition_ids, where)), params).fetchall()
+    return {int(start) // partition_ids: int(source_rows) for start, source_rows in rows}
+
+def build_processed_dataset(engine, query: str, dataset_dir: str, incremental=True, partition_ids=None,
+                            chunk_size=None, watermark_lag_seconds=None) -> dict:
+    """
+    Writes the rows of `query` (a SELECT from mart_manga_training m with a {where}
+    placeholder before its ORDER BY m.manga_info_id) to a Parquet dataset in
+    `dataset_dir`, one file per range of `partition_ids` manga_info_ids, described by a
+    manifest (parquet_artifacts.PARTITION_MANIFEST).
+
+    The manifest keeps the high-water mark of mart_manga_training.refreshed_at of the
+    run. An incremental run only rewrites the partitions with rows refreshed since then
+    (less watermark_lag_seconds, for refreshes that committed late) or whose row count
+    changed, which catches deletions; partitions left without rows are removed. A full
+    run rewrites every partition; it is used without a manifest, or when the query or
+    the partitioning differ from the manifest's. Returns the new manifest, whose
+    'changed' and 'removed' list the partition files of this run.
+    """
+    partition_ids = partition_ids or PREPROCESS_PARTITION_IDS
+    chunk_size = chunk_size or PREPROCESS_CHUNK_ROWS
+    lag = PREPROCESS_WATERMARK_LAG_SECONDS if watermark_lag_seconds is None else watermark_lag_seconds
+    fingerprint = hashlib.sha256(f"{PROCESSED_FORMAT_VERSION}|{partition_ids}|{query}".encode()).hexdigest()
+
+    if os.path.isfile(dataset_dir):
+        # Single-file manga_processed of earlier versions
+        os.remove(dataset_dir)
+    os.makedirs(dataset_dir, exist_ok=True)
+    previous = read_partition_manifest(dataset_dir)
+
+    # Taken before any row is read: rows refreshed while the run reads are read again next time
+    with engine.connect() as connection:
+        watermark = connection.execute(text("SELECT MAX(refreshed_at) FROM mart_manga_training")).scalar()
+    watermark = None if watermark is None else str(pd.Timestamp(watermark))
+
+    counts = {'read': 0, 'duplicates': 0, 'missing_score': 0, 'written': 0, 'row_groups': 0}
+    # The mart keeps mal_id unique, so partitions rewritten alone stay free of duplicates
+    seen_mal_ids = set()
+    if (incremental and previous is not None and previous.get('format_version') == PROCESSED_FORMAT_VERSION
+            and previous.get('fingerprint') == fingerprint and previous.get('watermark')):
+        mode = 'incremental'
+        since = (pd.Timestamp(previous['watermark']) - pd.Timedelta(seconds=lag)).strftime('%Y-%m-%d %H:%M:%S')
+        partitions = dict(previous['partitions'])
+        source_rows = mart_partitions(engine, partition_ids)
+        known_rows = {entry['partition']: entry['source_rows'] for entry in partitions.values()}
+        affected = set(mart_partitions(engine, partition_ids, refreshed_since=since))
+        affected |= {partition for partition in set(source_rows) | set(known_rows)
+                     if source_rows.get(partition) != known_rows.get(partition)}
+        print(f"Incremental run: {len(affected)} of {len(set(source_rows) | set(known_rows))} partitions "
+              f"refreshed after {since} or changed in size.")
+        written = {}
+        for partition in sorted(affected):
+            if partition in source_rows:
+                where = (f"WHERE m.manga_info_id >= {partition * partition_ids} "
+                         f"AND m.manga_info_id < {(partition + 1) * partition_ids}")
+                written.update(write_partitions(_read_chunks(engine, query.format(where=where), chunk_size),
+                                                dataset_dir, partition_ids, seen_mal_ids, counts))
+        removed = [partition_file(partition) for partition in sorted(affected)
+                   if partition_file(partition) not in written]
+    else:
+        mode = 'full'
+        print(f"Full run: rewriting every partition of {partition_ids} manga_info_ids.")
+        written = write_partitions(_read_chunks(engine, query.format(where=''), chunk_size),
+                                   dataset_dir, partition_ids, seen_mal_ids, counts)
+        if not written:
+            raise ValueError("No rows read from mart_manga_training.")
+        partitions = {}
+        removed = sorted(name for name in os.listdir(dataset_dir)
+                         if name.startswith('part-') and name.endswith('.parquet') and name not in written)
+
+    partitions.update(written)
+    for name in removed:
+        partitions.pop(name, None)
+        if os.path.exists(os.path.join(dataset_dir, name)):
+            os.remove(os.path.join(dataset_dir, name))
+
+    manifest = {"format_version": PROCESSED_FORMAT_VERSION, "fingerprint": fingerprint,
+                "partition_ids": partition_ids, "mode": mode, "watermark": watermark,
+                "rows": sum(entry['rows'] for entry in partitions.values()),
+                "changed": sorted(written), "removed": removed, "counts": counts,
+                "partitions": dict(sorted(partitions.items()))}
+    write_partition_manifest(dataset_dir, manifest)
+    return manifest
+
+def preprocess_data(bridge_features=None, include_text=False, chunk_size=None, incremental=None):
     """
     Reads data from MariaDB, preprocesses it, and saves it to a processed area.
+    The data comes from mart_manga_training, which ingestion keeps up to date, in one
+    scan of its primary key. With bridge_features (default PREPROCESS_BRIDGE_FEATURES) the multi-hot genre and
+    author count features of bridge_feature_sql are added. The large text attributes
+    of dim_manga_text are only read with include_text=True; nothing downstream models them.
+    Rows come from a server-side cursor in chunks of chunk_size (default
+    PREPROCESS_CHUNK_ROWS) and are cleaned and written one chunk at a time.
+
+    manga_processed.parquet is a directory of manga_info_id range partitions. With
+    incremental (default PREPROCESS_INCREMENTAL) only the partitions changed since the
+    last run are rewritten, see build_processed_dataset. Returns the changed and removed
+    partitions for the downstream tasks; they are also in the directory's manifest.
     """
+    if bridge_features is None:
+        bridge_features = PREPROCESS_BRIDGE_FEATURES
+    if incremental is None:
+        incremental = PREPROCESS_INCREMENTAL
+    if bridge_features and incremental:
+        # author_max_works / author_total_works of a manga change with other manga's rows
+        print("Bridge table features span partitions; running a full rebuild.")
+        incremental = False
     processed_data_dir = '/opt/airflow/data/processed'
     processed_data_path = os.path.join(processed_data_dir, 'manga_processed.parquet')
 
     print("Connecting to MariaDB to read data...")
-    engine = get_db_engine()
-    
-    query = """
-        SELECT 
-            mi.*,
-            fm.score, fm.scored_by, fm.rank_val, fm.popularity, fm.members, fm.favorites,
-            fm.volumes, fm.chapters,
-            g.genre_name as primary_genre,
-            a.author_name as primary_author,
-            d.demographic_name as primary_demographic,
-            s.serialization_name as primary_serialization
-        FROM fact_manga fm
-        JOIN dim_manga_info mi ON fm.manga_info_id = mi.manga_info_id
-        LEFT JOIN dim_genres g ON fm.primary_genre_id = g.genre_id
-        LEFT JOIN dim_authors a ON fm.primary_author_id = a.author_id
-        LEFT JOIN dim_demographics d ON fm.primary_demographic_id = d.demographic_id
-        LEFT JOIN dim_serializations s ON fm.primary_serialization_id = s.serialization_id;
-    """
-    
-    df = pd.read_sql(query, engine)
-    print("Data read successfully from MariaDB. Shape:", df.shape)
-
-    # Drop duplicates based on mal_id to ensure unique manga entries
-    df.drop_duplicates(subset=['mal_id'], inplace=True)
-    print("Rows after dropping mal_id duplicates:", df.shape)
-
-    # --- Preprocessing Steps ---
-
-    # 1. Handle missing scores
-    print(f"Converting 'score' to numeric and dropping NaNs. Original rows: {len(df)}")
-    df['score'] = pd.to_numeric(df['score'], errors='coerce')
-    df.dropna(subset=['score'], inplace=True)
-    print(f"Rows after dropping missing scores: {len(df)}")
-
-    # --- End of Preprocessing ---
-
-    print("Data preprocessing complete.")
-    
+    # Server-side cursors need PyMySQL; SQLAlchemy buffers mysqlconnector results in full
+    engine = get_db_engine(driver="pymysql")
+
+    feature_select, feature_joins = '', ''
+    if bridge_features:
+        with engine.connect() as connection:
+            genres = pd.read_sql(text("SELECT genre_id, genre_name FROM dim_genres ORDER BY genre_id"), connection)
+        feature_select, feature_joins = bridge_feature_sql(genres)
+        print(f"Adding bridge table features for {len(genres)} genres.")
+
+    columns = ', '.join(f"m.{column}" for column in MART_COLUMNS)
+    if include_text:
+        columns += ''.join(f", t.{column}" for column in MANGA_TEXT_COLUMNS)
+        feature_joins = "\n        LEFT JOIN dim_manga_text t ON t.manga_info_id = m.manga_info_id" + feature_joins
+    query = f"""
+        SELECT {columns}{feature_select}
+        FROM mart_manga_training m{feature_joins}
+        {{where}}
+        ORDER BY m.manga_info_id
+    """
+
     # Ensure the processed directory exists
     os.makedirs(processed_data_dir, exist_ok=True)
 
-    print(f"Saving processed data to {processed_data_path}")
-    df.to_parquet(processed_data_path, index=False)
-    print("Processed data saved successfully.")
+    # --- Preprocessing Steps, chunk by chunk ---
+    # 1. Drop duplicates based on mal_id to ensure unique manga entries
+    # 2. Convert 'score' to numeric and drop rows without one
+    print(f"Streaming mart_manga_training in chunks of {chunk_size or PREPROCESS_CHUNK_ROWS} rows "
+          f"to {processed_data_path}")
+    manifest = build_processed_dataset(engine, query, processed_data_path, incremental=incremental,
+                                       chunk_size=chunk_size)
+    counts = manifest['counts']
+
+    print(f"Rows read from MariaDB: {counts['read']}")
+    print(f"Rows dropped as mal_id duplicates: {counts['duplicates']}")
+    print(f"Rows dropped for missing scores: {counts['missing_score']}")
+    print(f"Data preprocessing complete ({manifest['mode']} run). {len(manifest['changed'])} partitions "
+          f"rewritten and {len(manifest['removed'])} removed; {manifest['rows']} rows in "
+          f"{len(manifest['partitions'])} partitions, watermark {manifest['watermark']}.")
+    return {'mode': manifest['mode'], 'watermark': manifest['watermark'],
+            'changed': manifest['changed'], 'removed': manifest['removed']}
 
 if __name__ == '__main__':
     preprocess_data()
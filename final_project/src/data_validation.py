@@ -4,6 +4,8 @@ import pandas as pd
 # import mysql.connector
 from typing import Dict, List
 from tabulate import tabulate
+from src.database_utils import MANGA_TEXT_COLUMNS
+from src.parquet_artifacts import read_artifact, partition_paths
 import argparse
 
 # Setup logging for Airflow
@@ -16,9 +18,11 @@ logger = logging.getLogger(__name__)
 # DB_PASSWORD = "manga_password"
 # DB_NAME = "manga_db"
 
-def validate_data(file_path: str) -> Dict[str, List[str]]:
+def validate_data(file_path: str, changed_only: bool = False) -> Dict[str, List[str]]:
     """
-    Validates data in a Parquet file for an Airflow task.
+    Validates data in a Parquet file for an Airflow task. With changed_only, file_path
+    is a partitioned dataset and only the partitions its last write changed are checked;
+    the others passed when they were written, and partitions never share a manga_info_id.
     Returns a dictionary with validation results.
     Raises ValueError if validation fails.
     """
@@ -26,8 +30,13 @@ def validate_data(file_path: str) -> Dict[str, List[str]]:
     validation_summary = []  # For table output
 
     try:
-        # Load data from Parquet file
-        df = pd.read_parquet(file_path)
+        # Load data from Parquet file; the free-text columns may be missing and manga_info_id
+        # is checked unique, so none of the checks need them
+        source = partition_paths(file_path, changed_only=True) if changed_only else file_path
+        if not source:
+            logger.info(f"No partitions of {file_path} changed; nothing to validate.")
+            return validation_results
+        df = read_artifact(source, exclude=MANGA_TEXT_COLUMNS)
         logger.info(f"Data read successfully from {file_path}. Shape: {df.shape}")
         logger.info("Data preview:")
         logger.info(df.head().to_string())
@@ -139,10 +148,12 @@ def validate_data(file_path: str) -> Dict[str, List[str]]:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Validate data in a Parquet file.')
     parser.add_argument('--file_path', required=True, help='Path to the Parquet file to validate.')
+    parser.add_argument('--changed_only', action='store_true',
+                        help='Only validate the partitions of a partitioned dataset changed by its last write.')
     args = parser.parse_args()
 
     try:
-        result = validate_data(args.file_path)
+        result = validate_data(args.file_path, args.changed_only)
         logger.info(f"Validation result for file {args.file_path}: {result}")
     except (ValueError) as e:
         logger.error(f"Operation failed: {str(e)}")
@@ -1,6 +1,11 @@
 import sqlalchemy
 from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+from urllib.parse import quote_plus
 import pandas as pd
+import numpy as np
+import threading
+import time
 import os
 
 # Database connection details (from docker-compose.yml)
@@ -9,119 +14,505 @@ DB_PASSWORD = os.getenv("MARIADB_PASSWORD", "manga_password")
 DB_HOST = os.getenv("MARIADB_HOST", "mariadb") # Service name in docker-compose
 DB_PORT = os.getenv("MARIADB_PORT", "3306")
 DB_NAME = os.getenv("MARIADB_DATABASE", "manga_db")
+# DBAPI driver: mysqlconnector (mysql-connector-python) or pymysql
+DB_DRIVER = os.getenv("MARIADB_DRIVER", "mysqlconnector")
 
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Connection pool of every engine handed out by get_db_engine
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Checkouts that wait longer than this for a free connection are logged
+DB_POOL_SLOW_CHECKOUT_SECONDS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_SECONDS", "0.1"))
 
-def get_db_engine():
-    """Establishes and returns a SQLAlchemy engine for MariaDB."""
-    print(f"Attempting to connect to MariaDB at {DB_HOST}:{DB_PORT}/{DB_NAME}")
-    engine = create_engine(DATABASE_URL)
-    try:
-        with engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
-        print("Successfully connected to MariaDB.")
+def database_url(driver=None, user=None, password=None, host=None, port=None, database=None):
+    """Builds a MariaDB URL; every part defaults to the MARIADB_* settings above."""
+    password = quote_plus(DB_PASSWORD if password is None else password)
+    return (f"mysql+{driver or DB_DRIVER}://{user or DB_USER}:{password}@"
+            f"{host or DB_HOST}:{port or DB_PORT}/{database or DB_NAME}")
+
+DATABASE_URL = database_url()
+
+# Rows sent per executemany call / transaction by bulk_execute
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+
+class PoolStats:
+    """Checkout counts and wait times of one engine's pool, for sizing it."""
+
+    def __init__(self, name):
+        self.name = name
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def record(self, pool, wait):
+        checked_out = pool.checkedout()
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+        if wait > DB_POOL_SLOW_CHECKOUT_SECONDS:
+            print(f"{self.name}: waited {wait:.3f}s for a pooled connection "
+                  f"({checked_out} checked out, pool_size {pool.size()}, overflow {pool.overflow()}).")
+
+    def report(self):
+        mean_wait = self.total_wait / self.checkouts if self.checkouts else 0.0
+        print(f"{self.name}: {self.checkouts} checkouts, wait mean {mean_wait * 1000:.1f} ms / "
+              f"max {self.max_wait * 1000:.1f} ms, peak {self.peak_checked_out} connections checked out.")
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+    stats = None
+
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        if self.stats is not None:
+            self.stats.record(self, time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+# Process-wide engines, keyed by (pid, URL, pool settings); a forked task process
+# (Airflow LocalExecutor) never reuses the connections of its parent
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+def get_db_engine(pool_size=None, max_overflow=None, driver=None, **url_parts):
+    """
+    Returns the process-wide SQLAlchemy engine for MariaDB, creating and probing it on
+    first use. Engines are cached per URL and pool settings: pool_size / max_overflow
+    (default DB_POOL_SIZE / DB_MAX_OVERFLOW), pre-ping and recycling come from the
+    DB_POOL_* settings. `driver` and `url_parts` (user, password, host, port, database)
+    override the MARIADB_* connection details.
+    """
+    url = database_url(driver=driver, **url_parts)
+    pool_size = DB_POOL_SIZE if pool_size is None else pool_size
+    max_overflow = DB_MAX_OVERFLOW if max_overflow is None else max_overflow
+    key = (os.getpid(), url, pool_size, max_overflow)
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is not None:
+            return engine
+
+        engine_url = sqlalchemy.engine.make_url(url)
+        print(f"Attempting to connect to MariaDB at {engine_url.host}:{engine_url.port}/{engine_url.database} "
+              f"({engine_url.drivername}, pool_size {pool_size}, max_overflow {max_overflow})")
+        engine = create_engine(url, poolclass=TimedQueuePool, pool_size=pool_size, max_overflow=max_overflow,
+                               pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE_SECONDS)
+        engine.pool.stats = PoolStats(f"{engine_url.drivername}://{engine_url.host}/{engine_url.database} pool")
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            print("Successfully connected to MariaDB.")
+        except Exception as e:
+            print(f"Error connecting to MariaDB: {e}")
+            engine.dispose()
+            raise
+        _ENGINES[key] = engine
         return engine
-    except Exception as e:
-        print(f"Error connecting to MariaDB: {e}")
-        raise
 
-def create_star_schema(engine):
-    """Creates the star schema tables in MariaDB."""
-    print("Creating star schema tables if they don't exist...")
-    with engine.connect() as connection:
-        # Drop tables in reverse order of dependency to avoid foreign key issues
-        connection.execute(text("DROP TABLE IF EXISTS manga_secondary_genres"))
-        connection.execute(text("DROP TABLE IF EXISTS fact_manga"))
-        connection.execute(text("DROP TABLE IF EXISTS dim_genres"))
-        connection.execute(text("DROP TABLE IF EXISTS dim_authors"))
-        connection.execute(text("DROP TABLE IF EXISTS dim_demographics"))
-        connection.execute(text("DROP TABLE IF EXISTS dim_serializations"))
-        connection.execute(text("DROP TABLE IF EXISTS dim_manga_info")) # Added this drop
-        # connection.commit() # REMOVED THIS LINE
-
-        # Dimension Tables
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS dim_genres (
-                genre_id INT AUTO_INCREMENT PRIMARY KEY,
-                genre_name VARCHAR(255) UNIQUE
-            );
-        """))
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS dim_authors (
-                author_id INT AUTO_INCREMENT PRIMARY KEY,
-                author_name VARCHAR(255) UNIQUE
-            );
-        """))
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS dim_demographics (
-                demographic_id INT AUTO_INCREMENT PRIMARY KEY,
-                demographic_name VARCHAR(255) UNIQUE
-            );
-        """))
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS dim_serializations (
-                serialization_id INT AUTO_INCREMENT PRIMARY KEY,
-                serialization_name VARCHAR(255) UNIQUE
-            );
-        """))
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS dim_manga_info (
-                manga_info_id INT AUTO_INCREMENT PRIMARY KEY,
-                mal_id INT UNIQUE,
-                title VARCHAR(512),
-                title_english VARCHAR(512),
-                title_japanese VARCHAR(512),
-                title_synonyms TEXT,
-                synopsis TEXT,
-                background TEXT,
-                status VARCHAR(255),
-                type VARCHAR(255),
-                publishing BOOLEAN,
-                published_from DATE,
-                published_to DATE,
-                approved BOOLEAN,
-                url VARCHAR(1024),
-                images TEXT
-            );
-        """))
+def report_pool_stats(engine):
+    """Prints the checkout counts and wait times of an engine from get_db_engine."""
+    stats = getattr(engine.pool, 'stats', None)
+    if stats is not None:
+        stats.report()
 
-        # Fact Table
-        connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS fact_manga (
-                fact_id INT AUTO_INCREMENT PRIMARY KEY,
-                manga_info_id INT,
-                score DECIMAL(3,2),
-                scored_by INT,
-                rank_val INT,
-                popularity INT,
-                members INT,
-                favorites INT,
-                volumes INT,
-                chapters INT,
-                primary_genre_id INT,
-                primary_author_id INT,
-                primary_demographic_id INT,
-                primary_serialization_id INT,
-                FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
-                FOREIGN KEY (primary_genre_id) REFERENCES dim_genres(genre_id),
-                FOREIGN KEY (primary_author_id) REFERENCES dim_authors(author_id),
-                FOREIGN KEY (primary_demographic_id) REFERENCES dim_demographics(demographic_id),
-                FOREIGN KEY (primary_serialization_id) REFERENCES dim_serializations(serialization_id)
-            );
-        """))
+def _sql_value(value):
+    """Converts NaN/NaT to None and NumPy scalars to Python scalars for the DB driver."""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return value
+
+def to_sql_rows(rows):
+    """Turns a DataFrame or an iterable of dicts into driver-ready parameter dicts."""
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.to_dict('records')
+    return [{key: _sql_value(value) for key, value in row.items()} for row in rows]
 
-        # Bridge Table for many-to-many genres
+def bulk_execute(engine, statement, rows, table_name, batch_size=None, row_label=None, report=True):
+    """
+    Executes `statement` for every row, `batch_size` rows per executemany call, each
+    batch in its own transaction. A batch that fails is rolled back and retried row
+    by row, so only the offending rows are skipped and reported.
+    Returns (rows_loaded, rows_failed); with report=True the throughput is printed.
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    rows = to_sql_rows(rows)
+    row_label = row_label or (lambda row: next(iter(row.items()), ''))
+    loaded = failed = 0
+    start = time.perf_counter()
+
+    for offset in range(0, len(rows), batch_size):
+        batch = rows[offset:offset + batch_size]
+        try:
+            with engine.begin() as connection:
+                connection.execute(statement, batch)
+            loaded += len(batch)
+            continue
+        except Exception as e:
+            print(f"Batch of {len(batch)} rows for {table_name} failed ({getattr(e, 'orig', e)}), retrying row by row...")
+        for row in batch:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(statement, row)
+                loaded += 1
+            except Exception as e:
+                failed += 1
+                print(f"Error loading {table_name} row {row_label(row)}: {getattr(e, 'orig', e)}")
+
+    elapsed = time.perf_counter() - start
+    rate = loaded / elapsed if elapsed > 0 else 0.0
+    if report:
+        print(f"{table_name}: {loaded} rows loaded, {failed} failed in {elapsed:.2f}s ({rate:.0f} rows/s, batch size {batch_size}).")
+    return loaded, failed
+
+# Star schema tables, children before parents, for rebuilds
+STAR_SCHEMA_TABLES = [
+    'mart_manga_training', 'manga_genres', 'manga_authors', 'manga_demographics', 'manga_serializations',
+    'manga_secondary_genres', 'fact_manga', 'dim_genres', 'dim_authors', 'dim_demographics',
+    'dim_serializations', 'dim_manga_text', 'dim_manga_info',
+]
+
+# Large free-text attributes of a manga, kept in dim_manga_text next to dim_manga_info
+MANGA_TEXT_COLUMNS = ['title_synonyms', 'synopsis', 'background', 'images']
+# 1 stores dim_manga_text with InnoDB page compression (needs innodb_file_per_table)
+MANGA_TEXT_PAGE_COMPRESSED = os.getenv("MANGA_TEXT_PAGE_COMPRESSED", "0") == "1"
+
+# Columns of mart_manga_training, the denormalized table preprocess_data reads: one row
+# per manga with its scalar attributes, facts and primary dimension names
+MART_COLUMNS = [
+    'manga_info_id', 'mal_id', 'title', 'title_english', 'title_japanese',
+    'status', 'type', 'publishing', 'published_from', 'published_to', 'approved', 'url',
+    'score', 'scored_by', 'rank_val', 'popularity', 'members', 'favorites', 'volumes', 'chapters',
+    'primary_genre', 'primary_author', 'primary_demographic', 'primary_serialization',
+]
+
+# The star schema join the mart is refreshed from; {where} restricts the manga
+MART_SELECT = """
+    SELECT
+        mi.manga_info_id, mi.mal_id, mi.title, mi.title_english, mi.title_japanese,
+        mi.status, mi.type, mi.publishing, mi.published_from, mi.published_to, mi.approved, mi.url,
+        fm.score, fm.scored_by, fm.rank_val, fm.popularity, fm.members, fm.favorites,
+        fm.volumes, fm.chapters,
+        g.genre_name, a.author_name, d.demographic_name, s.serialization_name
+    FROM fact_manga fm
+    JOIN dim_manga_info mi ON fm.manga_info_id = mi.manga_info_id
+    LEFT JOIN dim_genres g ON fm.primary_genre_id = g.genre_id
+    LEFT JOIN dim_authors a ON fm.primary_author_id = a.author_id
+    LEFT JOIN dim_demographics d ON fm.primary_demographic_id = d.demographic_id
+    LEFT JOIN dim_serializations s ON fm.primary_serialization_id = s.serialization_id
+    {where}
+"""
+
+# Versioned schema migrations: (version, description, statements). Applied in order,
+# each at most once, and recorded in schema_migrations. Never edit a released
+# migration; append a new version instead. MariaDB commits DDL implicitly, so a failed
+# migration can be partly applied: every statement must be safe to run again. A
+# statement given as (condition, statement) only runs while the condition query
+# returns a non-zero value.
+SCHEMA_MIGRATIONS = [
+    (1, "Initial star schema", [
+        """
+        CREATE TABLE IF NOT EXISTS dim_genres (
+            genre_id INT AUTO_INCREMENT PRIMARY KEY,
+            genre_name VARCHAR(255) UNIQUE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS dim_authors (
+            author_id INT AUTO_INCREMENT PRIMARY KEY,
+            author_name VARCHAR(255) UNIQUE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS dim_demographics (
+            demographic_id INT AUTO_INCREMENT PRIMARY KEY,
+            demographic_name VARCHAR(255) UNIQUE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS dim_serializations (
+            serialization_id INT AUTO_INCREMENT PRIMARY KEY,
+            serialization_name VARCHAR(255) UNIQUE
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS dim_manga_info (
+            manga_info_id INT AUTO_INCREMENT PRIMARY KEY,
+            mal_id INT UNIQUE,
+            title VARCHAR(512),
+            title_english VARCHAR(512),
+            title_japanese VARCHAR(512),
+            title_synonyms TEXT,
+            synopsis TEXT,
+            background TEXT,
+            status VARCHAR(255),
+            type VARCHAR(255),
+            publishing BOOLEAN,
+            published_from DATE,
+            published_to DATE,
+            approved BOOLEAN,
+            url VARCHAR(1024),
+            images TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS fact_manga (
+            fact_id INT AUTO_INCREMENT PRIMARY KEY,
+            manga_info_id INT,
+            score DECIMAL(3,2),
+            scored_by INT,
+            rank_val INT,
+            popularity INT,
+            members INT,
+            favorites INT,
+            volumes INT,
+            chapters INT,
+            primary_genre_id INT,
+            primary_author_id INT,
+            primary_demographic_id INT,
+            primary_serialization_id INT,
+            FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
+            FOREIGN KEY (primary_genre_id) REFERENCES dim_genres(genre_id),
+            FOREIGN KEY (primary_author_id) REFERENCES dim_authors(author_id),
+            FOREIGN KEY (primary_demographic_id) REFERENCES dim_demographics(demographic_id),
+            FOREIGN KEY (primary_serialization_id) REFERENCES dim_serializations(serialization_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS manga_secondary_genres (
+            manga_info_id INT,
+            genre_id INT,
+            PRIMARY KEY (manga_info_id, genre_id),
+            FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
+            FOREIGN KEY (genre_id) REFERENCES dim_genres(genre_id)
+        );
+        """,
+    ]),
+    (2, "Row fingerprints for incremental ingestion, one fact_manga row per manga", [
+        "ALTER TABLE dim_manga_info ADD COLUMN IF NOT EXISTS row_hash CHAR(32)",
+        # Keep the newest fact row of any manga loaded more than once before the unique key
+        """
+        DELETE older FROM fact_manga older
+        JOIN fact_manga newer ON newer.manga_info_id = older.manga_info_id AND newer.fact_id > older.fact_id
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_fact_manga_info_id ON fact_manga (manga_info_id)",
+    ]),
+    (3, "Bridge tables with every entry of the four nested attributes", [
+        """
+        CREATE TABLE IF NOT EXISTS manga_genres (
+            manga_info_id INT NOT NULL,
+            genre_id INT NOT NULL,
+            position SMALLINT NOT NULL,
+            PRIMARY KEY (manga_info_id, genre_id),
+            INDEX idx_manga_genres_genre_id (genre_id, manga_info_id),
+            FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
+            FOREIGN KEY (genre_id) REFERENCES dim_genres(genre_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS manga_authors (
+            manga_info_id INT NOT NULL,
+            author_id INT NOT NULL,
+            position SMALLINT NOT NULL,
+            PRIMARY KEY (manga_info_id, author_id),
+            INDEX idx_manga_authors_author_id (author_id, manga_info_id),
+            FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
+            FOREIGN KEY (author_id) REFERENCES dim_authors(author_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS manga_demographics (
+            manga_info_id INT NOT NULL,
+            demographic_id INT NOT NULL,
+            position SMALLINT NOT NULL,
+            PRIMARY KEY (manga_info_id, demographic_id),
+            INDEX idx_manga_demographics_demographic_id (demographic_id, manga_info_id),
+            FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
+            FOREIGN KEY (demographic_id) REFERENCES dim_demographics(demographic_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS manga_serializations (
+            manga_info_id INT NOT NULL,
+            serialization_id INT NOT NULL,
+            position SMALLINT NOT NULL,
+            PRIMARY KEY (manga_info_id, serialization_id),
+            INDEX idx_manga_serializations_serialization_id (serialization_id, manga_info_id),
+            FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
+            FOREIGN KEY (serialization_id) REFERENCES dim_serializations(serialization_id)
+        );
+        """,
+        # Forget the fingerprints so the next ingestion reloads every manga and fills the bridges
+        "UPDATE dim_manga_info SET row_hash = NULL",
+    ]),
+    (4, "Denormalized mart_manga_training table", [
+        """
+        CREATE TABLE IF NOT EXISTS mart_manga_training (
+            manga_info_id INT PRIMARY KEY,
+            mal_id INT,
+            title VARCHAR(512),
+            title_english VARCHAR(512),
+            title_japanese VARCHAR(512),
+            title_synonyms TEXT,
+            synopsis TEXT,
+            background TEXT,
+            status VARCHAR(255),
+            type VARCHAR(255),
+            publishing BOOLEAN,
+            published_from DATE,
+            published_to DATE,
+            approved BOOLEAN,
+            url VARCHAR(1024),
+            images TEXT,
+            score DECIMAL(3,2),
+            scored_by INT,
+            rank_val INT,
+            popularity INT,
+            members INT,
+            favorites INT,
+            volumes INT,
+            chapters INT,
+            primary_genre VARCHAR(255),
+            primary_author VARCHAR(255),
+            primary_demographic VARCHAR(255),
+            primary_serialization VARCHAR(255),
+            refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_mart_manga_training_mal_id (mal_id),
+            INDEX idx_mart_manga_training_refreshed_at (refreshed_at)
+        );
+        """,
+        # Initial fill from the star schema
+        """
+        INSERT IGNORE INTO mart_manga_training (
+            manga_info_id, mal_id, title, title_english, title_japanese, title_synonyms,
+            synopsis, background, status, type, publishing, published_from, published_to,
+            approved, url, images, score, scored_by, rank_val, popularity, members, favorites,
+            volumes, chapters, primary_genre, primary_author, primary_demographic, primary_serialization)
+        SELECT
+            mi.manga_info_id, mi.mal_id, mi.title, mi.title_english, mi.title_japanese, mi.title_synonyms,
+            mi.synopsis, mi.background, mi.status, mi.type, mi.publishing, mi.published_from, mi.published_to,
+            mi.approved, mi.url, mi.images, fm.score, fm.scored_by, fm.rank_val, fm.popularity, fm.members,
+            fm.favorites, fm.volumes, fm.chapters,
+            g.genre_name, a.author_name, d.demographic_name, s.serialization_name
+        FROM fact_manga fm
+        JOIN dim_manga_info mi ON fm.manga_info_id = mi.manga_info_id
+        LEFT JOIN dim_genres g ON fm.primary_genre_id = g.genre_id
+        LEFT JOIN dim_authors a ON fm.primary_author_id = a.author_id
+        LEFT JOIN dim_demographics d ON fm.primary_demographic_id = d.demographic_id
+        LEFT JOIN dim_serializations s ON fm.primary_serialization_id = s.serialization_id
+        """,
+    ]),
+    (5, "Move the large text attributes of dim_manga_info to dim_manga_text", [
+        """
+        CREATE TABLE IF NOT EXISTS dim_manga_text (
+            manga_info_id INT PRIMARY KEY,
+            title_synonyms TEXT,
+            synopsis TEXT,
+            background TEXT,
+            images TEXT,
+            FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id)
+        );
+        """,
+        # Copied only while dim_manga_info still has the columns, so a re-run after
+        # the ALTER below succeeds
+        ("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'dim_manga_info' AND column_name = 'synopsis'
+        """, """
+        INSERT IGNORE INTO dim_manga_text (manga_info_id, title_synonyms, synopsis, background, images)
+        SELECT manga_info_id, title_synonyms, synopsis, background, images FROM dim_manga_info
+        """),
+        # The mart first: once dim_manga_info has lost the columns nothing can be copied
+        """
+        ALTER TABLE mart_manga_training
+            DROP COLUMN IF EXISTS title_synonyms, DROP COLUMN IF EXISTS synopsis,
+            DROP COLUMN IF EXISTS background, DROP COLUMN IF EXISTS images
+        """,
+        """
+        ALTER TABLE dim_manga_info
+            DROP COLUMN IF EXISTS title_synonyms, DROP COLUMN IF EXISTS synopsis,
+            DROP COLUMN IF EXISTS background, DROP COLUMN IF EXISTS images
+        """,
+    ]),
+]
+
+def refresh_training_mart(engine, manga_info_ids) -> int:
+    """
+    Rebuilds the mart_manga_training rows of the given manga from the star schema, a
+    DELETE and an INSERT ... SELECT in one transaction; manga without a fact row drop
+    out of the mart.
+    Returns the number of manga refreshed.
+    """
+    manga_info_ids = [int(manga_info_id) for manga_info_id in manga_info_ids]
+    if not manga_info_ids:
+        return 0
+    ids = sqlalchemy.bindparam('manga_info_ids', expanding=True)
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM mart_manga_training WHERE manga_info_id IN :manga_info_ids")
+                           .bindparams(ids), {'manga_info_ids': manga_info_ids})
+        connection.execute(text(f"""
+            INSERT INTO mart_manga_training ({', '.join(MART_COLUMNS)})
+            {MART_SELECT.format(where='WHERE fm.manga_info_id IN :manga_info_ids')}
+        """).bindparams(ids), {'manga_info_ids': manga_info_ids})
+    return len(manga_info_ids)
+
+def create_star_schema(engine, rebuild=False):
+    """
+    Creates the star schema tables in MariaDB if they are missing and applies any
+    pending migrations; existing data is kept. rebuild=True drops every table first.
+    """
+    print("Creating star schema tables if they don't exist...")
+    with engine.begin() as connection:
+        if rebuild:
+            print("Dropping star schema tables for a rebuild...")
+            for table in STAR_SCHEMA_TABLES + ['schema_migrations']:
+                connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
         connection.execute(text("""
-            CREATE TABLE IF NOT EXISTS manga_secondary_genres (
-                manga_info_id INT,
-                genre_id INT,
-                PRIMARY KEY (manga_info_id, genre_id),
-                FOREIGN KEY (manga_info_id) REFERENCES dim_manga_info(manga_info_id),
-                FOREIGN KEY (genre_id) REFERENCES dim_genres(genre_id)
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                description VARCHAR(255),
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """))
-        # connection.commit() # REMOVED THIS LINE
-    print("Star schema tables created successfully.")
+        applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, description, statements in SCHEMA_MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Applying schema migration {version}: {description}")
+        with engine.begin() as connection:
+            for statement in statements:
+                if isinstance(statement, tuple):
+                    condition, statement = statement
+                    if not connection.execute(text(condition)).scalar():
+                        continue
+                connection.execute(text(statement))
+            connection.execute(text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                               {'version': version, 'description': description})
+    if MANGA_TEXT_PAGE_COMPRESSED:
+        with engine.begin() as connection:
+            options = connection.execute(text("""
+                SELECT create_options FROM information_schema.tables
+                WHERE table_schema = DATABASE() AND table_name = 'dim_manga_text'
+            """)).scalar()
+            if 'page_compressed' not in (options or '').lower():
+                print("Enabling page compression on dim_manga_text...")
+                connection.execute(text("ALTER TABLE dim_manga_text PAGE_COMPRESSED=1"))
+    print(f"Star schema is at version {SCHEMA_MIGRATIONS[-1][0]}.")
 
 if __name__ == '__main__':
     try:
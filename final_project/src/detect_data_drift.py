@@ -1,27 +1,25 @@
 import pandas as pd
-from sqlalchemy import create_engine
 import logging
-from urllib.parse import quote_plus
 from scipy.stats import ks_2samp, chi2_contingency
 import mlflow
 import os
+from src.database_utils import get_db_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MariaDB connection details
-DB_HOST = "127.0.0.1"
-DB_USER = "root"
-DB_PASSWORD = "admin@123"
-DB_NAME = "airflow_db"
+# MariaDB holding the table written by ingest_data_to_mariadb.py
+DB_HOST = os.getenv("DRIFT_DB_HOST", "127.0.0.1")
+DB_USER = os.getenv("DRIFT_DB_USER", "root")
+DB_PASSWORD = os.getenv("DRIFT_DB_PASSWORD", "admin@123")
+DB_NAME = os.getenv("DRIFT_DB_NAME", "airflow_db")
 TABLE_NAME = "manga_data"
 DRIFT_REPORT_DIR = "drift_reports"
 
 def detect_data_drift():
     try:
         # 1. Connect to MariaDB and load data
-        encoded_password = quote_plus(DB_PASSWORD)
-        engine = create_engine(f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}/{DB_NAME}")
+        engine = get_db_engine(driver="pymysql", host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
         logger.info("Connected to MariaDB.")
         
         query = f"SELECT * FROM {TABLE_NAME}"
@@ -2,39 +2,31 @@ import pandas as pd
 import mlflow
 import seaborn as sns
 import matplotlib.pyplot as plt
-from sqlalchemy import create_engine
 import logging
 import os
-from urllib.parse import quote_plus
 import json
+from src.database_utils import get_db_engine, MANGA_TEXT_COLUMNS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MariaDB connection details
-DB_HOST = "mariadb"
-DB_USER = "manga_user"
-DB_PASSWORD = "manga_password"
-DB_NAME = "manga_db"
 TABLE_NAME = "fact_manga"
 PLOTS_DIR = "eda_manga_plots"
 
-def run_eda():
+def run_eda(include_text=False):
+    """Plots the fact_manga distributions; include_text=True also loads the dim_manga_text attributes."""
     try:
         # 1. Connect to MariaDB and load data
-        encoded_password = quote_plus(DB_PASSWORD)
-        try:
-            import pymysql
-            logger.info("Successfully imported pymysql")
-        except ImportError as e:
-            logger.error(f"Failed to import pymysql: {e}")
-            raise
-        engine = create_engine(f"mysql+pymysql://{DB_USER}:{encoded_password}@{DB_HOST}/{DB_NAME}")
+        engine = get_db_engine(driver="pymysql")
         logger.info("Connected to MariaDB.")
         
         query = """SELECT fm.*, dmi.type
 FROM fact_manga fm
 JOIN dim_manga_info dmi ON fm.manga_info_id = dmi.manga_info_id"""
+        if include_text:
+            text_columns = ", ".join(f"dmt.{column}" for column in MANGA_TEXT_COLUMNS)
+            query = query.replace("SELECT fm.*, dmi.type", f"SELECT fm.*, dmi.type, {text_columns}")
+            query += "\nLEFT JOIN dim_manga_text dmt ON dmt.manga_info_id = fm.manga_info_id"
         df = pd.read_sql(query, engine)
         logger.info(f"Successfully loaded data from '{TABLE_NAME}'. Shape: {df.shape}")
 
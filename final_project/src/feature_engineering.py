@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 from sklearn.preprocessing import StandardScaler
+from src.database_utils import MANGA_TEXT_COLUMNS
+from src.parquet_artifacts import read_artifact, write_artifact, MANGA_PROCESSED_FIELDS
 
 def feature_engineering():
     """
@@ -13,7 +15,7 @@ def feature_engineering():
     features_path = os.path.join(features_dir, 'manga_features.parquet')
 
     print(f"Reading processed data from {processed_data_path}")
-    df = pd.read_parquet(processed_data_path)
+    df = read_artifact(processed_data_path, exclude=MANGA_TEXT_COLUMNS)
     print("Processed data read successfully. Shape:", df.shape)
 
     # --- Feature Engineering Steps ---
@@ -47,7 +49,9 @@ def feature_engineering():
     os.makedirs(features_dir, exist_ok=True)
 
     print(f"Saving features to {features_path}")
-    df.to_parquet(features_path, index=False)
+    # The scaled columns are floats now, not the int32 of manga_processed
+    fields = {column: arrow_type for column, arrow_type in MANGA_PROCESSED_FIELDS.items() if column not in numerical_cols}
+    write_artifact(df, features_path, fields)
     print("Features saved successfully.")
 
 if __name__ == '__main__':
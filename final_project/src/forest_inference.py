@@ -0,0 +1,243 @@
+import os
+import json
+import shutil
+
+import numpy as np
+
+# Node layout shared by every tree once the forest is flattened. Trees are stored
+# back to back and children[node] = (right, left) holds global node indices, so the
+# next node is children.ravel()[2 * node + went_left]. Leaves point to themselves.
+FOREST_ARRAYS = ('feature', 'threshold', 'children', 'value', 'missing_left', 'is_leaf', 'roots')
+
+# (tree, row) pairs traversed together by FlatForest.apply
+APPLY_GROUP_ENTRIES = 1 << 15
+
+# Version of the on-disk serving artifact written by FlatForest.save
+ARTIFACT_FORMAT_VERSION = 1
+SCHEMA_FILE = 'schema.json'
+
+
+def _float32_floor(threshold: np.ndarray) -> np.ndarray:
+    """
+    Returns the largest float32 <= each float64 threshold.
+
+    sklearn compares float32 inputs against float64 thresholds; for any float32 x,
+    x <= t holds exactly when x <= floor32(t), so the traversal can stay in float32.
+    """
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+class FlatForest:
+    """
+    A RandomForestRegressor exported to packed NumPy arrays.
+
+    Predictions are computed with vectorized gathers over the whole batch and groups
+    of trees, without sklearn input validation, joblib or pandas, and are
+    numerically identical to RandomForestRegressor.predict.
+    """
+
+    def __init__(self, feature, threshold, children, value, missing_left, is_leaf, roots,
+                 max_depth, n_features, feature_names=None, run_id=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.missing_left = missing_left
+        self.is_leaf = is_leaf
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.run_id = run_id
+        self.has_missing_left = bool(missing_left.any())
+        self._flat_children = children.reshape(-1)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, forest, feature_names=None):
+        """Flattens a fitted RandomForestRegressor (or any single-output tree ensemble of regressors)."""
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be flattened.")
+        if feature_names is None and hasattr(forest, 'feature_names_in_'):
+            feature_names = [str(name) for name in forest.feature_names_in_]
+
+        features, thresholds, children, values, missing_lefts, leaves, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            leaf = tree.children_left == -1
+
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            right = np.where(leaf, node_ids, tree.children_right) + offset
+            left = np.where(leaf, node_ids, tree.children_left) + offset
+            children.append(np.stack([right, left], axis=1).astype(np.int32))
+            leaves.append(leaf)
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            # Trees fitted with missing-value support (sklearn >= 1.3) record where NaN goes
+            missing = getattr(tree, 'missing_go_to_left', None)
+            missing_lefts.append(np.zeros(n_nodes, dtype=bool) if missing is None else (np.asarray(missing) != 0) & ~leaf)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=_float32_floor(np.concatenate(thresholds)),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            missing_left=np.concatenate(missing_lefts),
+            is_leaf=np.concatenate(leaves),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=forest.n_features_in_,
+            feature_names=feature_names,
+        )
+
+    def arrays(self) -> dict:
+        """Returns the packed node arrays keyed by name (see FOREST_ARRAYS)."""
+        return {name: getattr(self, name) for name in FOREST_ARRAYS}
+
+    def save(self, directory: str, run_id: str = None, replace: bool = True):
+        """
+        Writes the serving artifact: one .npy file per node array plus schema.json.
+
+        The directory is written under a temporary name and renamed into place, so
+        readers only ever see a complete artifact. With replace=False an artifact
+        that already exists (e.g. published by another worker) is kept as is.
+        """
+        tmp_dir = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, array in self.arrays().items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        schema = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "run_id": run_id or self.run_id,
+            "feature_names": self.feature_names,
+            "n_features": self.n_features,
+            "n_trees": self.n_trees,
+            "n_nodes": self.n_nodes,
+            "max_depth": self.max_depth,
+        }
+        with open(os.path.join(tmp_dir, SCHEMA_FILE), 'w') as f:
+            json.dump(schema, f, indent=2)
+
+        if os.path.exists(directory):
+            if not replace:
+                shutil.rmtree(tmp_dir)
+                return
+            shutil.rmtree(directory)
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Another process published the same artifact first
+            if replace or not os.path.isdir(directory):
+                raise
+            shutil.rmtree(tmp_dir)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode='r'):
+        """
+        Loads a serving artifact written by save(). With mmap_mode='r' the node arrays
+        are memory-mapped read-only instead of being read into the process heap.
+        """
+        with open(os.path.join(directory, SCHEMA_FILE), 'r') as f:
+            schema = json.load(f)
+        if schema.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported serving artifact version {schema.get('format_version')} in {directory}")
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in FOREST_ARRAYS}
+        return cls(max_depth=schema["max_depth"], n_features=schema["n_features"],
+                   feature_names=schema["feature_names"], run_id=schema.get("run_id"), **arrays)
+
+    @staticmethod
+    def prune(root_dir: str, keep: int = 3, active_run_ids=()):
+        """
+        Deletes all but the `keep` most recent artifacts under root_dir. The artifacts of
+        `active_run_ids` (e.g. the deployed run) are never deleted, however old. Processes
+        that still have an old artifact mapped keep reading it until they unmap it.
+        """
+        if not os.path.isdir(root_dir):
+            return []
+        artifacts = [os.path.join(root_dir, name) for name in os.listdir(root_dir)
+                     if name not in active_run_ids and os.path.isfile(os.path.join(root_dir, name, SCHEMA_FILE))]
+        artifacts.sort(key=os.path.getmtime, reverse=True)
+        for directory in artifacts[keep:]:
+            shutil.rmtree(directory, ignore_errors=True)
+        return artifacts[keep:]
+
+    def apply(self, X) -> np.ndarray:
+        """Returns the global leaf index reached by every (tree, row) pair, shape (n_trees, n_rows)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected an array of shape (n_rows, {self.n_features}), got {X.shape}.")
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        # int32 working arrays halve the memory traffic of every gather when the indices fit
+        index_dtype = np.int32 if max(2 * self.n_nodes, X.size) < 2 ** 31 else np.intp
+        leaves = np.empty((self.n_trees, n_rows), dtype=index_dtype)
+        # Without NaN in the batch the missing-value routing never applies
+        check_missing = self.has_missing_left and bool(np.isnan(flat_X).any())
+
+        # Trees are traversed a group at a time, about APPLY_GROUP_ENTRIES (tree, row)
+        # pairs per group, so the gathers of a level hit the nodes of a few trees
+        # instead of the whole forest. Traversing all trees at once made FlatForest
+        # slower than sklearn somewhere between 1024 and 4096 rows; grouped, it stays
+        # ahead at every batch size (see benchmarks/bench_forest_inference.py).
+        trees_per_group = max(1, APPLY_GROUP_ENTRIES // max(n_rows, 1))
+        for first_tree in range(0, self.n_trees, trees_per_group):
+            roots = self.roots[first_tree:first_tree + trees_per_group]
+            self._apply_group(flat_X, n_rows, roots, leaves[first_tree:first_tree + len(roots)].reshape(-1),
+                              check_missing)
+        return leaves
+
+    def _apply_group(self, flat_X, n_rows, roots, leaves, check_missing):
+        # One entry per (tree, row); entries are dropped from the working set once
+        # enough of them reached a leaf, so deep paths do not keep shallow ones busy.
+        index_dtype = leaves.dtype
+        position = np.arange(len(roots) * n_rows, dtype=index_dtype)
+        node = np.repeat(roots.astype(index_dtype), n_rows)
+        row_offset = np.tile(np.arange(n_rows, dtype=index_dtype) * self.n_features, len(roots))
+
+        for _ in range(self.max_depth + 1):
+            x = np.take(flat_X, row_offset + np.take(self.feature, node))
+            go_left = x <= np.take(self.threshold, node)
+            if check_missing:
+                go_left |= np.isnan(x) & np.take(self.missing_left, node)
+            next_node = np.take(self._flat_children, 2 * node + go_left)
+            # Leaves point to themselves, so an entry that did not move is finished
+            done = next_node == node
+            n_done = np.count_nonzero(done)
+            if n_done == len(node):
+                break
+            # Compacting costs three gathers, only worth it once a quarter is finished
+            if n_done * 4 >= len(node):
+                leaves[position[done]] = next_node[done]
+                active = ~done
+                position, next_node, row_offset = position[active], next_node[active], row_offset[active]
+            node = next_node
+        leaves[position] = node
+
+    def predict(self, X) -> np.ndarray:
+        """Predicts a batch of rows (array-like of shape (n_rows, n_features))."""
+        leaf_values = np.take(self.value, self.apply(X))
+        # Accumulate tree by tree in estimator order, exactly like sklearn, so the
+        # floating point result is bit-identical to RandomForestRegressor.predict.
+        prediction = np.zeros(leaf_values.shape[1], dtype=np.float64)
+        for tree_values in leaf_values:
+            prediction += tree_values
+        prediction /= self.n_trees
+        return prediction
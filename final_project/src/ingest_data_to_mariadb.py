@@ -1,9 +1,10 @@
 import pandas as pd
 import mysql.connector
 import os
+import time
 import logging
 import argparse
-import numpy as np
+import tempfile
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,6 +15,10 @@ DB_USER = "root"
 DB_PASSWORD = "admin@123"
 DB_NAME = "airflow_db"
 
+# Rows per chunk streamed to the server, and rows read up front to infer column types
+CHUNK_SIZE = 50000
+SAMPLE_ROWS = 10000
+
 def get_sql_type(dtype):
     if pd.api.types.is_integer_dtype(dtype):
         return "BIGINT"
@@ -24,22 +29,129 @@ def get_sql_type(dtype):
     else:
         return "TEXT"
 
-def ingest_data(data_file_path, table_name):
+def infer_sql_types(data_file_path, sample_rows=SAMPLE_ROWS):
+    """Infers the column types from the first `sample_rows` rows instead of the whole file."""
+    sample = pd.read_csv(data_file_path, nrows=sample_rows)
+    return {col: get_sql_type(sample[col].dtype) for col in sample.columns}
+
+def local_infile_enabled(cursor):
+    cursor.execute("SELECT @@GLOBAL.local_infile")
+    (enabled,) = cursor.fetchone()
+    return bool(int(enabled))
+
+# LOAD DATA escape sequences of the characters that would end a field or a line.
+# Applied here rather than through the csv module's escapechar, which does not escape
+# a literal backslash on Python 3.7: a value ending in '\\' escaped the tab after it.
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+def _tsv_field(value) -> str:
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return ''
+    return str(value).translate(TSV_ESCAPES)
+
+def check_sql_type(values, sql_type):
+    """
+    Converts a column to the values LOAD DATA should store for `sql_type`. Raises
+    ValueError for values the server would silently coerce (text in a BIGINT column
+    becomes 0, an unknown boolean NULL), where the executemany path fails instead.
+    """
+    if sql_type == "BOOLEAN":
+        converted = values.map({True: 1, False: 0, 'True': 1, 'False': 0}).astype('Int64')
+        invalid = values.notna() & converted.isna()
+    elif sql_type in ("BIGINT", "FLOAT"):
+        converted = pd.to_numeric(values, errors='coerce')
+        invalid = values.notna() & converted.isna()
+        if sql_type == "BIGINT":
+            invalid |= converted.notna() & (converted % 1 != 0)
+    else:
+        return values
+    if invalid.any():
+        examples = values[invalid].head(5).tolist()
+        raise ValueError(f"Column '{values.name}' has {int(invalid.sum())} values that do not fit the {sql_type} "
+                         f"type inferred from the first rows, e.g. {examples}; raise --sample_rows.")
+    return converted
+
+def write_tsv_chunk(chunk, sql_types, path):
+    """
+    Writes a chunk in the LOAD DATA default format: tab separated, '\\n' terminated,
+    backslash escaped. Missing values become empty fields, which the load turns into NULL.
+    Values that do not fit their column's type raise ValueError (see check_sql_type).
+    """
+    columns = []
+    for col, sql_type in sql_types.items():
+        values = check_sql_type(chunk[col], sql_type)
+        columns.append([_tsv_field(value) for value in values.astype(object)])
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.writelines('\t'.join(fields) + '\n' for fields in zip(*columns))
+
+def load_data_query(path, table_name, columns):
+    variables = [f"@c{i}" for i in range(len(columns))]
+    assignments = ", ".join(f"`{col}` = NULLIF({var}, '')" for col, var in zip(columns, variables))
+    return (f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {table_name} "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(variables)}) SET {assignments}")
+
+def load_chunk_infile(cursor, chunk, sql_types, table_name):
+    """Streams one chunk through a temporary TSV file into `table_name` with LOAD DATA LOCAL INFILE."""
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    os.close(fd)
     try:
-        # 1. Read data from CSV
+        write_tsv_chunk(chunk, sql_types, path)
+        cursor.execute(load_data_query(path, table_name, list(sql_types)))
+        if cursor.warning_count:
+            logger.warning(f"LOAD DATA reported {cursor.warning_count} warnings for a chunk of {len(chunk)} rows.")
+            cursor.execute("SHOW WARNINGS LIMIT 5")
+            for level, code, message in cursor.fetchall():
+                logger.warning(f"{level} {code}: {message}")
+    finally:
+        os.remove(path)
+
+def load_chunk_executemany(cursor, chunk, table_name):
+    """Fallback for servers with local_infile disabled: one executemany per chunk."""
+    placeholders = ", ".join(["%s"] * len(chunk.columns))
+    insert_query = f"INSERT INTO {table_name} VALUES ({placeholders})"
+    # Object columns hold plain Python scalars, which mysql.connector can convert
+    values = chunk.astype(object).where(chunk.notna(), None)
+    cursor.executemany(insert_query, list(values.itertuples(index=False, name=None)))
+
+def swap_in_staging(cursor, staging_table, table_name):
+    """Replaces `table_name` with the staging table in a single atomic RENAME TABLE."""
+    cursor.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = %s AND table_name = %s",
+                   (DB_NAME, table_name))
+    (exists,) = cursor.fetchone()
+    if exists:
+        old_table = f"{table_name}__old"
+        cursor.execute(f"DROP TABLE IF EXISTS {old_table}")
+        cursor.execute(f"RENAME TABLE {table_name} TO {old_table}, {staging_table} TO {table_name}")
+        cursor.execute(f"DROP TABLE {old_table}")
+    else:
+        cursor.execute(f"RENAME TABLE {staging_table} TO {table_name}")
+
+def ingest_data(data_file_path, table_name, chunk_size=CHUNK_SIZE, sample_rows=SAMPLE_ROWS, method="auto"):
+    """
+    Bulk-loads a CSV file into a MariaDB table.
+
+    The file is streamed in chunks of `chunk_size` rows into a staging table, which
+    replaces `table_name` only once every chunk is loaded, so readers never see a
+    partial table. With method="auto" each chunk goes through LOAD DATA LOCAL INFILE,
+    falling back to chunked executemany when the server has local_infile disabled.
+    """
+    staging_table = f"{table_name}__staging"
+    try:
+        # 1. Infer the schema from a sample of the CSV
         if not os.path.exists(data_file_path):
             logger.error(f"Data file not found at: {data_file_path}")
             raise FileNotFoundError(f"Data file not found at {data_file_path}")
-        
-        df = pd.read_csv(data_file_path)
-        df = df.replace({np.nan: None})
-        logger.info(f"Successfully read data from {data_file_path}. Shape: {df.shape}")
+
+        sql_types = infer_sql_types(data_file_path, sample_rows)
+        logger.info(f"Inferred {len(sql_types)} column types from the first {sample_rows} rows of {data_file_path}.")
 
         # 2. Connect to MariaDB
         conn = mysql.connector.connect(
             host=DB_HOST,
             user=DB_USER,
-            password=DB_PASSWORD
+            password=DB_PASSWORD,
+            allow_local_infile=True
         )
         cursor = conn.cursor()
         logger.info("Connected to MariaDB.")
@@ -49,26 +161,40 @@ def ingest_data(data_file_path, table_name):
         conn.database = DB_NAME
         logger.info(f"Database '{DB_NAME}' ensured to exist.")
 
-        # Drop table if it exists
-        cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
-        logger.info(f"Dropped table '{table_name}' if it existed.")
+        use_infile = method == "load_data" or (method == "auto" and local_infile_enabled(cursor))
+        logger.info(f"Loading with {'LOAD DATA LOCAL INFILE' if use_infile else 'executemany'}.")
 
-        # Create table
-        columns_with_types = ", ".join([f"`{col}` {get_sql_type(df[col].dtype)}" for col in df.columns])
-        create_table_query = f"CREATE TABLE {table_name} ({columns_with_types})"
-        cursor.execute(create_table_query)
-        logger.info(f"Table '{table_name}' created with schema: {columns_with_types}")
+        # Create the staging table; the live table stays untouched until the swap
+        cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        columns_with_types = ", ".join([f"`{col}` {sql_type}" for col, sql_type in sql_types.items()])
+        cursor.execute(f"CREATE TABLE {staging_table} ({columns_with_types})")
+        logger.info(f"Table '{staging_table}' created with schema: {columns_with_types}")
 
-        # 3. Ingest data
-        # Prepare insert statement
-        placeholders = ", ".join(["%s"] * len(df.columns))
-        insert_query = f"INSERT INTO {table_name} VALUES ({placeholders})"
+        # 3. Stream the data in chunks
+        start = time.perf_counter()
+        total_rows = 0
+        for chunk in pd.read_csv(data_file_path, chunksize=chunk_size):
+            if use_infile:
+                try:
+                    load_chunk_infile(cursor, chunk, sql_types, staging_table)
+                except mysql.connector.Error as err:
+                    if method == "load_data" or total_rows:
+                        raise
+                    # Rejected by the client or server; nothing is loaded yet, so switch over
+                    logger.warning(f"LOAD DATA LOCAL INFILE failed ({err}); falling back to executemany.")
+                    conn.rollback()
+                    use_infile = False
+            if not use_infile:
+                load_chunk_executemany(cursor, chunk, staging_table)
+            conn.commit()
+            total_rows += len(chunk)
+            logger.info(f"Loaded {total_rows} rows into '{staging_table}'.")
 
-        # Convert DataFrame to list of tuples for insertion
-        data_to_insert = [tuple(row) for row in df.values]
-        cursor.executemany(insert_query, data_to_insert)
-        conn.commit()
-        logger.info(f"Successfully ingested {len(data_to_insert)} rows into '{table_name}'.")
+        # 4. Swap the staging table in
+        swap_in_staging(cursor, staging_table, table_name)
+        elapsed = time.perf_counter() - start
+        rate = total_rows / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Successfully ingested {total_rows} rows into '{table_name}' in {elapsed:.1f}s ({rate:.0f} rows/s).")
 
     except FileNotFoundError as e:
         logger.error(f"File error: {e}")
@@ -81,6 +207,11 @@ def ingest_data(data_file_path, table_name):
         raise
     finally:
         if 'conn' in locals() and conn.is_connected():
+            # Leftover of a failed load; after a successful swap it no longer exists
+            try:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            except mysql.connector.Error as err:
+                logger.warning(f"Could not drop '{staging_table}': {err}")
             cursor.close()
             conn.close()
             logger.info("MariaDB connection closed.")
@@ -89,6 +220,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Ingest data from a CSV file to a MariaDB table.')
     parser.add_argument('--file_path', required=True, help='Path to the CSV file to ingest.')
     parser.add_argument('--table_name', required=True, help='Name of the table to ingest data into.')
+    parser.add_argument('--chunk_size', type=int, default=CHUNK_SIZE, help='Rows per chunk sent to the server.')
+    parser.add_argument('--sample_rows', type=int, default=SAMPLE_ROWS, help='Rows used to infer the column types.')
+    parser.add_argument('--method', choices=['auto', 'load_data', 'executemany'], default='auto',
+                        help='Load path; auto uses LOAD DATA LOCAL INFILE when the server allows it.')
     args = parser.parse_args()
-    
-    ingest_data(args.file_path, args.table_name)
\ No newline at end of file
+
+    ingest_data(args.file_path, args.table_name, args.chunk_size, args.sample_rows, args.method)
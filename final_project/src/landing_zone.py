@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.data_ingestion import (DIMENSIONS, INTEGER_COLUMNS, FLOAT_COLUMNS, BOOLEAN_COLUMNS, row_fingerprints,
+                                explode_nested)
+
+# Version of the landing dataset layout written by build_landing_zone
+LANDING_FORMAT_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+
+# Rows of manga.csv converted per chunk
+LANDING_CHUNK_ROWS = int(os.getenv("LANDING_CHUNK_ROWS", "50000"))
+
+# Column types of the landing dataset: INTEGER_COLUMNS, FLOAT_COLUMNS and BOOLEAN_COLUMNS
+# of data_ingestion, nested columns as lists of names and every other column as a string
+NESTED_COLUMNS = [column for column, _, _, _ in DIMENSIONS]
+
+
+def source_fingerprint(path: str) -> str:
+    """SHA-256 of the file content, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_nested(series: pd.Series) -> pd.Series:
+    """Parses a JSON list column into lists of entry names, in list order."""
+    entries = explode_nested(series)
+    # Entries come in row order, so each row's names are one contiguous slice
+    positions = series.index.get_indexer(entries['row'])
+    offsets = np.searchsorted(positions, np.arange(len(series) + 1))
+    names = entries['name'].to_numpy(dtype=object)
+    return pd.Series([names[start:end].tolist() for start, end in zip(offsets[:-1], offsets[1:])],
+                     index=series.index)
+
+
+def _to_string(series: pd.Series) -> pd.Series:
+    return pd.Series([None if pd.isna(value) else str(value) for value in series], index=series.index, dtype=object)
+
+
+def type_chunk(chunk: pd.DataFrame, first_row: int = 0) -> pd.DataFrame:
+    """
+    Converts a raw CSV chunk to the landing types. row_hash is computed from the raw
+    chunk first, while the nested columns are still JSON text, so it matches the
+    fingerprint a direct CSV read gives. source_row numbers the rows in file order,
+    starting at `first_row`.
+    """
+    typed = pd.DataFrame(index=chunk.index)
+    typed['row_hash'] = row_fingerprints(chunk)
+    typed['source_row'] = np.arange(first_row, first_row + len(chunk), dtype=np.int64)
+    for column in chunk.columns:
+        if column in INTEGER_COLUMNS:
+            typed[column] = pd.to_numeric(chunk[column], errors='coerce').astype('Int64')
+        elif column in FLOAT_COLUMNS:
+            typed[column] = pd.to_numeric(chunk[column], errors='coerce').astype('float64')
+        elif column in BOOLEAN_COLUMNS:
+            typed[column] = chunk[column].map({True: True, False: False, 'True': True, 'False': False}).astype('boolean')
+        elif column in NESTED_COLUMNS:
+            typed[column] = normalize_nested(chunk[column])
+        else:
+            typed[column] = _to_string(chunk[column])
+    return typed
+
+
+def landing_schema(typed: pd.DataFrame) -> pa.Schema:
+    fields = []
+    for column in typed.columns:
+        if column in INTEGER_COLUMNS or column == 'source_row':
+            fields.append(pa.field(column, pa.int64()))
+        elif column in FLOAT_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        elif column in BOOLEAN_COLUMNS:
+            fields.append(pa.field(column, pa.bool_()))
+        elif column in NESTED_COLUMNS:
+            fields.append(pa.field(column, pa.list_(pa.string())))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def _write_partitions(typed: pd.DataFrame, schema: pa.Schema, dataset_dir: str, part: int) -> list:
+    """Writes one zstd Parquet file per `type` value of the chunk; returns their relative paths."""
+    files = []
+    partition_keys = typed['type'].fillna('__null__') if 'type' in typed.columns else pd.Series('__null__', index=typed.index)
+    for key, rows in typed.groupby(partition_keys, sort=True):
+        relative_path = os.path.join(f"type={quote(str(key), safe='')}", f"part-{part:05d}.parquet")
+        os.makedirs(os.path.join(dataset_dir, os.path.dirname(relative_path)), exist_ok=True)
+        table = pa.Table.from_pandas(rows, schema=schema, preserve_index=False)
+        pq.write_table(table, os.path.join(dataset_dir, relative_path), compression='zstd')
+        files.append(relative_path)
+    return files
+
+
+def read_manifest(dataset_dir: str):
+    """Returns the manifest of a complete landing dataset, or None."""
+    try:
+        with open(os.path.join(dataset_dir, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format_version') == LANDING_FORMAT_VERSION else None
+
+
+def build_landing_zone(raw_data_path=None, landing_root=None, chunk_size=None) -> str:
+    """
+    Converts manga.csv into a typed, zstd-compressed Parquet dataset partitioned by
+    `type`, with the nested JSON columns parsed into lists of names and a row_hash per
+    row. The dataset lives under <landing_root>/<sha256 of the CSV>; when that
+    directory already holds a complete dataset the CSV is not parsed at all.
+    Returns the dataset directory.
+    """
+    project_root = '/opt/airflow'
+    raw_data_path = raw_data_path or os.path.join(project_root, 'data', 'manga.csv')
+    landing_root = landing_root or os.path.join(project_root, 'data', 'landing', 'manga')
+    chunk_size = chunk_size or LANDING_CHUNK_ROWS
+
+    start = time.perf_counter()
+    fingerprint = source_fingerprint(raw_data_path)
+    dataset_dir = os.path.join(landing_root, fingerprint)
+    manifest = read_manifest(dataset_dir)
+    if manifest is not None:
+        print(f"{raw_data_path} unchanged (sha256 {fingerprint[:12]}), reusing landing dataset "
+              f"with {manifest['rows']} rows in {dataset_dir}")
+        return dataset_dir
+
+    print(f"Converting {raw_data_path} (sha256 {fingerprint[:12]}) into a Parquet landing dataset...")
+    tmp_dir = f"{dataset_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    schema, files, n_rows = None, [], 0
+    for part, chunk in enumerate(pd.read_csv(raw_data_path, chunksize=chunk_size)):
+        typed = type_chunk(chunk, first_row=n_rows)
+        schema = schema or landing_schema(typed)
+        files.extend(_write_partitions(typed, schema, tmp_dir, part))
+        n_rows += len(typed)
+
+    # The manifest lists the files in source order; it is written last and marks the dataset complete
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump({"format_version": LANDING_FORMAT_VERSION, "source": raw_data_path, "fingerprint": fingerprint,
+                   "rows": n_rows, "files": files}, f, indent=2)
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    os.rename(tmp_dir, dataset_dir)
+
+    # Only the dataset of the current source is kept
+    for name in os.listdir(landing_root):
+        if name != fingerprint:
+            shutil.rmtree(os.path.join(landing_root, name), ignore_errors=True)
+
+    size_mb = sum(os.path.getsize(os.path.join(dataset_dir, path)) for path in files) / 2 ** 20
+    print(f"Landing dataset with {n_rows} rows in {len(files)} files ({size_mb:.1f} MB, source "
+          f"{os.path.getsize(raw_data_path) / 2 ** 20:.1f} MB) written to {dataset_dir} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return dataset_dir
+
+
+def last_source_rows(dataset_dir: str, files: list) -> np.ndarray:
+    """
+    Sorted source_row of the last row of every mal_id in file order, the row a direct
+    read of the CSV keeps. The `type` partitions regroup rows, so the order of the
+    landing files cannot decide this.
+    """
+    keys = pq.read_table([os.path.join(dataset_dir, path) for path in files],
+                         columns=['mal_id', 'source_row'], partitioning=None).to_pandas()
+    return np.sort(keys.groupby('mal_id', dropna=False)['source_row'].max().to_numpy())
+
+
+def iter_landing_chunks(dataset_dir: str, chunk_size: int):
+    """
+    Yields the landing dataset as DataFrames of at most `chunk_size` rows, file by file
+    in manifest order. Nested columns are lists (NumPy arrays) of names. A mal_id that
+    is repeated in the CSV is yielded once, with its last row in file order.
+    """
+    manifest = read_manifest(dataset_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No complete landing dataset in {dataset_dir}")
+    keep = last_source_rows(dataset_dir, manifest['files'])
+    for path in manifest['files']:
+        parquet_file = pq.ParquetFile(os.path.join(dataset_dir, path))
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            if len(keep) < manifest['rows']:
+                chunk = chunk[np.isin(chunk['source_row'].to_numpy(), keep, assume_unique=True)]
+            if len(chunk):
+                yield chunk.reset_index(drop=True)
@@ -0,0 +1,146 @@
+import time
+import asyncio
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PendingRow = namedtuple('_PendingRow', ['features', 'future', 'enqueued_at'])
+
+
+class MicroBatcher:
+    """
+    Collects single-row prediction requests into batches on the event loop.
+
+    A batch is dispatched once it holds max_batch_size rows or the oldest row has
+    waited max_delay_ms, whichever comes first. The batched predict call runs in a
+    worker thread and every caller's future is resolved with its own result.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=64, max_delay_ms=2.0, executor=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_batch = predict_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_delay = max(float(max_delay_ms), 0.0) / 1000.0
+        self.executor = executor
+        self._queue = None
+        self._worker = None
+
+        # Tuning statistics
+        self.batch_size_buckets = [2 ** i for i in range(self.max_batch_size.bit_length()) if 2 ** i < self.max_batch_size]
+        self.batch_size_buckets.append(self.max_batch_size)
+        self.batch_size_counts = [0] * len(self.batch_size_buckets)
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.predict_seconds_total = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Micro-batching enabled (max_batch_size={self.max_batch_size}, max_delay_ms={self.max_delay * 1000:g}).")
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        # Fail whatever is still queued rather than leaving callers hanging
+        while not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def submit(self, features: np.ndarray) -> float:
+        """Queues one feature row (1-d array) and waits for its prediction."""
+        if self._worker is None:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_PendingRow(features, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_delay
+        while len(batch) < self.max_batch_size:
+            # Take what is already queued without yielding to the event loop
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            dispatched_at = time.perf_counter()
+            features = np.stack([pending.features for pending in batch])
+            try:
+                predictions = await loop.run_in_executor(self.executor, self.predict_batch, features)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Batched prediction of {len(batch)} rows failed: {e}")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+            self._record(batch, dispatched_at, time.perf_counter() - dispatched_at)
+
+            for pending, prediction in zip(batch, np.asarray(predictions, dtype=np.float64).tolist()):
+                # Callers that disconnected have cancelled their future
+                if not pending.future.done():
+                    pending.future.set_result(prediction)
+
+    def _record(self, batch, dispatched_at, predict_seconds):
+        size = len(batch)
+        self.batches += 1
+        self.rows += size
+        self.predict_seconds_total += predict_seconds
+        for i, upper in enumerate(self.batch_size_buckets):
+            if size <= upper:
+                self.batch_size_counts[i] += 1
+                break
+        for pending in batch:
+            waited = dispatched_at - pending.enqueued_at
+            self.wait_seconds_total += waited
+            if waited > self.wait_seconds_max:
+                self.wait_seconds_max = waited
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_delay_ms": self.max_delay * 1000,
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "rows": self.rows,
+            "errors": self.errors,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "batch_size_distribution": {
+                f"le_{upper}": count for upper, count in zip(self.batch_size_buckets, self.batch_size_counts)
+            },
+            "mean_wait_ms": self.wait_seconds_total / self.rows * 1000 if self.rows else 0.0,
+            "max_wait_ms": self.wait_seconds_max * 1000,
+            "mean_predict_ms": self.predict_seconds_total / self.batches * 1000 if self.batches else 0.0,
+        }
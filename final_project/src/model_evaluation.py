@@ -4,6 +4,7 @@ import mlflow
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 import mlflow.pyfunc
+from src.parquet_artifacts import read_artifact, TRAINING_FEATURES, TARGET_COLUMN
 
 def model_evaluation(training_run_id: str):
     """
@@ -14,14 +15,11 @@ def model_evaluation(training_run_id: str):
     features_path = os.path.join(project_root, 'data', 'features', 'manga_features.parquet')
 
     print(f"Reading feature-engineered data from {features_path} for evaluation split")
-    df = pd.read_parquet(features_path)
-    
-    target_column = 'score'
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    if target_column in numeric_cols:
-        numeric_cols.remove(target_column)
-    features = numeric_cols
-    
+    df = read_artifact(features_path, columns=TRAINING_FEATURES + [TARGET_COLUMN])
+
+    target_column = TARGET_COLUMN
+    features = list(TRAINING_FEATURES)
+
     X = df[features]
     y = df[target_column]
 
@@ -5,6 +5,8 @@ from evidently.report import Report
 from evidently.metric_preset import DataDriftPreset, RegressionPreset
 from evidently.pipeline.column_mapping import ColumnMapping
 import requests # NEW IMPORT
+from src.database_utils import MANGA_TEXT_COLUMNS
+from src.parquet_artifacts import read_artifact
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -13,9 +15,39 @@ logger = logging.getLogger(__name__)
 # FastAPI endpoint for predictions
 FASTAPI_PREDICT_URL = "http://fastapi_app:8000/predict" # Use service name for Docker internal network
 
-def run_model_monitoring():
+# Fill value of missing dictionary-encoded (categorical) columns, which only take
+# one of their categories
+MISSING_CATEGORY = 'Unknown'
+
+
+def prepare_monitoring_data(current_data):
+    """
+    Fills missing values in the columns Evidently compares and drops rows without a
+    numeric score.
+    """
+    # Fill missing values in relevant columns for Evidently
+    for col in ['popularity', 'rank_val', 'volumes', 'chapters', 'primary_author', 'primary_genre', 'primary_demographic', 'primary_serialization']:
+        if col not in current_data.columns:
+            continue
+        if isinstance(current_data[col].dtype, pd.CategoricalDtype):
+            values = current_data[col]
+            if MISSING_CATEGORY not in values.cat.categories:
+                values = values.cat.add_categories([MISSING_CATEGORY])
+            current_data[col] = values.fillna(MISSING_CATEGORY)
+        else:
+            current_data[col] = current_data[col].fillna(0)
+
+    # Ensure 'score' column is numeric for Evidently
+    current_data['score'] = pd.to_numeric(current_data['score'], errors='coerce')
+    # Drop rows with NaN in 'score' for the entire dataset before splitting
+    current_data.dropna(subset=['score'], inplace=True)
+    return current_data
+
+
+def run_model_monitoring(include_text=False):
     """
     Runs Evidently reports for data drift and regression model performance.
+    Free-text columns are only read with include_text=True.
     """
     project_root = '/opt/airflow'
     processed_data_path = os.path.join(project_root, 'data', 'processed', 'manga_processed.parquet')
@@ -24,18 +56,10 @@ def run_model_monitoring():
     os.makedirs(monitoring_reports_dir, exist_ok=True)
 
     logger.info(f"Loading processed data from {processed_data_path} for monitoring.")
-    current_data = pd.read_parquet(processed_data_path)
+    current_data = read_artifact(processed_data_path, exclude=() if include_text else MANGA_TEXT_COLUMNS)
     logger.info(f"Processed data loaded. Shape: {current_data.shape}")
 
-    # Fill missing values in relevant columns for Evidently
-    for col in ['popularity', 'rank_val', 'volumes', 'chapters', 'primary_author', 'primary_genre', 'primary_demographic', 'primary_serialization']:
-        if col in current_data.columns:
-            current_data[col] = current_data[col].fillna(0)
-
-    # Ensure 'score' column is numeric for Evidently
-    current_data['score'] = pd.to_numeric(current_data['score'], errors='coerce')
-    # Drop rows with NaN in 'score' for the entire dataset before splitting
-    current_data.dropna(subset=['score'], inplace=True)
+    current_data = prepare_monitoring_data(current_data)
 
     # For demonstration, we'll use a subset of the current data as reference data.
     # In a real-world scenario, reference data would be your training dataset.
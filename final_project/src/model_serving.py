@@ -0,0 +1,198 @@
+import re
+import time
+import logging
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Immutable snapshot of the model being served. Handlers read it once per request,
+# so a reload swapping the reference never mixes two models within a request.
+ServedModel = namedtuple('ServedModel', ['run_id', 'model', 'loaded_at', 'load_seconds'])
+
+
+class ModelNotReadyError(RuntimeError):
+    """Raised when a prediction is requested before any model passed its warm-up."""
+
+
+# MLflow run ids are 32 lowercase hex digits. They name directories of the serving
+# and score index artifacts, so nothing else may reach a path join.
+RUN_ID_PATTERN = r'^[0-9a-f]{32}$'
+
+
+class InvalidRunIdError(ValueError):
+    """Raised for a run id that is not an MLflow run id."""
+
+
+def validate_run_id(run_id) -> str:
+    if not isinstance(run_id, str) or re.fullmatch(RUN_ID_PATTERN, run_id) is None:
+        raise InvalidRunIdError(f"Invalid run_id {run_id!r}, expected 32 lowercase hex digits.")
+    return run_id
+
+
+def read_run_id(run_id_path: str) -> str:
+    """Reads and validates the run id published by the training pipeline."""
+    with open(run_id_path, 'r') as f:
+        return validate_run_id(f.read().strip())
+
+
+class ModelManager:
+    """
+    Owns the model served by the API and swaps in new MLflow runs under live traffic.
+
+    A new model is loaded and warmed up off the request path; the active reference is
+    only replaced once the warm-up prediction succeeded, so a broken run keeps the
+    previous model in service.
+    """
+
+    def __init__(self, run_id_path, load_model, warmup_input, poll_interval=5.0,
+                 retry_initial=1.0, retry_max=60.0):
+        self.run_id_path = run_id_path
+        self.poll_interval = poll_interval
+        # Backoff between load attempts while no model is active
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self._load_model = load_model
+        self._warmup_input = warmup_input
+        self._current = None
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher = None
+        self._swap_listeners = []
+        self._seen_run_id = None
+        self.last_error = None
+        self.last_checked_at = None
+
+    @property
+    def current(self) -> ServedModel:
+        served = self._current
+        if served is None:
+            raise ModelNotReadyError("No model has been loaded yet.")
+        return served
+
+    @property
+    def ready(self) -> bool:
+        """True once a model has been loaded and passed its warm-up prediction."""
+        return self._current is not None
+
+    def add_swap_listener(self, callback):
+        """Registers callback(old, new) to be called after every model swap."""
+        self._swap_listeners.append(callback)
+
+    def reload(self, run_id=None, force=False) -> ServedModel:
+        """
+        Loads the given run (default: the one in the run-id file) and swaps it in.
+        Returns the model that is active afterwards.
+        """
+        with self._reload_lock:
+            if run_id is None:
+                run_id = read_run_id(self.run_id_path)
+                self._seen_run_id = run_id
+            else:
+                validate_run_id(run_id)
+            active = self._current
+            if active is not None and active.run_id == run_id and not force:
+                return active
+
+            logger.info(f"Loading model for run_id {run_id}...")
+            start = time.perf_counter()
+            try:
+                model = self._load_model(run_id)
+                self._warm_up(model)
+            except Exception as e:
+                self.last_error = f"run_id {run_id}: {e}"
+                logger.error(f"Failed to load model for run_id {run_id}, keeping previous model: {e}")
+                raise
+            load_seconds = time.perf_counter() - start
+
+            served = ServedModel(run_id=run_id, model=model, loaded_at=time.time(), load_seconds=load_seconds)
+            self._current = served  # single reference assignment, atomic for readers
+            self.last_error = None
+            logger.info(f"Now serving run_id {run_id} (loaded in {load_seconds:.2f}s).")
+
+            for callback in self._swap_listeners:
+                try:
+                    callback(active, served)
+                except Exception as e:
+                    logger.error(f"Model swap listener failed: {e}")
+            return served
+
+    def _warm_up(self, model):
+        prediction = np.asarray(model.predict(self._warmup_input), dtype=np.float64)
+        if prediction.shape[0] != len(self._warmup_input) or not np.isfinite(prediction).all():
+            raise ValueError(f"warm-up prediction returned {prediction!r}")
+
+    def check_for_update(self):
+        """
+        Reloads the model when the run-id file has changed since the last check, or
+        while no model is active yet.
+        """
+        self.last_checked_at = time.time()
+        run_id = read_run_id(self.run_id_path)
+        if run_id == self._seen_run_id and self._current is not None:
+            return
+        # Remember the file content even if loading fails, so a broken run does not
+        # replace a working model on every poll; the next deployment or /admin/reload
+        # replaces it. Without any model the run is retried, e.g. while MLflow starts.
+        self._seen_run_id = run_id
+        active = self._current
+        if active is None or run_id != active.run_id:
+            self.reload(run_id)
+
+    def _watch(self):
+        # The first check loads the initial model; later ones pick up new deployments.
+        # Until a model is active the check is retried with exponential backoff.
+        retry_delay = 0.0
+        while True:
+            try:
+                self.check_for_update()
+            except (OSError, InvalidRunIdError) as e:
+                logger.warning(f"Could not read {self.run_id_path}: {e}")
+            except Exception:
+                pass  # already logged by reload(), previous model stays active
+            if self._current is None:
+                retry_delay = min(max(retry_delay * 2, self.retry_initial), self.retry_max)
+                logger.info(f"No model loaded yet, retrying in {retry_delay:.1f}s.")
+                delay = retry_delay
+            elif self.poll_interval <= 0:
+                break
+            else:
+                delay = self.poll_interval
+            if self._stop_event.wait(delay):
+                break
+
+    def start_watching(self):
+        """
+        Starts a daemon thread that loads the current model in the background and then
+        polls the run-id file for new deployments (poll_interval <= 0: load only). A
+        failed first load is retried with backoff instead of leaving the API unready.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+        if self.poll_interval > 0:
+            logger.info(f"Watching {self.run_id_path} for new models every {self.poll_interval}s.")
+
+    def stop_watching(self):
+        if self._watcher is None:
+            return
+        self._stop_event.set()
+        self._watcher.join(timeout=max(self.poll_interval, 0) + 1)
+        self._watcher = None
+
+    def status(self) -> dict:
+        served = self._current
+        return {
+            "ready": served is not None,
+            "active_run_id": served.run_id if served else None,
+            "loaded_at": served.loaded_at if served else None,
+            "load_seconds": served.load_seconds if served else None,
+            "watching": self._watcher is not None,
+            "poll_interval": self.poll_interval,
+            "last_checked_at": self.last_checked_at,
+            "last_error": self.last_error,
+        }
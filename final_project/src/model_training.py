@@ -5,6 +5,9 @@ from sklearn.ensemble import RandomForestRegressor
 import mlflow
 import mlflow.sklearn
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from src.forest_inference import FlatForest
+from src.model_serving import InvalidRunIdError, read_run_id
+from src.parquet_artifacts import read_artifact, TRAINING_FEATURES, TARGET_COLUMN
 
 def model_training():
     """
@@ -16,18 +19,14 @@ def model_training():
     features_path = os.path.join(project_root, 'data', 'processed', 'manga_processed.parquet')
 
     print(f"Reading feature-engineered data from {features_path}")
-    df = pd.read_parquet(features_path)
+    # Only the model inputs and the target are used, so only those are read
+    df = read_artifact(features_path, columns=TRAINING_FEATURES + [TARGET_COLUMN])
     print("Feature-engineered data read successfully. Shape:", df.shape)
 
     # Define target and features
-    target_column = 'score'
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    
-    if target_column in numeric_cols:
-        numeric_cols.remove(target_column)
-    
-    features = numeric_cols
-    
+    target_column = TARGET_COLUMN
+    features = list(TRAINING_FEATURES)
+
     X = df[features]
     y = df[target_column]
 
@@ -81,11 +80,25 @@ def model_training():
         mlflow.sklearn.log_model(model, "random_forest_model")
         print("Model and metrics logged to MLflow.")
 
-        # Save the run_id for later use
+        # Export the slim serving artifact: memory-mappable forest arrays + feature schema
+        serving_models_dir = os.path.join(project_root, 'data', 'processed', 'serving_models')
+        serving_model_dir = os.path.join(serving_models_dir, run.info.run_id)
+        FlatForest.from_sklearn(model, feature_names=features).save(serving_model_dir, run_id=run.info.run_id)
+        mlflow.log_artifacts(serving_model_dir, artifact_path="serving_model")
+        print(f"Serving artifact exported to {serving_model_dir}")
+        # The deployed run may be older than the last three, until the DAG publishes this one
         run_id_path = os.path.join(project_root, 'data', 'processed', 'latest_run_id.txt')
-        with open(run_id_path, 'w') as f:
-            f.write(run.info.run_id)
-        
+        try:
+            active_run_ids = [read_run_id(run_id_path)]
+        except (OSError, InvalidRunIdError):
+            active_run_ids = []
+        pruned = FlatForest.prune(serving_models_dir, keep=3, active_run_ids=active_run_ids)
+        if pruned:
+            print(f"Removed old serving artifacts: {pruned}")
+
+        # latest_run_id.txt is not written here: the model serving watcher would pick up
+        # a run that has not been evaluated yet. The DAG's update_deployed_model_id task
+        # publishes it atomically once evaluation and the score index are done.
         return run.info.run_id
 
 if __name__ == '__main__':
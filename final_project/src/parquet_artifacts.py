@@ -0,0 +1,238 @@
+import os
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.database_utils import MANGA_TEXT_COLUMNS
+
+# Storage settings of the pipeline's Parquet artifacts (manga_processed, manga_features)
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_COMPRESSION_LEVEL = int(os.getenv("PARQUET_COMPRESSION_LEVEL", "3"))
+# Rows per row group; min/max statistics are kept per row group, so smaller groups let
+# readers skip more of the file for a filter on the sorted manga_info_id
+PARQUET_ROW_GROUP_ROWS = int(os.getenv("PARQUET_ROW_GROUP_ROWS", "32768"))
+
+# Manifest of a partitioned artifact directory. Parquet readers skip files starting
+# with '_' or '.', so neither it nor a partition being written is read as data.
+PARTITION_MANIFEST = '_manifest.json'
+
+# Low-cardinality strings, stored dictionary-encoded and read back as pandas categoricals
+DICTIONARY_COLUMNS = ['status', 'type', 'primary_genre', 'primary_demographic', 'primary_serialization']
+# Strings that are unique or nearly so per manga; dictionary pages and min/max
+# statistics only cost space for them
+UNIQUE_STRING_COLUMNS = ['title', 'title_english', 'title_japanese', 'url'] + MANGA_TEXT_COLUMNS
+
+
+def _dictionary():
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+# Arrow types of the mart_manga_training columns, following the MariaDB column types:
+# INT -> int32, BOOLEAN (TINYINT) -> int8 so the flags stay numeric features, DATE ->
+# date32. score stays float64, it is the regression target.
+MANGA_PROCESSED_FIELDS = {
+    'manga_info_id': pa.int32(), 'mal_id': pa.int32(),
+    'title': pa.string(), 'title_english': pa.string(), 'title_japanese': pa.string(),
+    'status': _dictionary(), 'type': _dictionary(), 'publishing': pa.int8(),
+    'published_from': pa.date32(), 'published_to': pa.date32(), 'approved': pa.int8(), 'url': pa.string(),
+    'score': pa.float64(), 'scored_by': pa.int32(), 'rank_val': pa.int32(), 'popularity': pa.int32(),
+    'members': pa.int32(), 'favorites': pa.int32(), 'volumes': pa.int32(), 'chapters': pa.int32(),
+    'primary_genre': _dictionary(), 'primary_author': pa.string(),
+    'primary_demographic': _dictionary(), 'primary_serialization': _dictionary(),
+    **{column: pa.string() for column in MANGA_TEXT_COLUMNS},
+}
+
+# Model inputs, in the order of app.MangaFeatures. Listed rather than taken from the
+# numeric columns of an artifact: rank_val and popularity are typed int32 above but
+# NULL for every manga, and must not become all-NaN features.
+TRAINING_FEATURES = ['manga_info_id', 'mal_id', 'publishing', 'approved', 'scored_by',
+                     'members', 'favorites', 'volumes', 'chapters']
+TARGET_COLUMN = 'score'
+
+
+def _downcast(field: pa.Field, values: pd.Series) -> pa.Field:
+    if pa.types.is_null(field.type):
+        return field.with_type(pa.string())
+    if pa.types.is_floating(field.type):
+        return field.with_type(pa.float32())
+    if pa.types.is_integer(field.type) and field.type.bit_width > 32:
+        numbers = values.dropna()
+        if numbers.empty or (numbers.min() >= -2 ** 31 and numbers.max() < 2 ** 31):
+            return field.with_type(pa.int32())
+    return field
+
+
+def artifact_schema(df: pd.DataFrame, fields=None) -> pa.Schema:
+    """
+    Arrow schema for writing `df`: columns named in `fields` (default
+    MANGA_PROCESSED_FIELDS) get that type. Any other column keeps its inferred type,
+    downcast: floats to float32, 64-bit integers to int32 when the values of `df` fit
+    and all-NULL columns to string. For a streamed write the schema comes from the
+    first chunk; a later chunk that does not fit it fails instead of being truncated.
+    """
+    fields = MANGA_PROCESSED_FIELDS if fields is None else fields
+    schema = []
+    for field in pa.Schema.from_pandas(df, preserve_index=False):
+        if field.name in fields:
+            schema.append(pa.field(field.name, fields[field.name]))
+        else:
+            schema.append(_downcast(field, df[field.name]))
+    return pa.schema(schema)
+
+
+def to_arrow(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """Converts `df` to `schema`, column by column, with checked casts."""
+    arrays = []
+    for field in schema:
+        values = df[field.name]
+        try:
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # e.g. dates that arrive as ISO strings
+            arrays.append(pa.array(values, from_pandas=True).cast(field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class ArtifactWriter:
+    """
+    Writes a Parquet artifact from a stream of DataFrames with the schema of
+    artifact_schema, PARQUET_COMPRESSION and row groups of PARQUET_ROW_GROUP_ROWS rows,
+    however the input is chunked. The file is written next to `path` and renamed into
+    place by close(); used as a context manager, an exception discards it instead.
+    The temporary file is hidden, so a directory holding `path` stays readable as a dataset.
+    """
+
+    def __init__(self, path: str, fields=None, row_group_rows=None):
+        self.path = path
+        self.fields = fields
+        self.row_group_rows = row_group_rows or PARQUET_ROW_GROUP_ROWS
+        directory, name = os.path.split(path)
+        self.tmp_path = os.path.join(directory, f".{name}.tmp-{os.getpid()}")
+        self.schema = None
+        self.rows = 0
+        self.row_groups = 0
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def write(self, df: pd.DataFrame):
+        if self._writer is None:
+            self.schema = artifact_schema(df, self.fields)
+            self._writer = pq.ParquetWriter(
+                self.tmp_path, self.schema, compression=PARQUET_COMPRESSION,
+                compression_level=PARQUET_COMPRESSION_LEVEL,
+                use_dictionary=[name for name in self.schema.names if name not in UNIQUE_STRING_COLUMNS],
+                write_statistics=[name for name in self.schema.names if name not in UNIQUE_STRING_COLUMNS])
+        if len(df):
+            self._pending.append(to_arrow(df, self.schema))
+            self._pending_rows += len(df)
+            self.rows += len(df)
+        while self._pending_rows >= self.row_group_rows:
+            self._flush(self.row_group_rows)
+
+    def _flush(self, n_rows: int):
+        table = pa.concat_tables(self._pending)
+        self._writer.write_table(table.slice(0, n_rows), row_group_size=n_rows)
+        self.row_groups += 1
+        rest = table.slice(n_rows)
+        self._pending, self._pending_rows = ([rest], len(rest)) if len(rest) else ([], 0)
+
+    def close(self):
+        if self._writer is None:
+            raise ValueError(f"No data written to {self.path}")
+        if self._pending_rows:
+            self._flush(self._pending_rows)
+        self._writer.close()
+        self._writer = None
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+def write_artifact(df: pd.DataFrame, path: str, fields=None):
+    """Writes a whole DataFrame as a Parquet artifact (see ArtifactWriter)."""
+    with ArtifactWriter(path, fields) as writer:
+        writer.write(df)
+    return writer
+
+
+def artifact_columns(path, numeric=False, exclude=()) -> list:
+    """
+    Column names of an artifact (a file, a partitioned directory or a list of files)
+    from a Parquet footer, without reading any data. numeric=True keeps the integer and
+    floating point columns, the ones select_dtypes('number') picks.
+    """
+    columns = []
+    for field in ds.dataset(path, format='parquet').schema:
+        if field.name in exclude or field.name == '__index_level_0__':
+            continue
+        if numeric and not (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)):
+            continue
+        columns.append(field.name)
+    return columns
+
+
+def read_artifact(path, columns=None, exclude=(), filters=None) -> pd.DataFrame:
+    """
+    Reads an artifact (a file, a partitioned directory or a list of files) into
+    pandas, decoding only the requested columns (projection) and skipping the row
+    groups whose statistics rule out `filters` (predicate pushdown). `filters` takes
+    pyarrow's form, e.g. [('type', '=', 'Manga'), ('manga_info_id', '>', 1000)].
+    Categorical columns keep only the categories present, sorted, so they one-hot encode
+    like plain strings.
+    """
+    if columns is None and exclude:
+        columns = artifact_columns(path, exclude=exclude)
+    df = pq.read_table(path, columns=columns, filters=filters).to_pandas()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            values = df[column].cat.remove_unused_categories()
+            df[column] = values.cat.set_categories(sorted(values.cat.categories))
+    return df
+
+
+def read_partition_manifest(dataset_dir: str):
+    """Returns the manifest of a partitioned artifact directory, or None."""
+    try:
+        with open(os.path.join(dataset_dir, PARTITION_MANIFEST), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_partition_manifest(dataset_dir: str, manifest: dict):
+    """Replaces the manifest in one rename, after every partition it lists is in place."""
+    tmp_path = os.path.join(dataset_dir, f".{PARTITION_MANIFEST}.tmp-{os.getpid()}")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(dataset_dir, PARTITION_MANIFEST))
+
+
+def partition_paths(dataset_dir: str, changed_only=False) -> list:
+    """
+    Paths of the partitions listed in a directory's manifest; with changed_only=True
+    only the ones the last write changed, for stages that process deltas.
+    """
+    manifest = read_partition_manifest(dataset_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No partition manifest in {dataset_dir}")
+    names = manifest['changed'] if changed_only else sorted(manifest['partitions'])
+    return [os.path.join(dataset_dir, name) for name in names]
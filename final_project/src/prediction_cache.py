@@ -0,0 +1,101 @@
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry cost of the OrderedDict slot and its linked-list node
+_ENTRY_OVERHEAD_BYTES = 120
+
+
+class PredictionCache:
+    """
+    Bounded in-process LRU cache of predictions with a TTL.
+
+    Keys are the active run id plus the normalized feature tuple, so a prediction
+    can never be served for a model other than the one that computed it; on top
+    of that the cache is cleared whenever a new model is swapped in.
+    """
+
+    def __init__(self, max_entries=100000, ttl_seconds=3600.0, max_bytes=None):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _entry_size(key, value) -> int:
+        return sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + sys.getsizeof(value) + _ENTRY_OVERHEAD_BYTES
+
+    def get(self, run_id: str, features: tuple):
+        """Returns the cached prediction, or None on a miss."""
+        key = (run_id,) + features
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, run_id: str, features: tuple, value: float):
+        key = (run_id,) + features
+        size = self._entry_size(key, value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, size)
+            self.bytes += size
+            # Evict least recently used entries until both caps hold
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.invalidations += 1
+
+    def on_model_swap(self, old, new):
+        """ModelManager swap listener: drops every prediction of the previous model."""
+        if old is None:
+            return
+        self.clear()
+        logger.info(f"Prediction cache invalidated for new run_id {new.run_id}.")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
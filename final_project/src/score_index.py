@@ -0,0 +1,109 @@
+import os
+import json
+import shutil
+
+import numpy as np
+
+from src.forest_inference import FlatForest
+
+# Version of the on-disk index written by ScoreIndex.save
+INDEX_FORMAT_VERSION = 1
+INDEX_FILE = 'index.json'
+
+
+class ScoreIndex:
+    """
+    Precomputed predictions for every known manga: mal_ids sorted ascending with the
+    score of the same position, so a lookup is one binary search over a memory-mapped
+    array. Each index is tagged with the run id of the model that produced it.
+    """
+
+    def __init__(self, mal_ids: np.ndarray, scores: np.ndarray, run_id: str):
+        self.mal_ids = mal_ids
+        self.scores = scores
+        self.run_id = run_id
+
+    def __len__(self):
+        return len(self.mal_ids)
+
+    @classmethod
+    def build(cls, mal_ids, scores, run_id: str):
+        """Sorts by mal_id; when a mal_id occurs more than once its first row wins."""
+        mal_ids = np.asarray(mal_ids, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float64)
+        unique_ids, first = np.unique(mal_ids, return_index=True)
+        return cls(unique_ids, scores[first], run_id)
+
+    def lookup(self, mal_id: int):
+        """Returns the precomputed score, or None when mal_id is not in the index."""
+        # A value outside the dtype of mal_ids cannot be in the index, and would overflow np.searchsorted
+        bounds = np.iinfo(self.mal_ids.dtype)
+        if not bounds.min <= mal_id <= bounds.max:
+            return None
+        position = int(np.searchsorted(self.mal_ids, mal_id))
+        if position < len(self.mal_ids) and self.mal_ids[position] == mal_id:
+            return float(self.scores[position])
+        return None
+
+    def save(self, directory: str):
+        """Writes mal_ids.npy, scores.npy and index.json under a temporary name, then renames it into place."""
+        tmp_dir = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, 'mal_ids.npy'), self.mal_ids)
+        np.save(os.path.join(tmp_dir, 'scores.npy'), self.scores)
+        with open(os.path.join(tmp_dir, INDEX_FILE), 'w') as f:
+            json.dump({"format_version": INDEX_FORMAT_VERSION, "run_id": self.run_id, "n_entries": len(self)}, f, indent=2)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode='r'):
+        with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+            meta = json.load(f)
+        if meta.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported score index version {meta.get('format_version')} in {directory}")
+        return cls(np.load(os.path.join(directory, 'mal_ids.npy'), mmap_mode=mmap_mode),
+                   np.load(os.path.join(directory, 'scores.npy'), mmap_mode=mmap_mode),
+                   meta["run_id"])
+
+
+def build_score_index(training_run_id: str):
+    """
+    Batch-scores every row of manga_processed.parquet with the serving artifact of
+    the given run and writes the mal_id -> score index the API answers /score from.
+    """
+    # Imported here: the API imports this module and never loads pandas or pyarrow
+    from src.parquet_artifacts import read_artifact, TRAINING_FEATURES
+
+    project_root = '/opt/airflow'
+    processed_dir = os.path.join(project_root, 'data', 'processed')
+    features_path = os.path.join(processed_dir, 'manga_processed.parquet')
+    forest = FlatForest.load(os.path.join(processed_dir, 'serving_models', training_run_id), mmap_mode='r')
+    feature_names = forest.feature_names or TRAINING_FEATURES
+
+    print(f"Reading processed data from {features_path}")
+    df = read_artifact(features_path, columns=list(feature_names))
+    df = df.dropna(subset=['mal_id'])
+    # Same NaN handling as model_training
+    df = df.fillna(df.median())
+    print(f"Scoring {len(df)} rows with run_id {training_run_id}...")
+
+    scores = np.empty(len(df), dtype=np.float64)
+    feature_matrix = df.to_numpy(dtype=np.float64)
+    for start in range(0, len(df), 65536):
+        scores[start:start + 65536] = forest.predict(feature_matrix[start:start + 65536])
+
+    index = ScoreIndex.build(df['mal_id'].to_numpy(), scores, training_run_id)
+    score_indexes_dir = os.path.join(processed_dir, 'score_indexes')
+    index_dir = os.path.join(score_indexes_dir, training_run_id)
+    os.makedirs(score_indexes_dir, exist_ok=True)
+    index.save(index_dir)
+    print(f"Score index with {len(index)} mal_ids written to {index_dir}")
+
+    # Keep the indexes of the same runs whose serving artifacts are kept
+    kept = set(os.listdir(os.path.join(processed_dir, 'serving_models')))
+    for name in os.listdir(score_indexes_dir):
+        if name not in kept:
+            shutil.rmtree(os.path.join(score_indexes_dir, name), ignore_errors=True)
+    return index_dir
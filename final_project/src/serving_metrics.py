@@ -0,0 +1,183 @@
+import time
+import threading
+from bisect import bisect_left
+
+# Stage and request latencies, in seconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Rows per request / batch
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+perf_counter_ns = time.perf_counter_ns
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count, or a callback returning one (e.g. cache hits)."""
+    __slots__ = ('value', 'function')
+
+    def __init__(self, function=None):
+        self.value = 0
+        self.function = function
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.function() if self.function is not None else self.value
+
+
+class Gauge:
+    """A settable value, or a callback evaluated when /metrics is scraped."""
+    __slots__ = ('value', 'function')
+
+    def __init__(self, function=None):
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labels):
+        value = self.function() if self.function is not None else self.value
+        if value is not None:
+            yield name, labels, value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram built for the hot path: observe() is one bisect on a
+    short list plus two integer additions, with no allocation and no lock.
+
+    Values are recorded in units of 1/scale (e.g. scale=1e9 for nanoseconds from
+    perf_counter_ns) and reported in base units. Updates from threads other than
+    the event loop are protected only by the GIL; an increment lost to a thread
+    switch mid-update is possible but vanishingly rare and only affects one sample.
+    """
+    __slots__ = ('buckets', '_bounds', 'scale', 'counts', 'sum')
+
+    def __init__(self, buckets, scale=1.0):
+        self.buckets = tuple(buckets)
+        self.scale = scale
+        self._bounds = [bound * scale for bound in self.buckets]
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            yield name + '_bucket', labels + (('le', _format_value(float(bound))),), cumulative
+        yield name + '_sum', labels, self.sum / self.scale
+        yield name + '_count', labels, cumulative
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text exposition format."""
+
+    _TYPES = {Counter: 'counter', Gauge: 'gauge', Histogram: 'histogram'}
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._families = {}  # name -> [type, help, {label tuple: metric}]
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, documentation, labels, factory):
+        full_name = f"{self.namespace}_{name}"
+        label_key = tuple(sorted(labels.items()))
+        family = self._families.get(full_name)
+        if family is not None:
+            metric = family[2].get(label_key)
+            if metric is not None:
+                return metric
+        with self._lock:
+            family = self._families.setdefault(full_name, [self._TYPES[kind], documentation, {}])
+            if family[0] != self._TYPES[kind]:
+                raise ValueError(f"Metric {full_name} is already registered as a {family[0]}")
+            return family[2].setdefault(label_key, factory())
+
+    def counter(self, name, documentation, function=None, **labels) -> Counter:
+        return self._get(Counter, name, documentation, labels, lambda: Counter(function))
+
+    def gauge(self, name, documentation, function=None, **labels) -> Gauge:
+        return self._get(Gauge, name, documentation, labels, lambda: Gauge(function))
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, scale=1.0, **labels) -> Histogram:
+        return self._get(Histogram, name, documentation, labels, lambda: Histogram(buckets, scale))
+
+    def latency_histogram(self, name, documentation, **labels) -> Histogram:
+        """Histogram in seconds that is fed nanosecond durations from perf_counter_ns."""
+        return self.histogram(name, documentation, LATENCY_BUCKETS, 1e9, **labels)
+
+    def remove(self, name, **labels):
+        """Drops one labelled series, e.g. the info series of a model that was swapped out."""
+        family = self._families.get(f"{self.namespace}_{name}")
+        if family is not None:
+            with self._lock:
+                family[2].pop(tuple(sorted(labels.items())), None)
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, documentation, children) in sorted(self._families.items()):
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in list(children.items()):
+                for sample_name, sample_labels, value in metric.samples(name, labels):
+                    lines.append(f"{sample_name}{_format_labels(sample_labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count and latency per handler and status.
+
+    It stamps scope["state"]["request_start_ns"] so handlers can attribute the time
+    spent before they run (body read, JSON decoding, validation) to a parse stage.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = perf_counter_ns()
+        scope.setdefault('state', {})['request_start_ns'] = start
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched endpoint in the scope; its name is a
+            # bounded label, unlike the raw path (e.g. /score/{mal_id}).
+            endpoint = scope.get('endpoint')
+            handler = getattr(endpoint, '__name__', type(endpoint).__name__) if endpoint is not None else 'unmatched'
+            self.registry.latency_histogram(
+                'request_duration_seconds', 'End-to-end request latency by handler.', handler=handler,
+            ).observe(perf_counter_ns() - start)
+            self.registry.counter(
+                'requests_total', 'Requests by handler and HTTP status.', handler=handler, status=str(status[0]),
+            ).inc()
@@ -5,48 +5,39 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
-import mysql.connector
 import logging
 import joblib
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+from src.database_utils import get_db_engine
 
 mlflow.set_tracking_uri("file:///home/ashura/airflow/dags/mlruns")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MariaDB connection details
-DB_HOST = "127.0.0.1"
-DB_USER = "root"
-DB_PASSWORD = "admin@123"
-DB_NAME = "airflow_db"
+# MariaDB holding the table written by ingest_data_to_mariadb.py
+DB_HOST = os.getenv("TRAIN_DB_HOST", "127.0.0.1")
+DB_USER = os.getenv("TRAIN_DB_USER", "root")
+DB_PASSWORD = os.getenv("TRAIN_DB_PASSWORD", "admin@123")
+DB_NAME = os.getenv("TRAIN_DB_NAME", "airflow_db")
 TABLE_NAME = "manga_data"
 ARTIFACTS_DIR = "training_artifacts_manga"
 
 def train_model():
     try:
         # 1. Connect to MariaDB and load data
-        conn = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME
-        )
+        engine = get_db_engine(driver="pymysql", host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
         logger.info("Connected to MariaDB.")
         
         query = f"SELECT * FROM {TABLE_NAME}"
-        df = pd.read_sql(query, conn)
+        df = pd.read_sql(query, engine)
         logger.info(f"Successfully loaded data from '{TABLE_NAME}'. Shape: {df.shape}")
 
-    except mysql.connector.Error as err:
-        logger.error(f"MariaDB error: {err}")
+    except Exception as e:
+        logger.error(f"MariaDB error: {e}")
         raise
-    finally:
-        if 'conn' in locals() and conn.is_connected():
-            conn.close()
-            logger.info("MariaDB connection closed.")
 
     # Preprocess the data
     df = df.dropna(subset=['score', 'scored_by', 'members', 'favorites', 'type'])
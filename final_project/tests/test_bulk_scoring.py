@@ -0,0 +1,12 @@
+from src.bulk_scoring import StreamingScorer
+
+
+def test_parse_ndjson_reports_malformed_lines_per_row():
+    scorer = StreamingScorer(None, None, ['mal_id'])
+    records, errors = scorer._parse_ndjson([b'{"mal_id": 1}', b'{"mal_id": ', b'[2]', b'{"mal_id": NaN}'])
+    assert records[0] == {'mal_id': 1}
+    assert sorted(errors) == [1, 2]
+    assert records[3]['mal_id'] != records[3]['mal_id']  # NaN, accepted like json.loads does
+
+    records, errors = scorer._parse_ndjson([b'{"mal_id": 1}', b'{"mal_id": 2}'])
+    assert records == [{'mal_id': 1}, {'mal_id': 2}] and errors == {}
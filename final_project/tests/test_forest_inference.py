@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+import sklearn
+from sklearn.ensemble import RandomForestRegressor
+
+from src import forest_inference
+from src.forest_inference import FlatForest
+
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5))
+    y = X[:, 0] * 2 + np.sin(X[:, 1]) + rng.normal(0, 0.1, 2000)
+    return RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+
+
+# Trees are fitted on missing values from scikit-learn 1.3
+SKLEARN_VERSION = tuple(int(part) for part in sklearn.__version__.split('.')[:2])
+
+
+@pytest.mark.parametrize('n_rows', [1, 7, 300])
+@pytest.mark.parametrize('group_entries', [1, 64, 1 << 15])
+def test_predict_matches_sklearn_for_any_tree_grouping(forest, monkeypatch, n_rows, group_entries):
+    monkeypatch.setattr(forest_inference, 'APPLY_GROUP_ENTRIES', group_entries)
+    X = np.random.default_rng(n_rows).normal(size=(n_rows, 5)).astype(np.float32)
+    flat = FlatForest.from_sklearn(forest)
+    assert np.array_equal(flat.predict(X), forest.predict(X))
+    assert np.array_equal(flat.apply(X), flat.roots[:, None] + forest.apply(X).T)
+
+
+def test_predict_empty_batch(forest):
+    assert FlatForest.from_sklearn(forest).predict(np.empty((0, 5))).shape == (0,)
+
+
+@pytest.mark.skipif(SKLEARN_VERSION < (1, 3), reason='trees accept missing values from scikit-learn 1.3')
+def test_predict_routes_missing_values_like_sklearn():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(2000, 3))
+    X[rng.random(X.shape) < 0.2] = np.nan
+    y = np.nan_to_num(X[:, 0]) + rng.normal(0, 0.1, 2000)
+    forest = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    flat = FlatForest.from_sklearn(forest)
+    assert np.array_equal(flat.predict(X[:500].astype(np.float32)), forest.predict(X[:500].astype(np.float32)))
+
+
+def test_prune_keeps_the_active_run(forest, tmp_path):
+    flat = FlatForest.from_sklearn(forest)
+    for age, run_id in enumerate(['a' * 32, 'b' * 32, 'c' * 32, 'd' * 32]):
+        directory = tmp_path / run_id
+        flat.save(str(directory), run_id=run_id)
+        os.utime(directory, (1000 - age, 1000 - age))
+
+    pruned = FlatForest.prune(str(tmp_path), keep=2, active_run_ids=['d' * 32])
+    assert sorted(os.path.basename(path) for path in pruned) == ['c' * 32]
+    assert sorted(os.listdir(tmp_path)) == ['a' * 32, 'b' * 32, 'd' * 32]
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from src.data_ingestion import prepare_chunk
+from src.landing_zone import build_landing_zone, iter_landing_chunks
+
+COLUMNS = ['mal_id', 'title', 'title_english', 'title_japanese', 'title_synonyms', 'synopsis', 'background',
+           'status', 'published_from', 'published_to', 'url', 'type', 'approved', 'images', 'score', 'scored_by',
+           'rank', 'popularity', 'members', 'favorites', 'volumes', 'chapters',
+           'genres', 'authors', 'demographics', 'serializations']
+# mal_id 1 and 2 are repeated with different types, within and across CSV chunks of 4 rows,
+# and the last row of mal_id 1 has a type that sorts before the one of the row above it
+ROWS = [(1, 'first', 'Novel'), (2, 'other', 'Manga'), (1, 'second', 'Manga'), (3, 'third', 'Manhwa'),
+        (2, 'other again', 'Novel'), (1, 'next to last', 'Novel'), (1, 'last', 'Manga')]
+
+
+def write_csv(path):
+    df = pd.DataFrame([{'mal_id': mal_id, 'title': title, 'type': manga_type, 'status': 'Finished',
+                        'approved': True, 'score': 7.5, 'members': 10, 'genres': '[{"name": "Drama"}]'}
+                       for mal_id, title, manga_type in ROWS], columns=COLUMNS)
+    df.to_csv(path, index=False)
+
+
+def final_rows(chunks):
+    """mal_id -> title after ingesting the chunks in order (the last upsert wins)."""
+    known_hashes, seen, titles = {}, set(), {}
+    for chunk in chunks:
+        prepared = prepare_chunk(chunk, known_hashes, seen)
+        titles.update(zip(prepared['df']['mal_id'].astype(int), prepared['df']['title']))
+    return titles
+
+
+def test_landing_dataset_keeps_last_row_in_file_order(tmp_path):
+    csv_path = tmp_path / 'manga.csv'
+    write_csv(csv_path)
+    direct = final_rows(pd.read_csv(csv_path, chunksize=4))
+
+    dataset_dir = build_landing_zone(str(csv_path), str(tmp_path / 'landing'), chunk_size=4)
+    landed = list(iter_landing_chunks(dataset_dir, chunk_size=2))
+
+    assert direct == {1: 'last', 2: 'other again', 3: 'third'}
+    assert final_rows(landed) == direct
+    assert sorted(pd.concat(landed)['mal_id']) == [1, 2, 3]
+
+
+def test_rows_without_mal_id_are_skipped_and_counted(tmp_path):
+    csv_path = tmp_path / 'manga.csv'
+    write_csv(csv_path)
+    with open(csv_path, 'a') as f:
+        f.write(',no id' + ',' * (len(COLUMNS) - 2) + '\n')
+    chunk = pd.read_csv(csv_path)
+    assert chunk['mal_id'].dtype == 'float64'
+
+    prepared = prepare_chunk(chunk, {}, set())
+    assert prepared['invalid'] == 1
+    assert sorted(prepared['df']['mal_id']) == [1, 2, 3]
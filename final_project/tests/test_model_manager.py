@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+
+from src.model_serving import ModelManager
+
+RUN_ID = '0123456789abcdef0123456789abcdef'
+
+
+class ConstantModel:
+    def predict(self, X):
+        return np.full(len(X), 7.5)
+
+
+class FlakyLoader:
+    """Fails the first `failures` loads, like a model export while MLflow is still starting."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+        self.loaded = threading.Event()
+
+    def __call__(self, run_id):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("MLflow is not reachable yet")
+        self.loaded.set()
+        return ConstantModel()
+
+
+def manager(tmp_path, load_model, **kwargs):
+    run_id_path = tmp_path / 'latest_run_id.txt'
+    run_id_path.write_text(RUN_ID)
+    return ModelManager(str(run_id_path), load_model, np.zeros((1, 3)), **kwargs)
+
+
+def test_first_load_failure_is_retried_on_the_next_poll(tmp_path):
+    loader = FlakyLoader(failures=1)
+    models = manager(tmp_path, loader)
+    try:
+        models.check_for_update()
+    except ConnectionError:
+        pass
+    assert not models.ready
+
+    models.check_for_update()
+    assert models.ready and models.current.run_id == RUN_ID
+    models.check_for_update()
+    assert loader.calls == 2
+
+
+def test_watcher_retries_with_backoff_until_a_model_loads(tmp_path):
+    loader = FlakyLoader(failures=3)
+    models = manager(tmp_path, loader, poll_interval=0, retry_initial=0.01, retry_max=0.05)
+    models.start_watching()
+    try:
+        assert loader.loaded.wait(5)
+    finally:
+        models.stop_watching()
+    assert models.ready and loader.calls == 4
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from src.model_monitoring import MISSING_CATEGORY, prepare_monitoring_data
+from src.parquet_artifacts import write_artifact, read_artifact
+
+
+def test_monitoring_fills_missing_values_of_categorical_columns(tmp_path):
+    path = str(tmp_path / 'manga_processed.parquet')
+    write_artifact(pd.DataFrame({
+        'mal_id': [1, 2, 3],
+        'score': [7.5, None, 8.0],
+        'volumes': [3, None, 1],
+        'primary_author': ['Miura, Kentarou', None, 'Oda, Eiichiro'],
+        'primary_genre': ['Action', None, None],
+        'primary_demographic': [None, 'Seinen', 'Shounen'],
+        'primary_serialization': [None, None, None],
+    }), path)
+    current_data = read_artifact(path)
+    assert isinstance(current_data['primary_genre'].dtype, pd.CategoricalDtype)
+
+    prepared = prepare_monitoring_data(current_data)
+    assert list(prepared['mal_id']) == [1, 3]
+    assert list(prepared['primary_genre']) == ['Action', MISSING_CATEGORY]
+    assert list(prepared['primary_demographic']) == [MISSING_CATEGORY, 'Shounen']
+    assert list(prepared['primary_serialization']) == [MISSING_CATEGORY, MISSING_CATEGORY]
+    assert list(prepared['volumes']) == [3, 1]
@@ -0,0 +1,32 @@
+import io
+
+import pandas as pd
+
+from src.data_ingestion import row_fingerprints
+
+HEADER = 'mal_id,title,score,scored_by,volumes,approved,genres\n'
+ROW = '41,1984,8.5,1200,3,True,"[{""name"": ""Drama""}]"\n'
+
+
+def read_chunk(text):
+    return pd.read_csv(io.StringIO(HEADER + text))
+
+
+def test_row_hashes_the_same_in_differently_composed_chunks():
+    # Alone, every column of the row is read as int, float, bool or str. Next to a row
+    # with missing values, scored_by, volumes and title come back as floats and
+    # approved as object.
+    alone = read_chunk(ROW)
+    mixed = read_chunk('42,,,,,,\n' + ROW)
+    assert alone['volumes'].dtype != mixed['volumes'].dtype
+
+    assert row_fingerprints(alone).iloc[0] == row_fingerprints(mixed).iloc[1]
+
+
+def test_fingerprint_follows_declared_types():
+    as_text = pd.DataFrame({'mal_id': ['41'], 'volumes': ['3'], 'score': ['8.5'], 'approved': ['True']})
+    typed = pd.DataFrame({'mal_id': [41], 'volumes': [3.0], 'score': [8.5], 'approved': [True]})
+    assert row_fingerprints(as_text).iloc[0] == row_fingerprints(typed).iloc[0]
+
+    changed = typed.assign(volumes=[4.0])
+    assert row_fingerprints(changed).iloc[0] != row_fingerprints(typed).iloc[0]
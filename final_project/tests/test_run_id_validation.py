@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src import app as app_module
+from src.app import app
+from src.model_serving import InvalidRunIdError, read_run_id
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize('admin_token, header, status_code', [
+    ('', None, 403), ('', 'secret', 403), ('secret', None, 401), ('secret', 'wrong', 401)])
+def test_reload_requires_the_admin_token(monkeypatch, admin_token, header, status_code):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', admin_token)
+    reloads = []
+    monkeypatch.setattr(app_module.model_manager, 'reload', lambda **kwargs: reloads.append(kwargs))
+    headers = {'X-Admin-Token': header} if header is not None else {}
+    response = client.post('/admin/reload', headers=headers)
+    assert response.status_code == status_code
+    assert reloads == []
+
+
+def test_reload_follows_the_run_id_file(monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    reloads = []
+    monkeypatch.setattr(app_module.model_manager, 'reload', lambda **kwargs: reloads.append(kwargs))
+    response = client.post('/admin/reload', params={'run_id': 'a' * 32}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert reloads == [{'force': False}]
+
+
+def test_read_run_id_rejects_malformed_file(tmp_path):
+    path = tmp_path / 'latest_run_id.txt'
+    path.write_text('../serving_models')
+    with pytest.raises(InvalidRunIdError):
+        read_run_id(str(path))
+
+    path.write_text('0123456789abcdef0123456789abcdef\n')
+    assert read_run_id(str(path)) == '0123456789abcdef0123456789abcdef'
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.score_index import ScoreIndex
+
+
+def test_lookup_outside_the_index_dtype_is_a_miss():
+    index = ScoreIndex.build([3, 1, 2], [7.0, 8.0, 9.0], run_id='a' * 32)
+    assert index.lookup(1) == 8.0
+    assert index.lookup(4) is None
+    for mal_id in (2 ** 63, 2 ** 80, -2 ** 80):
+        assert index.lookup(mal_id) is None
+
+
+@pytest.mark.parametrize('mal_id', [-1, 2 ** 31, 2 ** 63, 2 ** 80])
+def test_score_rejects_mal_ids_outside_int_range(mal_id):
+    response = TestClient(app).get(f'/score/{mal_id}')
+    assert response.status_code == 422
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from src.app import MangaFeatures, FEATURE_COLUMNS
+from src.parquet_artifacts import TRAINING_FEATURES, TARGET_COLUMN, write_artifact, read_artifact
+
+
+def test_training_features_match_serving_schema():
+    assert TRAINING_FEATURES == list(MangaFeatures.__fields__)
+    assert TRAINING_FEATURES == FEATURE_COLUMNS
+
+
+def test_all_null_numeric_columns_are_not_read_as_features(tmp_path):
+    path = str(tmp_path / 'manga_processed.parquet')
+    df = pd.DataFrame({column: [1, 2] for column in TRAINING_FEATURES})
+    df[TARGET_COLUMN] = [7.5, 8.0]
+    df['rank_val'] = [None, None]
+    df['popularity'] = [None, None]
+    write_artifact(df, path)
+
+    read = read_artifact(path, columns=TRAINING_FEATURES + [TARGET_COLUMN])
+    assert list(read.columns) == TRAINING_FEATURES + [TARGET_COLUMN]
+    assert not read[TRAINING_FEATURES].isna().any().any()
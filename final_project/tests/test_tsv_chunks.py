@@ -0,0 +1,44 @@
+import re
+
+import pandas as pd
+import pytest
+
+from src.ingest_data_to_mariadb import infer_sql_types, write_tsv_chunk
+
+# LOAD DATA's reading of the default format: fields split on tab, lines on '\n',
+# then backslash sequences decoded
+UNESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', '0': '\0', '\\': '\\'}
+
+
+def read_tsv(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        lines = f.read().split('\n')
+    assert lines[-1] == ''
+    return [[re.sub(r'\\(.)', lambda m: UNESCAPES.get(m.group(1), m.group(1)), field) for field in line.split('\t')]
+            for line in lines[:-1]]
+
+
+def test_values_with_backslashes_tabs_and_newlines_round_trip(tmp_path):
+    titles = ['ends in a backslash\\', 'tab\there', 'two\nlines\r\n', '\\t is not a tab', 'plain', None]
+    chunk = pd.DataFrame({'title': titles, 'volumes': [1, 2, 3, 4, 5, None],
+                          'approved': [True, False, 'True', 'False', None, True]})
+    path = str(tmp_path / 'chunk.tsv')
+    write_tsv_chunk(chunk, {'title': 'TEXT', 'volumes': 'FLOAT', 'approved': 'BOOLEAN'}, path)
+
+    rows = read_tsv(path)
+    assert [row[0] for row in rows] == titles[:-1] + ['']
+    assert [row[1] for row in rows] == ['1.0', '2.0', '3.0', '4.0', '5.0', '']
+    assert [row[2] for row in rows] == ['1', '0', '1', '0', '', '1']
+
+
+@pytest.mark.parametrize('late_row', ['3,unknown,True', '3,4.5,True', '3,4,maybe'])
+def test_late_chunk_that_disagrees_with_the_sampled_types_is_rejected(tmp_path, late_row):
+    csv_path = tmp_path / 'manga.csv'
+    csv_path.write_text('mal_id,volumes,approved\n1,10,True\n2,20,False\n' + late_row + '\n')
+    sql_types = infer_sql_types(str(csv_path), sample_rows=2)
+    assert sql_types == {'mal_id': 'BIGINT', 'volumes': 'BIGINT', 'approved': 'BOOLEAN'}
+
+    chunks = list(pd.read_csv(csv_path, chunksize=2))
+    write_tsv_chunk(chunks[0], sql_types, str(tmp_path / 'first.tsv'))
+    with pytest.raises(ValueError, match='inferred from the first rows'):
+        write_tsv_chunk(chunks[1], sql_types, str(tmp_path / 'late.tsv'))